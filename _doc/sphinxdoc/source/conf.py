@@ -105,6 +105,7 @@ epkg_dictionary.update({
     "AESA": "https://tavianator.com/aesa/",
     'ApproximateNMFPredictor':
         'http://www.xavierdupre.fr/app/mlinsights/helpsphinx/mlinsights/mlmodel/anmf_predictor.html',
+    'asyncio': 'https://docs.python.org/3/library/asyncio.html',
     "B+ tree": "https://en.wikipedia.org/wiki/B%2B_tree",
     "Branch and Bound": "https://en.wikipedia.org/wiki/Branch_and_bound",
     "Custom Criterion for DecisionTreeRegressor":
@@ -0,0 +1,678 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=60s)
+"""
+import os
+import sys
+import random
+import time
+import tracemalloc
+import asyncio
+import unittest
+import numpy
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase, get_temp_folder
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_cache import CompletionCache
+from mlstatpy.nlp.completion_columnar import ColumnarCompletionSystem
+from mlstatpy.nlp.completion_compact import CompactCompletionTrie
+from mlstatpy.nlp.completion_radix import RadixCompletionTrieNode
+from mlstatpy.nlp.completion_server import CompletionServer, load_generator
+from mlstatpy.nlp.completion_dawg import CompletionDAWG
+from mlstatpy.nlp.completion_overlay import CompletionOverlay
+from mlstatpy.nlp.completion_simple import CompletionSystem
+from mlstatpy.nlp.completion_sorted import CompletionSortedArray
+from mlstatpy.data.wikipedia import enumerate_titles
+
+
+def random_queries(n, seed=0):
+    """
+    Generates *n* distinct queries made of random syllables.
+    """
+    rnd = random.Random(seed)
+    syl = ["ba", "be", "bi", "ca", "co", "de", "di", "fa", "la", "le",
+           "li", "ma", "mo", "na", "ne", "pa", "po", "ra", "re", "sa",
+           "se", "ta", "to", "va", " "]
+    res = set()
+    while len(res) < n:
+        q = "".join(rnd.choice(syl) for _ in range(rnd.randint(2, 8)))
+        res.add(q.strip())
+    res = list(sorted(res))
+    rnd.shuffle(res)
+    return [(None, q) for q in res]
+
+
+class TestLONGCompletionBenchmark(ExtTestCase):
+
+    def test_benchmark_precompute_stat(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [(None, _.strip(" \n\r\t")) for _ in f.readlines()]
+
+        for n in ['sample1000', 10000, 30000, 100000]:
+            queries = lines if n == 'sample1000' else random_queries(n)
+            trie = CompletionTrieNode.build(queries)
+            nodes = sum(1 for _ in trie.unsorted_iter())
+            begin = time.perf_counter()
+            trie.precompute_stat()
+            duration = time.perf_counter() - begin
+            fLOG("precompute_stat: words={0} nodes={1} time={2:.3f}s "
+                 "time/node={3:.2f}us".format(
+                     n, nodes, duration, duration * 1e6 / nodes))
+            self.assertNotEmpty(trie.stat.completions)
+
+    def test_benchmark_complete(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = random_queries(100000)
+        begin = time.perf_counter()
+        trie = CompletionTrieNode.build(queries, topk=10)
+        fLOG("build+topk: words={0} time={1:.3f}s".format(
+            len(queries), time.perf_counter() - begin))
+        rnd = random.Random(1)
+        prefixes = []
+        for _, q in rnd.sample(queries, 10000):
+            prefixes.append(q[:rnd.randint(0, len(q))])
+        durations = []
+        for p in prefixes:
+            begin = time.perf_counter()
+            trie.complete(p, 10)
+            durations.append(time.perf_counter() - begin)
+        durations.sort()
+        fLOG("complete: p50={0:.2f}us p99={1:.2f}us".format(
+            durations[len(durations) // 2] * 1e6,
+            durations[len(durations) * 99 // 100] * 1e6))
+        begin = time.perf_counter()
+        trie.complete_many(prefixes, 10)
+        fLOG("complete_many: {0:.2f}us per prefix".format(
+            (time.perf_counter() - begin) * 1e6 / len(prefixes)))
+        self.assertEqual(len(durations), len(prefixes))
+
+    def test_benchmark_min_keystroke_many(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = random_queries(100000)
+        trie = CompletionTrieNode.build(queries)
+        words = [q for _, q in queries]
+        begin = time.perf_counter()
+        for w in words[:20]:
+            trie.min_keystroke(w)
+        duration = time.perf_counter() - begin
+        fLOG("min_keystroke: {0:.2f}ms per word".format(
+            duration * 1e3 / 20))
+        begin = time.perf_counter()
+        mks, _ = trie.min_keystroke_many(words)
+        duration = time.perf_counter() - begin
+        fLOG("min_keystroke_many: words={0} time={1:.3f}s {2:.2f}ms per word".format(
+            len(words), duration, duration * 1e3 / len(words)))
+        self.assertEqual(mks.shape, (len(words), ))
+
+    def test_benchmark_snapshot(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        temp = get_temp_folder(__file__, "temp_benchmark_snapshot")
+        name = os.path.join(temp, "trie.bin")
+        queries = random_queries(100000)
+        begin = time.perf_counter()
+        trie = CompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        duration = time.perf_counter() - begin
+        fLOG("rebuild: words={0} time={1:.3f}s".format(len(queries), duration))
+        trie.save(name)
+        del trie
+        for mmap in [True, False]:
+            begin = time.perf_counter()
+            loaded = CompactCompletionTrie.load(name, mmap=mmap)
+            mks = loaded.min_dynamic_keystroke(queries[0][1])
+            duration = time.perf_counter() - begin
+            fLOG("load(mmap={0}) + first query: time={1:.4f}s size={2}Mb".format(
+                mmap, duration, os.stat(name).st_size / 2 ** 20))
+            self.assertNotEmpty(mks)
+
+    def test_benchmark_build_parallel(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = random_queries(100000)
+        begin = time.perf_counter()
+        trie = CompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        duration = time.perf_counter() - begin
+        fLOG("sequential: words={0} time={1:.3f}s".format(
+            len(queries), duration))
+        for workers in [1, 2, 4, 8]:
+            begin = time.perf_counter()
+            ptrie = CompletionTrieNode.build_parallel(
+                queries, workers=workers)
+            pduration = time.perf_counter() - begin
+            fLOG("build_parallel: workers={0} time={1:.3f}s speed-up={2:.2f}".format(
+                workers, pduration, duration / pduration))
+            self.assertEqual([(w, s.value) for w, s in ptrie.stat.completions],
+                             [(w, s.value) for w, s in trie.stat.completions])
+
+    def test_benchmark_stat_memory(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = random_queries(100000)
+        trie = CompletionTrieNode.build(queries)
+        begin = time.perf_counter()
+        trie.precompute_stat()
+        duration = time.perf_counter() - begin
+        begin = time.perf_counter()
+        trie.update_stat_dynamic()
+        duration2 = time.perf_counter() - begin
+        mem = trie.memory_usage()
+        stat = sum(sys.getsizeof(node.stat) for node in trie.unsorted_iter())
+        fLOG("words={0} nodes={1} precompute_stat={2:.3f}s update_stat_dynamic={3:.3f}s "
+             "bytes/node={4:.1f} stat bytes/node={5:.1f}".format(
+                 len(queries), mem['nodes'], duration, duration2,
+                 mem['bytes_per_node'], stat / mem['nodes']))
+        self.assertLess(stat / mem['nodes'], 200)
+
+    def test_benchmark_radix(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample20000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        lines = [(None, q) for q in sorted(set(lines))]
+
+        for name, queries in [('sample20000', lines),
+                              ('random100k', random_queries(100000))]:
+            for cls in [CompletionTrieNode, RadixCompletionTrieNode]:
+                trie = cls.build(queries)
+                begin = time.perf_counter()
+                trie.precompute_stat()
+                duration = time.perf_counter() - begin
+                begin = time.perf_counter()
+                trie.update_stat_dynamic()
+                duration2 = time.perf_counter() - begin
+                mem = trie.memory_usage()
+                fLOG("{0} {1}: nodes={2} precompute_stat={3:.3f}s update_stat_dynamic={4:.3f}s "
+                     "memory={5:.1f}Mb bytes/word={6:.0f}".format(
+                         name, cls.__name__, mem['nodes'], duration, duration2,
+                         mem['bytes'] / 2 ** 20, mem['bytes_per_word']))
+
+    def test_benchmark_dawg(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        sets = []
+        for name in ["sample20000.txt", "wikititles.txt"]:
+            data = os.path.join(this, "data", name)
+            sets.append((name, [(None, q) for q in sorted(set(enumerate_titles(data)))]))
+        sets.append(('random100k', sorted(random_queries(100000), key=lambda q: q[1])))
+
+        for name, queries in sets:
+            begin = time.perf_counter()
+            trie = CompletionTrieNode.build(queries)
+            duration = time.perf_counter() - begin
+            mem = trie.memory_usage()
+            del trie
+            begin = time.perf_counter()
+            dawg = CompletionDAWG.build(queries)
+            duration2 = time.perf_counter() - begin
+            mem2 = dawg.memory_usage()
+            fLOG("{0}: words={1} trie nodes={2} build={3:.3f}s memory={4:.1f}Mb - "
+                 "dawg states={5} build={6:.3f}s memory={7:.1f}Mb".format(
+                     name, len(queries), mem['nodes'], duration, mem['bytes'] / 2 ** 20,
+                     mem2['nodes'], duration2, mem2['bytes'] / 2 ** 20))
+            self.assertLess(mem2['bytes'], mem['bytes'])
+
+    def test_benchmark_sorted_array(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        # the trie gives its own weight to the empty query (the root)
+        queries = [q for q in random_queries(100000) if q[1]]
+        rnd = random.Random(1)
+        prefixes = []
+        for _, q in rnd.sample(queries, 10000):
+            prefixes.append(q[:rnd.randint(0, len(q))])
+
+        begin = time.perf_counter()
+        trie = CompletionTrieNode.build(queries, topk=10)
+        duration = time.perf_counter() - begin
+        mem = trie.memory_usage()
+        begin = time.perf_counter()
+        engine = CompletionSortedArray(CompletionSystem(queries))
+        duration2 = time.perf_counter() - begin
+        mem2 = engine.memory_usage()
+        fLOG("build: words={0} trie={1:.3f}s {2:.1f}Mb - sorted array={3:.3f}s {4:.1f}Mb".format(
+            len(queries), duration, mem['bytes'] / 2 ** 20,
+            duration2, mem2['bytes'] / 2 ** 20))
+
+        for name, fct in [('trie', trie.complete), ('sorted array', engine.complete)]:
+            durations = []
+            for p in prefixes:
+                begin = time.perf_counter()
+                fct(p, 10)
+                durations.append(time.perf_counter() - begin)
+            durations.sort()
+            fLOG("{0}: p50={1:.2f}us p99={2:.2f}us".format(
+                name, durations[len(durations) // 2] * 1e6,
+                durations[len(durations) * 99 // 100] * 1e6))
+        for p in prefixes[:1000]:
+            self.assertEqual(engine.complete(p, 10), trie.complete(p, 10))
+        self.assertLess(mem2['bytes'], mem['bytes'])
+
+    def test_benchmark_fuzzy_complete(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        def brute_force(queries, prefix, max_edits, k):
+            res = []
+            for w, q in queries:
+                row = list(range(len(prefix) + 1))
+                best = row[-1]
+                for c in q:
+                    prev = row
+                    row = [prev[0] + 1]
+                    for i in range(1, len(prefix) + 1):
+                        row.append(min(row[i - 1] + 1, prev[i] + 1,
+                                       prev[i - 1] + (prefix[i - 1] != c)))
+                    best = min(best, row[-1])
+                    if min(row) > max_edits:
+                        break
+                if best <= max_edits:
+                    res.append((best, w, q))
+            res.sort()
+            return res[:k]
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample20000.txt")
+        titles = sorted(set(enumerate_titles(data)))
+        queries = [(i, q) for i, q in enumerate(titles) if q]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        rnd = random.Random(0)
+        prefixes = []
+        for _, q in rnd.sample(queries, 20):
+            prefix = list(q[:rnd.randint(1, min(len(q), 8))])
+            prefix[rnd.randint(0, len(prefix) - 1)] = rnd.choice("aeiost")
+            prefixes.append("".join(prefix))
+
+        for max_edits in [1, 2]:
+            begin = time.perf_counter()
+            exp = [brute_force(queries, p, max_edits, 10) for p in prefixes]
+            duration = time.perf_counter() - begin
+            begin = time.perf_counter()
+            got = [trie.fuzzy_complete(p, max_edits, 10) for p in prefixes]
+            duration2 = time.perf_counter() - begin
+            fLOG("max_edits={0} titles={1} brute force={2:.2f}ms fuzzy_complete={3:.2f}ms "
+                 "speed-up={4:.1f}".format(
+                     max_edits, len(queries), duration * 1000 / len(prefixes),
+                     duration2 * 1000 / len(prefixes), duration / duration2))
+            self.assertEqual(got, exp)
+
+    def test_benchmark_cache_zipf(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [q for q in random_queries(100000) if q[1]]
+        prefixes = set()
+        for _, q in queries:
+            for i in range(1, min(len(q), 8) + 1):
+                prefixes.add(q[:i])
+        prefixes = list(sorted(prefixes))
+        rnd = numpy.random.RandomState(0)
+        rnd.shuffle(prefixes)
+        # zipf distribution over the prefixes, a few of them are very frequent
+        proba = 1. / numpy.arange(1, len(prefixes) + 1) ** 1.1
+        proba /= proba.sum()
+        replay = [prefixes[i] for i in rnd.choice(len(prefixes), 200000, p=proba)]
+
+        trie = CompletionTrieNode.build(queries, topk=10)
+        engine = CompletionSortedArray(queries)
+        for name, eng in [('trie', trie), ('sorted array', engine)]:
+            begin = time.perf_counter()
+            for p in replay:
+                eng.complete(p, 10)
+            duration = time.perf_counter() - begin
+            fLOG("{0}: prefixes={1} requests={2} no cache={3:.0f} req/s".format(
+                name, len(prefixes), len(replay), len(replay) / duration))
+            for policy in ['lru', 'lfu']:
+                for maxsize in [1000, 10000]:
+                    cache = CompletionCache(eng, maxsize=maxsize, policy=policy)
+                    begin = time.perf_counter()
+                    for p in replay:
+                        cache.complete(p, 10)
+                    duration2 = time.perf_counter() - begin
+                    st = cache.stats()
+                    fLOG("{0}: {1} maxsize={2} {3:.0f} req/s hit rate={4:.3f} "
+                         "evictions={5}".format(
+                             name, policy, maxsize, len(replay) / duration2,
+                             st['hits'] / len(replay), st['evictions']))
+                    self.assertEqual(st['hits'] + st['misses'], len(replay))
+
+    def test_benchmark_compute_metrics_numpy(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample20000.txt")
+        titles = [(None, q) for q in sorted(set(enumerate_titles(data))) if q]
+        rnd = random.Random(0)
+        for name, queries in [('sample20000', titles),
+                              ('random100k', random_queries(100000)),
+                              ('random300k', random_queries(300000)),
+                              ('random100k-long', [(None, q + " " + rnd.choice(titles)[1])
+                                                   for _, q in random_queries(100000)])]:
+            res = {}
+            profile = {}
+            for engine in ['python', 'numpy']:
+                system = CompletionSystem(queries)
+                begin = time.perf_counter()
+                nb = system.compute_metrics(engine=engine, profile=profile)
+                res[engine] = (time.perf_counter() - begin, nb,
+                               [(e.mks0, e.mks1, e.mks2) for e in system])
+                if engine == 'python':
+                    visited = profile['compute_metrics']['visited']
+            fLOG("{0}: n={1} python={2:.3f}s numpy={3:.3f}s speed-up={4:.1f} iterations={5} "
+                 "visited={6}".format(
+                     name, len(queries), res['python'][0], res['numpy'][0],
+                     res['python'][0] / res['numpy'][0], res['numpy'][1], visited))
+            self.assertEqual(res['python'][1:], res['numpy'][1:])
+
+    def test_benchmark_columnar(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        for n in [100000, 300000]:
+            queries = [q for q in random_queries(n) if q[1]]
+            res = {}
+            for cl in [CompletionSystem, ColumnarCompletionSystem]:
+                tracemalloc.start()
+                system = cl(queries)
+                memory, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                times = []
+                for meth in [system.sort_values, system.sort_weight]:
+                    begin = time.perf_counter()
+                    meth()
+                    times.append(time.perf_counter() - begin)
+                begin = time.perf_counter()
+                system.compute_metrics(engine='numpy')
+                times.append(time.perf_counter() - begin)
+                del system
+                tracemalloc.start()
+                system = cl(queries)
+                system.compute_metrics(engine='numpy')
+                memory2, _ = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                fLOG("{0}: n={1} memory={2:.1f} bytes/element, {3:.1f} with metrics "
+                     "sort_values={4:.3f}s sort_weight={5:.3f}s compute_metrics={6:.3f}s".format(
+                         cl.__name__, len(system), memory / len(system),
+                         memory2 / len(system), *times))
+                res[cl] = [(e.mks0, e.mks1, e.mks2) for e in system]
+                del system
+            self.assertEqual(res[CompletionSystem], res[ColumnarCompletionSystem])
+
+    def test_benchmark_details(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample20000.txt")
+        titles = [(None, q) for q in sorted(set(enumerate_titles(data))) if q]
+        for name, queries in [('sample20000', titles),
+                              ('random100k', random_queries(100000))]:
+            chars = sum(len(q) for _, q in queries)
+            for details in [False, True]:
+                system = CompletionSystem(queries)
+                profile = {}
+                tracemalloc.start()
+                begin = time.perf_counter()
+                system.compute_metrics(details=details, profile=profile)
+                duration = time.perf_counter() - begin
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                size = profile['compute_metrics']['details']
+                fLOG("{0}: n={1} details={2} time={3:.3f}s peak={4:.1f}Mb "
+                     "details={5:.1f}Mb ({6:.1f} bytes/character)".format(
+                         name, len(queries), details, duration, peak / 2 ** 20,
+                         size / 2 ** 20, size / chars))
+                # at most one stored completion and one prefix per character
+                self.assertLessEqual(size, chars * (4 + 8 + 4 + 1) + 8 * (len(queries) + 2))
+            self.assertIn('------------------', system[len(system) // 2].str_all_completions())
+            del system
+
+    def test_benchmark_find(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [q for q in random_queries(100000) if q[1]]
+        system = CompletionSystem(queries)
+        begin = time.perf_counter()
+        diffs = system.compare_with_trie()
+        duration = time.perf_counter() - begin
+        fLOG("compare_with_trie: n={0} time={1:.3f}s".format(len(system), duration))
+        self.assertEmpty(diffs)
+
+        # evaluation loop, one search per element
+        values = [e.value for e in system]
+        rnd = random.Random(0)
+        sample = rnd.sample(values, 200)
+        begin = time.perf_counter()
+        for v in sample:
+            next(e for e in system if e.value == v)
+        linear = (time.perf_counter() - begin) * len(values) / len(sample)
+        begin = time.perf_counter()
+        system._index = None
+        for v in values:
+            system.find(v)
+        indexed = time.perf_counter() - begin
+        begin = time.perf_counter()
+        for v in values:
+            system.find(v, is_sorted=True)
+        bisect = time.perf_counter() - begin
+        fLOG("find x {0}: linear={1:.1f}s (extrapolated) index={2:.3f}s "
+             "bisect={3:.3f}s".format(len(values), linear, indexed, bisect))
+
+    def test_benchmark_overlay(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(i, q) for i, (_, q) in enumerate(random_queries(100000)) if q]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        rnd = random.Random(0)
+        histories = []
+        for _ in range(2000):
+            # recent queries, most of them are in the global trie
+            hist = [q for _, q in rnd.sample(queries, 50)]
+            hist = [q if rnd.random() < 0.8 else q + " x" for q in hist]
+            histories.append([(i, q) for i, q in enumerate(hist)])
+        prefixes = [q[:rnd.randint(1, 4)] for h in histories for _, q in h[:5]]
+
+        begin = time.perf_counter()
+        overlays = [CompletionOverlay.build(trie, h, user_scale=0.01) for h in histories]
+        duration = time.perf_counter() - begin
+        del overlays
+        tracemalloc.start()
+        overlays = [CompletionOverlay.build(trie, h, user_scale=0.01) for h in histories]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        fLOG("overlays={0} build={1:.3f}ms/overlay memory={2:.1f}Kb/overlay".format(
+            len(overlays), duration * 1000 / len(overlays),
+            current / 1024 / len(overlays)))
+
+        begin = time.perf_counter()
+        for i, p in enumerate(prefixes):
+            trie.complete(p, 10)
+        duration = time.perf_counter() - begin
+        begin = time.perf_counter()
+        for i, p in enumerate(prefixes):
+            overlays[i // 5].complete(p, 10)
+        duration2 = time.perf_counter() - begin
+        fLOG("queries={0} global={1:.1f}us overlay={2:.1f}us".format(
+            len(prefixes), duration * 1e6 / len(prefixes), duration2 * 1e6 / len(prefixes)))
+        res = overlays[0].complete(histories[0][0][1][:1], 10)
+        self.assertEqual(res[0], (0, histories[0][0][1]))
+
+    def test_benchmark_server(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [q for q in random_queries(100000) if q[1]]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        rnd = random.Random(1)
+        prefixes = [q[:rnd.randint(1, len(q))] for _, q in rnd.sample(queries, 10000)]
+
+        async def run(server, concurrency):
+            await server.start(port=0)
+            res = await load_generator(prefixes, port=server.port,
+                                       concurrency=concurrency, requests=5000)
+            await server.close()
+            return res
+
+        for window in [0, 0.001, 0.005]:
+            for concurrency in [1, 16, 64]:
+                server = CompletionServer(trie, window=window)
+                res = asyncio.run(run(server, concurrency))
+                st = server.stats()
+                fLOG("window={0} concurrency={1}: {2:.0f} req/s p50={3:.2f}ms p99={4:.2f}ms "
+                     "mean batch={5:.1f}".format(
+                         window, concurrency, res['throughput'], res['p50'] * 1000,
+                         res['p99'] * 1000, st['mean_batch']))
+                self.assertEqual(res['errors'], 0)
+
+    def test_benchmark_build_sorted(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        temp = get_temp_folder(__file__, "temp_benchmark_build_sorted")
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample20000.txt")
+        files = []
+        for name, titles in [('sample20000', enumerate_titles(data)),
+                             ('random100k', (q for _, q in random_queries(100000)))]:
+            filename = os.path.join(temp, name + ".txt")
+            with open(filename, "w", encoding="utf-8") as f:
+                for t in sorted(set(titles)):
+                    f.write(t + "\n")
+            files.append((name, filename))
+
+        def build_list(filename):
+            # the usual way, the titles are loaded first
+            titles = sorted(set(enumerate_titles(filename, norm=False)))
+            return CompletionTrieNode.build(titles)
+
+        def build_stream(filename):
+            return CompletionTrieNode.build(enumerate_titles(filename, norm=False))
+
+        def build_sorted(filename):
+            return CompletionTrieNode.build(
+                enumerate_titles(filename, norm=False), is_sorted=True)
+
+        for name, filename in files:
+            for fname, fct in [('list+build', build_list), ('stream', build_stream),
+                               ('stream+sorted', build_sorted)]:
+                begin = time.perf_counter()
+                trie = fct(filename)
+                duration = time.perf_counter() - begin
+                del trie
+                tracemalloc.start()
+                trie = fct(filename)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                del trie
+                fLOG("{0} {1}: time={2:.3f}s peak={3:.1f}Mb".format(
+                    name, fname, duration, peak / 2 ** 20))
+
+    def test_benchmark_test_metric(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(None, q) for _, q in random_queries(100000) if q]
+        trie = CompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        words = [q for _, q in queries]
+
+        # one call per word and per metric
+        begin = time.perf_counter()
+        total = 0.
+        for w in words:
+            total += trie.min_keystroke0(w)[0] + trie.min_dynamic_keystroke(w)[0] + \
+                trie.min_dynamic_keystroke2(w)[0]
+        duration = time.perf_counter() - begin
+        begin = time.perf_counter()
+        res = trie.test_metric((w, 1.) for w in words)
+        duration2 = time.perf_counter() - begin
+        fLOG("words={0} min_keystroke*={1:.3f}s test_metric={2:.3f}s".format(
+            len(words), duration, duration2))
+        self.assertAlmostEqual(res['mks0'] + res['mks1'] + res['mks2'], total, places=3)
+
+        # zipf-like frequencies, one query out of ten is not in the trie
+        rnd = random.Random(0)
+        sample = [words[min(int(rnd.paretovariate(0.5)), len(words)) - 1] + ("z" if i % 10 == 0 else "")
+                  for i in range(100000)]
+
+        def query_log(n):
+            for i in range(n):
+                yield sample[i % len(sample)], 1.
+
+        for n in [100000, 1000000]:
+            begin = time.perf_counter()
+            res = trie.test_metric(query_log(n))
+            duration = time.perf_counter() - begin
+            tracemalloc.start()
+            trie.test_metric(query_log(n))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            fLOG("log={0} time={1:.3f}s peak={2:.1f}Mb found={3} mks1={4:.3f}".format(
+                n, duration, peak / 2 ** 20, res['found'], res['mks1'] / res['sum_weights']))
+            self.assertEqual(res['n'], n)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,9 +3,11 @@
 @brief      test log(time=3s)
 """
 import os
+import random
 import unittest
 import itertools
 from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import get_temp_folder
 from mlstatpy.nlp.completion import CompletionTrieNode
 from mlstatpy.data.wikipedia import normalize_wiki_text, enumerate_titles
 from mlstatpy.nlp.normalize import remove_diacritics
@@ -111,6 +113,321 @@ class TestCompletion(unittest.TestCase):
             text = leave.str_all_completions(use_precompute=False)
             assert text
 
+    def test_precompute_stat_postorder(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(None, 'a'), (None, 'ab'), (None, 'abc'),
+                   (None, 'abd'), (None, 'b')]
+        trie = CompletionTrieNode.build(queries)
+        nodes = list(trie.postorder_iter())
+        self.assertEqual(len(nodes), len(list(trie)))
+        self.assertEqual(len(set(id(n) for n in nodes)), len(nodes))
+        self.assertEqual(id(nodes[-1]), id(trie))
+        seen = set()
+        for node in nodes:
+            if node.children:
+                for v in node.children.values():
+                    self.assertIn(id(v), seen)
+            seen.add(id(node))
+
+        trie.precompute_stat()
+        self.assertEqual([s.value for _, s in trie.stat.completions],
+                         ['a', 'ab', 'abc'])
+        mks = [(n.value, n.stat.mks0) for n in trie.leaves()]
+        trie.precompute_stat()
+        self.assertEqual(mks, [(n.value, n.stat.mks0) for n in trie.leaves()])
+
+    def test_merge_completions_same_weight(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        trie = CompletionTrieNode.build(['ab', 'ac', 'a', 'abcd', 'b'])
+        trie.precompute_stat()
+        # same weights, children lists come first, then the leaves
+        self.assertEqual([s.value for _, s in trie.stat.completions],
+                         ['abcd', 'ab', 'ac', 'a'])
+        self.assertEqual([s.value for _, s in trie.find('a').stat.completions],
+                         ['abcd', 'ab', 'ac'])
+
+    def test_min_keystroke_many(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample300.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+
+        trie = CompletionTrieNode.build([(None, q) for q in lines])
+        words = lines + ['zzz', lines[0] + 'zzz', '']
+        mks, best = trie.min_keystroke_many(words)
+        self.assertEqual(mks.shape, (len(words), ))
+        for w, m, b in zip(words, mks, best):
+            self.assertEqual((m, b), trie.min_keystroke(w))
+
+        queries = [(1, 'a'), (2, 'ab'), (3, 'abc'), (4, 'abcd'), (5, 'bc')]
+        trie = CompletionTrieNode.build(queries)
+        mks, best = trie.min_keystroke_many(['abc', 'ab', 'b'])
+        self.assertEqual(mks.tolist(), [3, 2, 1])
+        self.assertEqual(best.tolist(), [3, 2, -1])
+
+    def test_build_sorted(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        def dump(trie):
+            return [(n.value, n.leave, n.weight, n.disp, n.parent.value if n.parent else None)
+                    for n in trie]
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        lines = list(sorted(set(lines)))
+        for queries in [[(None, q) for q in lines],
+                        [(len(q) % 7, q) for q in lines],
+                        [(1, 'a'), (3, 'ab', 'AB'), (0, 'abc'), (2, 'abd'), (5, 'b')],
+                        [(2, ''), (3, 'ab'), (1, 'b')]]:
+            expected = CompletionTrieNode.build(queries, topk=3)
+            trie = CompletionTrieNode.build(iter(queries), topk=3, is_sorted=True)
+            self.assertEqual(dump(trie), dump(expected))
+            self.assertEqual(trie.complete('a', 3), expected.complete('a', 3))
+
+        self.assertRaises(ValueError, lambda: CompletionTrieNode.build(
+            ['a', 'c', 'b'], is_sorted=True))
+        self.assertRaises(ValueError, lambda: CompletionTrieNode.build(
+            ['a', 'b', 'b'], is_sorted=True))
+
+        # titles read one by one from a sorted file
+        titles = os.path.join(this, "data", "wikititles.txt")
+        expected = CompletionTrieNode.build(sorted(set(enumerate_titles(titles))))
+        self.assertRaises(ValueError, lambda: CompletionTrieNode.build(
+            enumerate_titles(titles), is_sorted=True))
+        temp = get_temp_folder(__file__, "temp_build_sorted")
+        sorted_titles = os.path.join(temp, "titles.txt")
+        with open(sorted_titles, "w", encoding="utf-8") as f:
+            for t in sorted(set(enumerate_titles(titles))):
+                f.write(t + "\n")
+        trie = CompletionTrieNode.build(
+            enumerate_titles(sorted_titles, norm=False), is_sorted=True)
+        self.assertEqual(dump(trie), dump(expected))
+
+    def test_update_stat_dynamic_worklist(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+
+        trie = CompletionTrieNode.build([(None, q) for q in lines])
+        trie.precompute_stat()
+        nb = trie.update_stat_dynamic()
+        nodes = list(trie)
+        touched = trie.meta['touched']
+        # the first iteration does not update anything
+        self.assertEqual(len(touched), nb)
+        self.assertEqual(nb, 1)
+        self.assertEqual(touched[0], len(nodes))
+
+        # the number of iterations does not depend on the worklist
+        for queries, expected in [([(1, 'a'), (2, 'b')], 1),
+                                  ([(1, 'a'), (2, 'ab')], 1),
+                                  ([(1, 'abc'), (2, 'abd'), (3, 'b')], 1),
+                                  ([(1, ''), (7, 'ba'), (1, 'bb'), (7, 'bbbb')], 2)]:
+            small = CompletionTrieNode.build(queries)
+            small.precompute_stat()
+            self.assertEqual(small.update_stat_dynamic(), expected)
+
+        # full sweeps until nothing changes, the metrics must not move
+        metrics = [(n.stat.mks1, n.stat.mks1_, n.stat.mks2, n.stat.mks2_)
+                   for n in nodes]
+        for node in nodes:
+            updates = node.stat.update_dynamic_minimum_keystroke(
+                len(node.value), 0.8)
+            self.assertEqual(updates, 0)
+        self.assertEqual(metrics, [(n.stat.mks1, n.stat.mks1_, n.stat.mks2, n.stat.mks2_)
+                                   for n in nodes])
+
+    def test_update_stat_dynamic_revisit(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        class PostorderTrie(CompletionTrieNode):
+            # the first iteration visits the children before their parent,
+            # the nodes improved by their ancestors must be visited again
+            __slots__ = ()
+
+            def unsorted_iter(self):
+                return self.postorder_iter()
+
+        rnd = random.Random(0)
+        revisited = 0
+        for _ in range(30):
+            words = sorted(set("".join(rnd.choice('ab') for _ in range(rnd.randint(0, 10)))
+                               for _ in range(rnd.randint(1, 80))))
+            queries = [(rnd.random(), w) for w in words]
+            expected = CompletionTrieNode.build(queries)
+            expected.precompute_stat()
+            expected.update_stat_dynamic()
+            trie = CompletionTrieNode.build(queries)
+            trie.precompute_stat()
+            trie.__class__ = PostorderTrie
+            profile = {}
+            nb = trie.update_stat_dynamic(profile=profile)
+            touched = trie.meta['touched']
+            # the last iteration is counted but not run if the previous one updated something
+            last = 1 if profile['update_stat_dynamic']['updates'][-1] > 0 else 0
+            self.assertEqual(len(touched) + last, nb)
+            self.assertEqual(touched[0], len(list(trie)))
+            if len(touched) > 1:
+                revisited += 1
+            for e, n in zip(expected, trie):
+                self.assertEqual((e.value, e.stat.mks1, e.stat.mks1_, e.stat.mks2, e.stat.mks2_),
+                                 (n.value, n.stat.mks1, n.stat.mks1_, n.stat.mks2, n.stat.mks2_))
+        self.assertGreater(revisited, 0)
+
+    def test_profile(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        lines = [_ for _ in lines if _]
+        queries = [(None, q) for q in lines]
+
+        profile = {}
+        trie = CompletionTrieNode.build(queries, profile=profile)
+        nodes = list(trie)
+        build = profile['build']
+        self.assertEqual(build['words'], len(queries))
+        self.assertEqual(build['nodes'], len(nodes))
+        self.assertGreater(build['time'], 0)
+
+        sorted_profile = {}
+        CompletionTrieNode.build(sorted(queries, key=lambda q: q[1]), is_sorted=True,
+                                 profile=sorted_profile)
+        self.assertEqual(sorted_profile['build']['nodes'], len(nodes))
+        self.assertEqual(sorted_profile['build']['words'], len(queries))
+
+        trie.precompute_stat(profile=profile)
+        stat = profile['precompute_stat']
+        self.assertEqual(stat['nodes'], len(nodes))
+        self.assertEqual(stat['merges'] + stat['chains'],
+                         len([n for n in nodes if n.children]))
+        self.assertGreater(stat['merges'], 0)
+
+        calls = []
+        nb = trie.update_stat_dynamic(profile=lambda phase, info: calls.append((phase, info)))
+        self.assertEqual(len(calls), 1)
+        phase, info = calls[0]
+        self.assertEqual(phase, 'update_stat_dynamic')
+        self.assertEqual(info['iterations'], nb)
+        self.assertEqual(info['touched'], trie.meta['touched'])
+        self.assertEqual(len(info['updates']), len(info['touched']))
+
+        # the metrics do not depend on the profiling
+        trie2 = CompletionTrieNode.build(queries)
+        trie2.precompute_stat()
+        trie2.update_stat_dynamic()
+        self.assertEqual([(n.value, n.stat.mks0, n.stat.mks1, n.stat.mks2) for n in trie2],
+                         [(n.value, n.stat.mks0, n.stat.mks1, n.stat.mks2) for n in trie])
+
+    def test_test_metric(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        lines = [_ for _ in lines if _]
+
+        trie = CompletionTrieNode.build([(None, q) for q in lines])
+        self.assertRaises(AttributeError, lambda: trie.test_metric([('a', 1.)]))
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+
+        qset = [(q, float(i % 7 + 1)) for i, q in enumerate(lines)]
+        qset += [(q + "#", 2.) for q in lines[:50]]
+        qset += [("#", 1.), (lines[0][:3], 3.)]
+
+        expected = dict(mks0=0., mks1=0., mks2=0., sum_weights=0., sum_wlen=0.)
+        hist = {}
+        for q, w in qset:
+            le = len(q)
+            while trie.find(q[:le]) is None:
+                le -= 1
+            node = trie.find(q[:le])
+            if le == len(q):
+                m0 = trie.min_keystroke0(q)[0]
+                m1 = trie.min_dynamic_keystroke(q)[0]
+                m2 = trie.min_dynamic_keystroke2(q)[0]
+            else:
+                m0 = len(q)
+                m1 = node.stat.mks1 + len(q) - le
+                m2 = node.stat.mks2 + len(q) - le
+            expected["mks0"] += w * m0
+            expected["mks1"] += w * m1
+            expected["mks2"] += w * m2
+            expected["sum_weights"] += w
+            expected["sum_wlen"] += w * len(q)
+            hist[m1] = hist.get(m1, 0) + w
+
+        for batch in [7, 65536]:
+            res = trie.test_metric(iter(qset), batch=batch)
+            self.assertEqual(res["n"], len(qset))
+            self.assertEqual(res["found"], len(lines))
+            for k, v in expected.items():
+                self.assertAlmostEqual(res[k], v, places=6)
+            self.assertEqual(set(res["hist"]["mks1"]), set(hist))
+            for k, v in hist.items():
+                self.assertAlmostEqual(res["hist"]["mks1"][k], v, places=6)
+            self.assertEqual(sum(res["histnow"]["l"].values()), len(qset))
+
+    def test_stat_slots(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'a'), (2, 'ab'), (3, 'abc'), (4, 'abcd'), (5, 'bc')]
+        trie = CompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        self.assertFalse(hasattr(trie.stat, '__dict__'))
+        node = trie.find('abc')
+        self.assertEqual(node.stat.mks0, 3)
+        self.assertEqual(node.stat.mks1, None)
+        self.assertRaises(AttributeError,
+                          lambda: trie.min_dynamic_keystroke('abc'))
+        self.assertRaises(AttributeError,
+                          lambda: trie.min_dynamic_keystroke2('abc'))
+        trie.update_stat_dynamic()
+        self.assertEqual(trie.min_dynamic_keystroke('abc'), (3, 3, 0))
+        self.assertEqual(trie.find('ab').stat.next_nodes,
+                         trie.find('ab').children)
+        self.assertEqual(trie.find('abcd').stat.next_nodes, None)
+
     def test_permutations(self):
         fLOG(
             __file__,
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=2s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_cache import CompletionCache
+from mlstatpy.nlp.completion_sorted import CompletionSortedArray
+
+
+class TestCompletionCache(ExtTestCase):
+
+    def test_cache_lru(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b')]
+        trie = CompletionTrieNode.build(queries, topk=5)
+        cache = CompletionCache(trie, maxsize=2)
+        self.assertEqual(cache.complete('a', 5), [(1, 'abc'), (2, 'abd')])
+        self.assertEqual(cache.complete('a', 5), [(1, 'abc'), (2, 'abd')])
+        self.assertEqual(cache.complete('a', 1), [(1, 'abc')])
+        cache.complete('a', 5)
+        # ('a', 1) is the least recently used
+        cache.complete('b', 5)
+        self.assertEqual(cache.stats(), dict(hits=2, misses=3, evictions=1,
+                                             invalidations=0, size=2, maxsize=2))
+        cache.complete('a', 5)
+        self.assertEqual(cache.hits, 3)
+        cache.complete('a', 1)
+        self.assertEqual(cache.misses, 4)
+
+        # the returned list is a copy
+        res = cache.complete('a', 5)
+        res.append(None)
+        self.assertEqual(cache.complete('a', 5), [(1, 'abc'), (2, 'abd')])
+
+        self.assertRaise(lambda: CompletionCache(trie, policy='fifo'), ValueError)
+        self.assertRaise(lambda: CompletionCache(trie, maxsize=0), ValueError)
+
+    def test_cache_lfu(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b')]
+        engine = CompletionSortedArray(queries)
+        cache = CompletionCache(engine, maxsize=2, policy='lfu')
+        for p in ['a', 'a', 'a', 'b', 'b', 'c']:
+            cache.complete(p)
+        # 'b' (2) has a lower frequency than 'a' (3) when 'c' comes in
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(set(k for k, _ in cache._values), {'a', 'c'})
+        cache.complete('d')
+        self.assertEqual(set(k for k, _ in cache._values), {'a', 'd'})
+        self.assertEqual(cache.stats(), dict(hits=3, misses=4, evictions=2,
+                                             invalidations=0, size=2, maxsize=2))
+        self.assertEqual(cache.complete('b'), [(3.0, 'bcd'), (4.0, 'b')])
+
+    def test_cache_invalidation(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b')]
+        for topk in [None, 5]:
+            trie = CompletionTrieNode.build(queries, topk=topk)
+            if topk is None:
+                trie.precompute_topk(5)
+            for policy in ['lru', 'lfu']:
+                cache = CompletionCache(trie, maxsize=10, policy=policy)
+                self.assertEqual(cache.complete('a', 5), [(1, 'abc'), (2, 'abd')])
+                trie.insert('ab', 1.5)
+                self.assertEqual(cache.complete('a', 5),
+                                 [(1, 'abc'), (1.5, 'ab'), (2, 'abd')])
+                trie.reweight('ab', 3)
+                self.assertEqual(cache.complete('a', 5),
+                                 [(1, 'abc'), (2, 'abd'), (3, 'ab')])
+                trie.remove('ab')
+                self.assertEqual(cache.complete('a', 5), [(1, 'abc'), (2, 'abd')])
+                self.assertEqual(cache.invalidations, 3)
+                self.assertEqual(cache.hits, 0)
+
+    def test_cache_random(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(i, q) for i, q in enumerate(sorted(set(lines))) if q]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        rnd = random.Random(0)
+        prefixes = [q[:rnd.randint(0, 3)] for _, q in queries]
+        for policy in ['lru', 'lfu']:
+            cache = CompletionCache(trie, maxsize=50, policy=policy)
+            for _ in range(2000):
+                p = rnd.choice(prefixes)
+                self.assertEqual(cache.complete(p, 5), trie.complete(p, 5))
+                self.assertLesser(len(cache), 50)
+            st = cache.stats()
+            self.assertEqual(st['hits'] + st['misses'], 2000)
+            self.assertEqual(st['misses'] - st['evictions'], len(cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=3s)
+"""
+import os
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion_simple import CompletionSystem, CompletionElement
+from mlstatpy.nlp.completion_columnar import ColumnarCompletionSystem
+
+
+class TestCompletionColumnar(ExtTestCase):
+
+    def assertSameElements(self, expected, got):
+        self.assertEqual(len(expected), len(got))
+        for a, b in zip(expected, got):
+            self.assertEqual(a.value, b.value)
+            self.assertEqual(a.weight, b.weight)
+            for k in ['mks0', 'mks0_', 'mks1', 'mks1_', 'mks2', 'mks2_']:
+                self.assertEqual(getattr(a, k), getattr(b, k))
+            self.assertEqual(a.prefix.value, b.prefix.value)
+
+    def test_columnar_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        comp = [(4, 'abcd'), (2, 'ab'), (1, 'a'), (3, 'abc'), (5, 'bc')]
+        cset = ColumnarCompletionSystem(comp)
+        self.assertEqual(len(cset), 5)
+        self.assertEqual(list(cset.tuples()), [(4., 'abcd'), (2., 'ab'), (1., 'a'),
+                                               (3., 'abc'), (5., 'bc')])
+        self.assertEqual(cset[1].value, 'ab')
+        self.assertFalse(hasattr(cset[1], 'mks0'))
+        cset.sort_weight()
+        self.assertEqual(cset.values(), ['a', 'ab', 'abc', 'abcd', 'bc'])
+        cset.sort_values()
+        self.assertEqual(cset.find('abc').weight, 3)
+        self.assertEqual(cset.find('abc', is_sorted=True).weight, 3)
+        self.assertEmpty(cset.find('abz'))
+        self.assertEmpty(cset.find('abz', is_sorted=True))
+
+        ref = CompletionSystem(comp)
+        ref.compute_metrics()
+        self.assertEqual(cset.compute_metrics(), 1)
+        self.assertSameElements(list(ref), list(cset))
+        self.assertEqual(cset.find('abcd').prefix.value, ref.find('abcd').prefix.value)
+        queries = [(q, w) for w, q in comp] + [('abcde', 1), ('b', 2)]
+        self.assertEqual(cset.test_metric(queries), ref.test_metric(queries))
+        self.assertEmpty(cset.compare_with_trie())
+
+        # details=True, the metrics are computed by CompletionSystem,
+        # the weights are stored as floats
+        ref = CompletionSystem([(float(w), q) for w, q in comp])
+        self.assertEqual(cset.compute_metrics(details=True),
+                         ref.compute_metrics(details=True))
+        self.assertSameElements(list(ref), list(cset))
+        # the first line shows the metrics, mks2 is a float in a column
+        self.assertEqual([e.str_all_completions().split('\n')[1:] for e in cset],
+                         [e.str_all_completions().split('\n')[1:] for e in ref])
+        self.assertEqual([[_ if isinstance(_, tuple) else _.value for _ in e._info._log_imp]
+                          for e in cset],
+                         [[_ if isinstance(_, tuple) else _.value for _ in e._info._log_imp]
+                          for e in ref])
+        self.assertEqual(cset.compute_metrics(), 1)
+        self.assertEmpty(cset.details)
+        self.assertEmpty(cset[0]._info)
+        self.assertRaise(lambda: cset.compute_metrics(engine='python'), NotImplementedError)
+        self.assertRaise(lambda: ColumnarCompletionSystem([(1, 2)]), TypeError)
+
+    def test_columnar_duplicates(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        comp = [CompletionElement('b', 3, disp='B'), CompletionElement('a', 2),
+                CompletionElement('b', 1), CompletionElement('ba', 4)]
+        cset = ColumnarCompletionSystem(comp)
+        self.assertEqual(cset.find('b').weight, 3)
+        self.assertEqual(cset.find('b').disp, 'B')
+        cset.sort_values()
+        self.assertEqual(list(cset.tuples()), [(2., 'a'), (1., 'b'), (3., 'b'), (4., 'ba')])
+        self.assertEqual(cset.find('b').weight, 1)
+        cset.sort_weight()
+        self.assertEqual(cset.values(), ['b', 'a', 'b', 'ba'])
+
+    def test_columnar_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        comp = [(i + 1, q) for i, q in enumerate(lines) if q]
+
+        ref = CompletionSystem(comp)
+        cset = ColumnarCompletionSystem(comp)
+        for delta in [0.8, 1.5]:
+            profile = {}
+            it = ref.compute_metrics(delta=delta, engine='numpy')
+            self.assertEqual(cset.compute_metrics(delta=delta, profile=profile), it)
+            self.assertEqual(profile['compute_metrics']['iterations'], it)
+            self.assertSameElements(list(ref), list(cset))
+        queries = [(q, 1) for _, q in comp[::3]] + [(q + 'z', 1) for _, q in comp[::7]]
+        self.assertEqual(cset.test_metric(queries), ref.test_metric(queries))
+        self.assertSameElements([ref.find(q) for _, q in comp[::13]],
+                                [cset.find(q) for _, q in comp[::13]])
+
+
+if __name__ == "__main__":
+    unittest.main()
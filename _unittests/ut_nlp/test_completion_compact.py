@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=4s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_compact import CompactCompletionTrie
+
+
+class TestCompletionCompact(ExtTestCase):
+
+    def test_build_compact(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'a'), (2, 'ab'), (3, 'abc'), (4, 'abcd'), (5, 'bc')]
+        trie = CompactCompletionTrie.build(queries)
+        self.assertEqual(len(trie), 7)
+        self.assertEqual(list(trie.children(0)), [1, 2])
+        node = trie.find('b')
+        self.assertNotEmpty(node)
+        self.assertFalse(trie.leaves[node])
+        node = trie.find('ab')
+        self.assertTrue(trie.leaves[node])
+        self.assertEqual(trie.value(node), 'ab')
+        self.assertEqual(trie.find('abe'), None)
+        self.assertEqual(trie.find(''), 0)
+        self.assertRaise(lambda: CompactCompletionTrie.build(['a', 'a']),
+                         ValueError)
+        self.assertRaise(lambda: trie.min_keystroke0('ab'), AttributeError)
+        trie.precompute_stat()
+        self.assertEqual(trie.completions(0),
+                         [(1.0, 'a'), (2.0, 'ab'), (3.0, 'abc'), (4.0, 'abcd')])
+
+    def test_compare_with_trie(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(None, q) for q in lines]
+
+        trie = CompletionTrieNode.build(queries, topk=5)
+        trie.precompute_stat()
+        nb = trie.update_stat_dynamic()
+        self.assertEqual(CompactCompletionTrie.build(queries).complete('~~'), [])
+        compact = CompactCompletionTrie.build(queries)
+        compact.precompute_stat()
+        self.assertEqual(compact.update_stat_dynamic(), nb)
+        self.assertEqual(len(compact), len(list(trie)))
+
+        for node in trie:
+            i = compact.find(node.value)
+            self.assertEqual(compact.value(i), node.value)
+            self.assertEqual(compact.weights[i], node.weight)
+            self.assertEqual(compact.leaves[i], node.leave)
+            self.assertEqual(compact.completions(i),
+                             [(w, s.value) for w, s in node.stat.completions])
+        for q in lines:
+            for k in (1, 5):
+                self.assertEqual(compact.complete(q[:2], k), trie.complete(q[:2], k))
+            self.assertEqual(compact.min_keystroke0(q), trie.min_keystroke0(q))
+            self.assertEqual(compact.min_dynamic_keystroke(q),
+                             trie.min_dynamic_keystroke(q))
+            self.assertEqual(compact.min_dynamic_keystroke2(q),
+                             trie.min_dynamic_keystroke2(q))
+
+        mem = trie.memory_usage()
+        cmem = compact.memory_usage()
+        fLOG("bytes per word: trie={0} compact={1}".format(
+            mem['bytes_per_word'], cmem['bytes_per_word']))
+        self.assertEqual(mem['words'], cmem['words'])
+        self.assertEqual(mem['nodes'], cmem['nodes'])
+        self.assertLess(cmem['bytes_per_word'] * 5, mem['bytes_per_word'])
+
+    def test_build_weights(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        rnd = random.Random(0)
+        for _ in range(30):
+            words = sorted(set("".join(rnd.choice('abc') for _ in range(rnd.randint(1, 5)))
+                               for _ in range(rnd.randint(1, 40))))
+            queries = [(rnd.randint(0, 9), w) for w in words]
+            # the weight of a leave is its own weight, the lowest weight
+            # of the words below for the others
+            expected = {'': min(w for w, _ in queries)}
+            for w, q in queries:
+                for i in range(1, len(q)):
+                    expected[q[:i]] = min(expected.get(q[:i], w), w)
+            expected.update({q: w for w, q in queries})
+
+            shuffled = list(queries)
+            rnd.shuffle(shuffled)
+            compact = CompactCompletionTrie.build(shuffled)
+            for built in [CompletionTrieNode.build(queries),
+                          CompletionTrieNode.build(shuffled),
+                          CompletionTrieNode.build(queries, is_sorted=True)]:
+                self.assertEqual(expected, {n.value: n.weight for n in built})
+            self.assertEqual(expected, {compact.value(i): compact.weights[i]
+                                        for i in range(len(compact))})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=3s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_dawg import CompletionDAWG
+from mlstatpy.data.wikipedia import enumerate_titles
+
+
+class TestCompletionDAWG(ExtTestCase):
+
+    def compare(self, queries, mks0=True):
+        trie = CompletionTrieNode.build(queries, topk=5)
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        dawg = CompletionDAWG.build(queries)
+        words = [q[1] for q in queries]
+        self.assertEqual([w for _, w in dawg], words)
+        for i, w in enumerate(words):
+            self.assertEqual(dawg.index(w), i)
+            self.assertEqual(dawg.word(i), w)
+            self.assertEqual((w, dawg.min_keystroke(w)), (w, trie.min_keystroke(w)))
+            if mks0:
+                # only true with distinct weights
+                self.assertEqual((w, dawg.min_keystroke0(w)), (w, trie.min_keystroke0(w)))
+            for k in range(len(w) + 1):
+                self.assertEqual(dawg.complete(w[:k], 5), trie.complete(w[:k], 5))
+        return trie, dawg
+
+    def test_dawg_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(None, ''), (None, 'abc'), (2, 'abcd'), (None, 'ac'),
+                   (None, 'acd'), (0.5, 'b', 'B'), (None, 'bcd')]
+        trie, dawg = self.compare(queries)
+        # 'abcd' and 'acd' share the states after 'abc' and 'ac',
+        # every word ends in the same final state
+        self.assertEqual(len(list(trie)), 10)
+        self.assertEqual(len(dawg), 7)
+        self.assertEqual(dawg.index('ab'), -1)
+        self.assertEqual(dawg.prefix_range('ab'), (1, 3))
+        self.assertEmpty(dawg.prefix_range('abe'))
+        self.assertEqual(dawg.complete('a'), [(1.0, 'abc'), (2.0, 'abcd'),
+                                              (3.0, 'ac'), (4.0, 'acd')])
+        self.assertEqual(dawg.disp, {5: 'B'})
+        # a word outside the vocabulary
+        self.assertEqual(dawg.min_keystroke('ab'), (2, -1))
+        self.assertEqual(dawg.min_keystroke('xyz'), (3, -1))
+        self.assertEqual(dawg.min_keystroke('xyz'), trie.min_keystroke('xyz'))
+        self.assertEqual(dawg.min_keystroke('abcde'), trie.min_keystroke('abcde'))
+        self.assertRaise(lambda: dawg.min_keystroke0('xyz'), NotImplementedError)
+        self.assertRaise(lambda: dawg.min_keystroke0('ab'), NotImplementedError)
+        self.assertRaise(lambda: dawg.word(7), IndexError)
+        self.assertRaise(lambda: CompletionDAWG.build(['b', 'a']), ValueError)
+        self.assertRaise(lambda: CompletionDAWG.build(['a', 'a']), ValueError)
+
+        dawg.set_weights([6, 5, 4, 3, 2, 1, 0])
+        self.assertEqual(dawg.complete('a', 2), [(2.0, 'acd'), (3.0, 'ac')])
+        self.assertEqual(dawg.min_keystroke('abc'), (3, 3))
+        self.assertEqual(dawg.min_keystroke('abcd'), (3, 2))
+        self.assertRaise(lambda: dawg.set_weights([0, 1]), ValueError)
+        mem = dawg.memory_usage()
+        self.assertEqual(mem['nodes'], 7)
+        self.assertEqual(mem['words'], 7)
+
+    def test_dawg_random(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        rnd = random.Random(0)
+        differ = 0
+        for i in range(20):
+            words = set("".join(rnd.choice('ab') for _ in range(rnd.randint(1, 6)))
+                        for _ in range(rnd.randint(5, 40)))
+            weights = list(range(len(words)))
+            rnd.shuffle(weights)
+            _, dawg = self.compare(list(zip(weights, sorted(words))))
+            # a prefix is not a completion of itself for mks0
+            differ += sum(dawg.min_keystroke(w) != dawg.min_keystroke0(w)[:2]
+                          for w in words)
+        self.assertGreater(differ, 0)
+
+    def test_dawg_ties(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        rnd = random.Random(0)
+        for i in range(20):
+            words = set("".join(rnd.choice('abc') for _ in range(rnd.randint(1, 6)))
+                        for _ in range(rnd.randint(5, 40)))
+            queries = [(rnd.choice([1, 2, 3]), w) for w in sorted(words)]
+            self.compare(queries, mks0=False)
+
+    def test_dawg_titles(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        for name, n in [("sample1000.txt", 100), ("wikititles.txt", None)]:
+            data = os.path.join(this, "data", name)
+            queries = [(None, q) for q in sorted(set(enumerate_titles(data)))[:n]]
+            trie, dawg = self.compare(queries)
+            self.assertLess(len(dawg), len(list(trie)))
+            self.assertLess(dawg.memory_usage()['bytes'],
+                            trie.memory_usage()['bytes'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=5s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_radix import RadixCompletionTrieNode
+
+
+def brute_force(queries, prefix, max_edits, k):
+    """
+    Computes the edit distance between *prefix* and every prefix of every query.
+    """
+    res = []
+    for w, q in queries:
+        row = list(range(len(prefix) + 1))
+        best = row[-1]
+        for c in q:
+            prev = row
+            row = [prev[0] + 1]
+            for i in range(1, len(prefix) + 1):
+                row.append(min(row[i - 1] + 1, prev[i] + 1,
+                               prev[i - 1] + (prefix[i - 1] != c)))
+            best = min(best, row[-1])
+        if best <= max_edits:
+            res.append((best, w, q))
+    res.sort()
+    return res[:k]
+
+
+class TestCompletionFuzzy(ExtTestCase):
+
+    def test_fuzzy_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'xbc'), (5, 'a'),
+                   (6, 'axcd')]
+        trie = CompletionTrieNode.build(queries)
+        self.assertEqual(trie.fuzzy_complete('abc', 0), [(0, 1, 'abc')])
+        self.assertEqual(trie.fuzzy_complete('abc', 1),
+                         [(0, 1, 'abc'), (1, 2, 'abd'), (1, 3, 'bcd'),
+                          (1, 4, 'xbc'), (1, 6, 'axcd')])
+        self.assertEqual(trie.fuzzy_complete('abc', 1, k=2),
+                         [(0, 1, 'abc'), (1, 2, 'abd')])
+        self.assertEqual(trie.fuzzy_complete('bc', 1),
+                         [(0, 3, 'bcd'), (1, 1, 'abc'), (1, 4, 'xbc')])
+        for prefix in ['abc', 'bc', 'xcd', 'ad']:
+            for max_edits in [0, 1, 2, 3]:
+                self.assertEqual(trie.fuzzy_complete(prefix, max_edits),
+                                 brute_force(queries, prefix, max_edits, 10))
+        self.assertEqual(trie.fuzzy_complete('zzz', 1), [])
+        self.assertEqual(trie.fuzzy_complete('', 0, k=3),
+                         [(0, 1, 'abc'), (0, 2, 'abd'), (0, 3, 'bcd')])
+
+    def test_fuzzy_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(None, q) for q in sorted(set(lines)) if q]
+        queries = [(i, q) for i, (_, q) in enumerate(queries)]
+        trie = CompletionTrieNode.build(queries)
+        trie_topk = CompletionTrieNode.build(queries, topk=10)
+        radix = RadixCompletionTrieNode.build(queries, topk=10)
+        rnd = random.Random(0)
+        for _, q in rnd.sample(queries, 30):
+            prefix = list(q[:rnd.randint(1, min(len(q), 6))])
+            # one typo
+            prefix[rnd.randint(0, len(prefix) - 1)] = rnd.choice("abcde")
+            prefix = "".join(prefix)
+            for max_edits in [0, 1, 2]:
+                exp = brute_force(queries, prefix, max_edits, 10)
+                self.assertEqual(trie.fuzzy_complete(prefix, max_edits), exp)
+                self.assertEqual(trie_topk.fuzzy_complete(prefix, max_edits), exp)
+                self.assertEqual(radix.fuzzy_complete(prefix, max_edits), exp)
+
+
+if __name__ == "__main__":
+    unittest.main()
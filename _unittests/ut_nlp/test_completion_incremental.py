@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=4s)
+"""
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+
+
+class TestCompletionIncremental(ExtTestCase):
+
+    def build(self, words, topk=3):
+        trie = CompletionTrieNode.build(
+            [(w, k) for k, w in sorted(words.items())], topk=topk)
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        return trie
+
+    def compare(self, trie, words):
+        expected = self.build(words)
+        exp = {n.value: n for n in expected}
+        got = {n.value: n for n in trie}
+        self.assertEqual(sorted(exp), sorted(got))
+        for k, n in got.items():
+            e = exp[k]
+            self.assertEqual(e.leave, n.leave)
+            self.assertEqual((k, e.weight), (k, n.weight))
+            self.assertEqual([(w, s.value) for w, s in e.stat.completions],
+                             [(w, s.value) for w, s in n.stat.completions])
+            for att in ['mks0', 'mks0_', 'mks1', 'mks1_', 'mks1i_',
+                        'mks2', 'mks2_', 'mks2i_']:
+                self.assertEqual((k, att, getattr(e.stat, att)),
+                                 (k, att, getattr(n.stat, att)))
+            self.assertEqual([(w, v) for w, v, _ in e.topk],
+                             [(w, v) for w, v, _ in n.topk])
+
+    def test_insert_remove_reweight(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        words = {'a': 1., 'ab': 2., 'abc': 3., 'abcd': 4., 'bc': 5.}
+        trie = self.build(words)
+        trie.insert('abd', 0.5)
+        words['abd'] = 0.5
+        self.compare(trie, words)
+        self.assertEqual(trie.complete('ab', 2), [(0.5, 'abd'), (2., 'ab')])
+        trie.remove('abcd')
+        del words['abcd']
+        self.compare(trie, words)
+        self.assertEmpty(trie.find('abcd'))
+        trie.reweight('bc', 0.1)
+        words['bc'] = 0.1
+        self.compare(trie, words)
+        trie.remove('ab')
+        del words['ab']
+        self.compare(trie, words)
+        self.assertEqual(trie.meta['version'], 4)
+        self.assertRaise(lambda: trie.insert('a', 3.), ValueError)
+        self.assertRaise(lambda: trie.remove('ab'), KeyError)
+        self.assertRaise(lambda: trie.reweight('abe', 1.), KeyError)
+
+    def test_ancestor_weights(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        words = {'abc': 1., 'abd': 5.}
+        trie = self.build(words)
+        trie.reweight('abc', 10.)
+        words['abc'] = 10.
+        self.compare(trie, words)
+        self.assertEqual(trie.find('ab').weight, 5.)
+        trie.remove('abd')
+        del words['abd']
+        self.compare(trie, words)
+        self.assertEqual(trie.find('ab').weight, 10.)
+        self.assertEqual(trie.weight, 10.)
+
+        # without precomputed lists, the weights come from the children
+        trie = CompletionTrieNode.build([(3., 'a'), (2., 'ab'), (1., 'abc'), (4., 'b')])
+        trie.reweight('abc', 6.)
+        self.assertEqual([trie.find(p).weight for p in ['', 'a', 'ab']], [2., 3., 2.])
+        trie.remove('ab')
+        self.assertEqual([trie.find(p).weight for p in ['', 'a', 'ab']], [3., 3., 6.])
+        trie.insert('abd', 0.5)
+        self.assertEqual([trie.find(p).weight for p in ['', 'a', 'ab']], [0.5, 3., 0.5])
+
+    def test_empty_trie(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        trie = CompletionTrieNode.build([], topk=3)
+        self.assertEmpty(trie.weight)
+        words = {}
+        for w, k in [(1., 'ab'), (2., 'a'), (0.5, 'abc'), (3., 'b')]:
+            trie.insert(k, w)
+            words[k] = w
+            self.assertEqual(trie.weight, min(words.values()))
+        self.assertEqual(trie.complete('a', 3), [(0.5, 'abc'), (1., 'ab'), (2., 'a')])
+
+        trie = self.build({})
+        words = {'ab': 1., 'a': 2., 'b': 3.}
+        for k, w in words.items():
+            trie.insert(k, w)
+        self.compare(trie, words)
+        for k in ['ab', 'a', 'b']:
+            trie.remove(k)
+        self.assertEmpty(trie.weight)
+        self.assertEmpty(trie.children)
+
+    def test_random_sequence(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        rnd = random.Random(0)
+        letters = 'abc'
+        weights = list(range(1000))
+        rnd.shuffle(weights)
+
+        def random_word():
+            return "".join(rnd.choice(letters)
+                           for i in range(rnd.randint(1, 5)))
+
+        words = {}
+        while len(words) < 40:
+            words[random_word()] = float(weights.pop())
+        trie = self.build(words)
+        for i in range(150):
+            op = rnd.randint(0, 2)
+            if op == 0 or len(words) < 5:
+                w = random_word()
+                if w in words:
+                    continue
+                words[w] = float(weights.pop())
+                trie.insert(w, words[w])
+            elif op == 1:
+                w = rnd.choice(sorted(words))
+                del words[w]
+                trie.remove(w)
+            else:
+                w = rnd.choice(sorted(words))
+                words[w] = float(weights.pop())
+                trie.reweight(w, words[w])
+            self.compare(trie, words)
+
+
+if __name__ == "__main__":
+    unittest.main()
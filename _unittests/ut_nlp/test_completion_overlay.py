@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=2s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_cache import CompletionCache
+from mlstatpy.nlp.completion_overlay import CompletionOverlay
+
+
+class TestCompletionOverlay(ExtTestCase):
+
+    def brute_force(self, base, user, prefix, k, base_scale, user_scale):
+        best = {}
+        for queries, scale in [(base, base_scale), (user, user_scale)]:
+            for w, q in queries:
+                if q.startswith(prefix):
+                    w *= scale
+                    if q not in best or w < best[q]:
+                        best[q] = w
+        return sorted((w, q) for q, w in best.items())[:k]
+
+    def test_overlay_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        base = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b')]
+        user = [(1, 'abz'), (2, 'abd')]
+        trie = CompletionTrieNode.build(base, topk=5)
+        overlay = CompletionOverlay.build(trie, user, user_scale=0.5)
+        self.assertEqual(overlay.user.meta['topk'], 5)
+        self.assertEqual(overlay.complete('a', 5),
+                         [(0.5, 'abz'), (1, 'abc'), (1.0, 'abd')])
+        self.assertEqual(overlay.complete('a', 2), [(0.5, 'abz'), (1, 'abc')])
+        self.assertEqual(overlay.complete('b', 5), [(3, 'bcd'), (4, 'b')])
+        self.assertEqual(overlay.complete('x', 5), [])
+        self.assertEqual(overlay.complete_many(['b', 'a', 'ab'], 2),
+                         [[(3, 'bcd'), (4, 'b')], [(0.5, 'abz'), (1, 'abc')],
+                          [(0.5, 'abz'), (1, 'abc')]])
+
+        # the global trie is not modified
+        overlay.add('bz', 0)
+        overlay.add('abz', 10)
+        self.assertEqual(overlay.complete('b', 5), [(0, 'bz'), (3, 'bcd'), (4, 'b')])
+        self.assertEqual(overlay.complete('ab', 5), [(1, 'abc'), (1.0, 'abd'), (5.0, 'abz')])
+        self.assertEqual(trie.complete('b', 5), [(3, 'bcd'), (4, 'b')])
+
+        self.assertRaise(lambda: CompletionOverlay(trie, overlay.user, user_scale=0), ValueError)
+
+    def test_overlay_empty_history(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        base = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b'), (6, 'ab')]
+        trie = CompletionTrieNode.build(base, topk=5)
+        overlay = CompletionOverlay.build(trie, [], user_scale=0.5)
+        self.assertEqual(overlay.complete('a', 5), [(1, 'abc'), (2, 'abd'), (6, 'ab')])
+        rnd = random.Random(0)
+        user = {}
+        for i in range(60):
+            query = "".join(rnd.choice('abcd') for _ in range(rnd.randint(1, 4)))
+            weight = rnd.randint(0, 10)
+            overlay.add(query, weight)
+            user[query] = weight
+            history = [(w, q) for q, w in user.items()]
+            for prefix in ['', 'a', 'ab', query[:1], query[:2], query]:
+                for k in [1, 5]:
+                    self.assertEqual(overlay.complete(prefix, k),
+                                     self.brute_force(base, history, prefix, k, 1., 0.5))
+
+    def test_overlay_cache(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        trie = CompletionTrieNode.build([(1, 'abc'), (2, 'abd')], topk=5)
+        overlay = CompletionOverlay.build(trie, [(1, 'abz')])
+        cache = CompletionCache(overlay)
+        self.assertEqual(cache.complete('ab', 5), [(1, 'abc'), (1, 'abz'), (2, 'abd')])
+        overlay.add('aba', 0)
+        self.assertEqual(cache.complete('ab', 5),
+                         [(0, 'aba'), (1, 'abc'), (1, 'abz'), (2, 'abd')])
+        self.assertEqual(cache.invalidations, 1)
+
+    def test_overlay_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        base = [(i + 1, q) for i, q in enumerate(lines) if q]
+        trie = CompletionTrieNode.build(base, topk=10)
+        rnd = random.Random(0)
+        for scale in [0.01, 1., 3.]:
+            user = [(i + 1, q) for i, (_, q) in enumerate(rnd.sample(base, 30))]
+            user += [(i + 5, q + 'x') for i, (_, q) in enumerate(rnd.sample(base, 10))]
+            overlay = CompletionOverlay.build(trie, user, user_scale=scale)
+            prefixes = set(q[:i] for _, q in user for i in range(1, 4))
+            for prefix in sorted(prefixes):
+                for k in [1, 5, 10]:
+                    self.assertEqual(overlay.complete(prefix, k),
+                                     self.brute_force(base, user, prefix, k, 1., scale))
+
+
+if __name__ == "__main__":
+    unittest.main()
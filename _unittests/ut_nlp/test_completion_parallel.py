@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=10s)
+"""
+import os
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+
+
+class TestCompletionParallel(ExtTestCase):
+
+    def compare(self, expected, trie):
+        exp = list(expected.unsorted_iter())
+        got = list(trie.unsorted_iter())
+        self.assertEqual([n.value for n in exp], [n.value for n in got])
+        for e, n in zip(exp, got):
+            self.assertEqual((e.value, e.leave, e.weight, e.disp),
+                             (n.value, n.leave, n.weight, n.disp))
+            self.assertEqual([(w, s.value) for w, s in e.stat.completions],
+                             [(w, s.value) for w, s in n.stat.completions])
+            self.assertEqual(getattr(e.stat, 'mks0', None),
+                             getattr(n.stat, 'mks0', None))
+            self.assertEqual(getattr(e.stat, 'mks0_', None),
+                             getattr(n.stat, 'mks0_', None))
+            if e.topk is not None:
+                self.assertEqual([(w, v) for w, v, _ in e.topk],
+                                 [(w, v) for w, v, _ in n.topk])
+        for n in got:
+            if n.children:
+                for c in n.children.values():
+                    self.assertIs(c.parent, n)
+
+    def test_build_parallel_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(None, 'ab'), (None, 'b'), (1, 'a'), (None, ''),
+                   (None, 'abc'), (0.5, 'ba', 'BA'), (None, 'cd')]
+        expected = CompletionTrieNode.build(queries, topk=2)
+        expected.precompute_stat()
+        for workers in [1, 2]:
+            trie = CompletionTrieNode.build_parallel(
+                queries, workers=workers, topk=2)
+            self.compare(expected, trie)
+            self.assertEqual(trie.complete('b', 2), expected.complete('b', 2))
+
+        self.assertRaise(lambda: CompletionTrieNode.build_parallel(
+            ['a', 'b', 'a'], workers=2), ValueError)
+
+    def test_build_parallel_empty(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        for queries in [[], [''], [(None, '')], [(2, '', 'E')]]:
+            expected = CompletionTrieNode.build(queries, topk=2)
+            expected.precompute_stat()
+            for workers in [1, 2]:
+                trie = CompletionTrieNode.build_parallel(
+                    queries, workers=workers, topk=2)
+                self.compare(expected, trie)
+                self.assertEqual(trie.complete('', 2), expected.complete('', 2))
+
+    def test_build_parallel_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(None, q) for q in lines]
+
+        expected = CompletionTrieNode.build(queries)
+        expected.precompute_stat()
+        trie = CompletionTrieNode.build_parallel(queries, workers=2)
+        self.compare(expected, trie)
+        expected.update_stat_dynamic()
+        trie.update_stat_dynamic()
+        for q in lines:
+            self.assertEqual(trie.min_dynamic_keystroke2(q),
+                             expected.min_dynamic_keystroke2(q))
+
+
+if __name__ == "__main__":
+    unittest.main()
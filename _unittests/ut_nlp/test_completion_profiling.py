@@ -34,6 +34,36 @@ class TestCompletionProfiling(unittest.TestCase):
         ave_length = sum(len(w) * p / total for p, w in per)
         return gain, gain_dyn, gain_dyn2, ave_length
 
+    def gain_test_metric(self, queries, weights):
+        per = list(zip(weights, queries))
+        total = sum(weights) * 1.0
+        trie = CompletionTrieNode.build([(None, q) for _, q in per])
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        res = trie.test_metric((q, p) for p, q in per)
+        ave_length = res["sum_wlen"] / total
+        gain = ave_length - res["mks0"] / total
+        gain_dyn = ave_length - res["mks1"] / total
+        gain_dyn2 = ave_length - res["mks2"] / total
+        return gain, gain_dyn, gain_dyn2, ave_length
+
+    def test_gain_test_metric(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        for weights in [[1.0] * len(lines),
+                        [1.0 + (i % 7) for i in range(len(lines))]]:
+            expected = self.gain_dynamique_moyen_par_mot(lines, weights)
+            got = self.gain_test_metric(lines, weights)
+            for a, b in zip(expected, got):
+                self.assertAlmostEqual(a, b)
+
     def test_profiling(self):
         fLOG(
             __file__,
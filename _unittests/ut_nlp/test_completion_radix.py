@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=6s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase, get_temp_folder
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_compact import CompactCompletionTrie
+from mlstatpy.nlp.completion_radix import RadixCompletionTrieNode
+
+
+class TestCompletionRadix(ExtTestCase):
+
+    def compare(self, queries):
+        trie = CompletionTrieNode.build(queries)
+        radix = RadixCompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        radix.precompute_stat()
+        atts = ['mks0', 'mks0_']
+        for step in range(2):
+            if step == 1:
+                self.assertEqual(radix.update_stat_dynamic(), trie.update_stat_dynamic())
+                atts.extend(['mks1', 'mks1_', 'mks1i_', 'mks2', 'mks2_', 'mks2i_',
+                             'mks_iter', 'iter_'])
+            for node in trie:
+                rnode = radix.find(node.value)
+                self.assertEqual(rnode.value, node.value)
+                self.assertEqual(rnode.leave, node.leave)
+                self.assertEqual((node.value, rnode.weight), (node.value, node.weight))
+                self.assertEqual([(w, s.value) for w, s in rnode.stat.completions],
+                                 [(w, s.value) for w, s in node.stat.completions])
+                for att in atts:
+                    self.assertEqual((node.value, att, getattr(rnode.stat, att)),
+                                     (node.value, att, getattr(node.stat, att)))
+        return trie, radix
+
+    def test_radix_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(None, 'a'), (None, 'abc'), (None, 'abcdef'), (None, 'abd'),
+                   (None, 'b'), (None, 'bcdefgh')]
+        trie, radix = self.compare(queries)
+        self.assertEqual(len(list(trie)), 15)
+        self.assertEqual(len(list(radix)), 8)
+        node = radix.find('abcd')
+        self.assertEqual(node.value, 'abcd')
+        self.assertEqual(list(node.children.values()), [radix.find('abcdef')])
+        self.assertEmpty(radix.find('abce'))
+        self.assertEmpty(radix.find('c'))
+        for q in ['a', 'abcdef', 'bcdefgh']:
+            self.assertEqual(radix.min_keystroke(q), trie.min_keystroke(q))
+            self.assertEqual(radix.min_dynamic_keystroke2(q),
+                             trie.min_dynamic_keystroke2(q))
+        self.assertRaise(lambda: RadixCompletionTrieNode.build(['a', 'a']),
+                         ValueError)
+
+        # the same number of iterations as the trie
+        self.compare([(1, 'a'), (2, 'b')])
+        self.compare([(1, 'a'), (2, 'ab')])
+        self.compare([(1, ''), (7, 'ba'), (1, 'bb'), (7, 'bbbb')])
+
+        # same parameters as CompletionTrieNode
+        profile = {}
+        radix = RadixCompletionTrieNode.build(
+            sorted(queries, key=lambda q: q[1]), is_sorted=True, profile=profile)
+        self.assertEqual(profile['build']['words'], len(queries))
+        self.assertEqual(profile['build']['nodes'], len(list(radix)))
+        radix.precompute_stat(profile=profile)
+        nb = radix.update_stat_dynamic(fLOG=fLOG, profile=profile)
+        self.assertEqual(profile['update_stat_dynamic']['iterations'], nb)
+
+        # the split node is above a completion with a lower weight below it
+        self.compare([(5, 'ab'), (1, 'abc'), (3, 'ad')])
+        self.assertEqual(RadixCompletionTrieNode.build(
+            [(5, 'ab'), (1, 'abc'), (3, 'ad')]).find('a').weight, 1)
+
+        # an implicit prefix without precomputed statistics
+        radix = RadixCompletionTrieNode.build(
+            [(5, 'ab'), (1, 'abcde'), (3, 'abcdf'), (0.5, 'abcdeg')])
+        self.assertEqual(radix.find('abc').weight, 0.5)
+        self.assertEqual(radix.find('abcdefgh'), None)
+
+        radix = RadixCompletionTrieNode.build(queries, topk=2)
+        trie = CompletionTrieNode.build(queries, topk=2)
+        for prefix in ['', 'a', 'abcd', 'bc', 'x']:
+            self.assertEqual(radix.complete(prefix, 2), trie.complete(prefix, 2))
+            self.assertEqual(radix.complete(prefix, 10), trie.complete(prefix, 10))
+
+    def test_radix_random(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        rnd = random.Random(0)
+        for i in range(100):
+            words = set()
+            for k in range(rnd.randint(1, 40)):
+                words.add("".join(rnd.choice('ab')
+                                  for _ in range(rnd.randint(0, 9))))
+            # many ties in the weights
+            queries = [(float(rnd.choice([1, 2, 3])), w) for w in sorted(words)]
+            self.compare(queries)
+
+    def test_radix_incremental(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        def build(words, precompute):
+            radix = RadixCompletionTrieNode.build(
+                [(w, k) for k, w in sorted(words.items())], topk=3)
+            if precompute:
+                radix.precompute_stat()
+                radix.update_stat_dynamic()
+            return radix
+
+        def dump(radix):
+            rows = []
+            for node in radix:
+                row = [node.value, node.leave, node.weight,
+                       [(w, v) for w, v, _ in node.topk]]
+                if node.stat is not None:
+                    row.append([(w, s.value) for w, s in node.stat.completions])
+                    row.extend(getattr(node.stat, att) for att in
+                               ['mks0', 'mks0_', 'mks1', 'mks1_', 'mks2', 'mks2_'])
+                rows.append(row)
+            return rows
+
+        rnd = random.Random(0)
+        weights = list(range(10000))
+        rnd.shuffle(weights)
+
+        def random_word():
+            return "".join(rnd.choice('abc') for i in range(rnd.randint(1, 5)))
+
+        for precompute in [False, True]:
+            words = {}
+            while len(words) < 20:
+                words[random_word()] = float(weights.pop())
+            radix = build(words, precompute)
+            for i in range(100):
+                op = rnd.randint(0, 2)
+                if op == 0 or len(words) < 5:
+                    w = random_word()
+                    if w in words:
+                        continue
+                    words[w] = float(weights.pop())
+                    radix.insert(w, words[w])
+                elif op == 1:
+                    w = rnd.choice(sorted(words))
+                    del words[w]
+                    radix.remove(w)
+                else:
+                    w = rnd.choice(sorted(words))
+                    words[w] = float(weights.pop())
+                    radix.reweight(w, words[w])
+                self.assertEqual(dump(radix), dump(build(words, precompute)))
+
+        radix = RadixCompletionTrieNode.build([(1., 'ab'), (2., 'abcd')])
+        self.assertRaise(lambda: radix.insert('ab', 3.), ValueError)
+        self.assertRaise(lambda: radix.remove('abc'), KeyError)
+        self.assertRaise(lambda: radix.reweight('abc', 1.), KeyError)
+        radix.remove('ab')
+        self.assertEqual([n.value for n in radix], ['', 'abcd'])
+        radix.insert('abd', 0.5)
+        self.assertEqual([n.value for n in radix], ['', 'ab', 'abcd', 'abd'])
+        self.assertEqual(radix.find('a').weight, 0.5)
+
+    def test_radix_trie_api(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        temp = get_temp_folder(__file__, "temp_completion_radix")
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample300.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(None, q) for q in lines]
+        trie = CompletionTrieNode.build(queries)
+        radix = RadixCompletionTrieNode.build(queries)
+
+        words = lines[::3] + [q + 'z' for q in lines[::7]] + ['', 'zzz']
+        mks, best = radix.min_keystroke_many(words)
+        emks, ebest = trie.min_keystroke_many(words)
+        self.assertEqual(mks.tolist(), emks.tolist())
+        self.assertEqual(best.tolist(), ebest.tolist())
+        self.assertEqual([radix.min_keystroke(w) for w in words[:30]],
+                         list(zip(mks.tolist(), best.tolist()))[:30])
+
+        # the expanded trie and the compressed one
+        self.assertEqual([(n.value, n.weight, n.leave) for n in radix.to_trie()],
+                         [(n.value, n.weight, n.leave) for n in trie])
+        self.assertEqual([(n.value, n.weight, n.leave) for n in RadixCompletionTrieNode.from_trie(trie)],
+                         [(n.value, n.weight, n.leave) for n in radix])
+
+        for workers in [1, 2]:
+            par = RadixCompletionTrieNode.build_parallel(queries, workers=workers, topk=3)
+            self.assertIsInstance(par, RadixCompletionTrieNode)
+            self.assertEqual([(n.value, n.weight, n.leave) for n in par],
+                             [(n.value, n.weight, n.leave) for n in radix])
+            for p in ['', lines[0][:2]]:
+                self.assertEqual(par.complete(p, 3), list(trie.find(p).iter_leaves())[:3])
+
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        radix.precompute_stat()
+        radix.update_stat_dynamic()
+        name = os.path.join(temp, "radix.bin")
+        radix.save(name)
+        loaded = CompactCompletionTrie.load(name)
+        self.assertEqual(len(loaded), len(list(trie)))
+        for q in lines:
+            self.assertEqual(loaded.min_dynamic_keystroke2(q), trie.min_dynamic_keystroke2(q))
+            self.assertEqual(loaded.min_keystroke0(q), trie.min_keystroke0(q))
+
+    def test_radix_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        trie, radix = self.compare([(None, q) for q in lines])
+        mem = trie.memory_usage()
+        rmem = radix.memory_usage()
+        fLOG("nodes: trie={0} radix={1}, bytes per word: trie={2} radix={3}".format(
+            mem['nodes'], rmem['nodes'], mem['bytes_per_word'], rmem['bytes_per_word']))
+        self.assertEqual(mem['words'], rmem['words'])
+        self.assertLess(rmem['nodes'] * 5, mem['nodes'])
+        self.assertLess(rmem['bytes'] * 3, mem['bytes'])
+
+        qset = [(q, 1.) for q in lines if q] + [(q + "#", 2.) for q in lines if q]
+        res = trie.test_metric(qset)
+        rres = radix.test_metric(qset)
+        for k in ['mks0', 'mks1', 'mks2', 'found', 'n']:
+            self.assertEqual(res[k], rres[k])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=3s)
+"""
+import os
+import json
+import asyncio
+import unittest
+from urllib.parse import quote
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase, get_temp_folder
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_compact import CompactCompletionTrie
+from mlstatpy.nlp.completion_server import (
+    CompletionServer, load_generator, main, _read_queries, _load_engine)
+
+
+async def http_get(port, path):
+    """
+    Sends one request and returns the status and the decoded body.
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write("GET {0} HTTP/1.0\r\n\r\n".format(path).encode('ascii'))
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    head, body = data.split(b"\r\n\r\n", 1)
+    return int(head.split()[1]), json.loads(body.decode('utf-8'))
+
+
+class TestCompletionServer(ExtTestCase):
+
+    def test_server(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b c&d')]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        server = CompletionServer(trie, k=10, window=0.005)
+
+        async def run():
+            await server.start(port=0)
+            port = server.port
+            res = await asyncio.gather(
+                http_get(port, "/complete?q=a"),
+                http_get(port, "/complete?q=b&k=1"),
+                http_get(port, "/complete?q=" + quote('b c')),
+                http_get(port, "/complete?q=zz"),
+                http_get(port, "/unknown"),
+                http_get(port, "/complete?q=a&k=x"))
+            stats = await http_get(port, "/stats")
+            await server.close()
+            return res, stats
+
+        res, stats = asyncio.run(run())
+        self.assertEqual(res[0], (200, dict(prefix='a', completions=[[1, 'abc'], [2, 'abd']])))
+        self.assertEqual(res[1], (200, dict(prefix='b', completions=[[3, 'bcd']])))
+        self.assertEqual(res[2], (200, dict(prefix='b c', completions=[[4, 'b c&d']])))
+        self.assertEqual(res[3], (200, dict(prefix='zz', completions=[])))
+        self.assertEqual(res[4][0], 404)
+        self.assertEqual(res[5][0], 400)
+        self.assertEqual(stats[0], 200)
+        stats = stats[1]
+        self.assertEqual(stats['requests'], 4)
+        # the connections may not arrive within the same window
+        self.assertLesser(stats['batches'], 4)
+        self.assertLesser(stats['max_batch'], 4)
+        self.assertEqual(sum(stats['latency']['counts']), 4)
+        self.assertIn('p99', stats)
+        self.assertIn('qps_10s', stats)
+
+    def test_server_batch(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'abc'), (2, 'abd'), (3, 'bcd'), (4, 'b c&d')]
+        trie = CompletionTrieNode.build(queries, topk=10)
+        prefixes = ['a', 'b', 'b c', 'zz', 'a', 'ab']
+
+        async def run(server, ks):
+            return await asyncio.gather(
+                *[server.complete(p, k) for p, k in zip(prefixes, ks)])
+
+        # every request is queued before the window ends
+        server = CompletionServer(trie, k=10, window=0.)
+        ks = [None, 1, None, None, 1, None]
+        res = asyncio.run(run(server, ks))
+        self.assertEqual(res, [trie.complete(p, 10 if k is None else k)
+                               for p, k in zip(prefixes, ks)])
+        self.assertEqual(server.batches, 1)
+        self.assertEqual(server.max_batch_seen, 6)
+
+        # a full batch is processed without waiting for the window
+        server = CompletionServer(trie, k=10, window=60., max_batch=2)
+        res = asyncio.run(run(server, [None] * 6))
+        self.assertEqual(res, [trie.complete(p, 10) for p in prefixes])
+        self.assertEqual(server.batches, 3)
+        self.assertEqual(server.max_batch_seen, 2)
+
+    def test_server_load(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(i, q) for i, q in enumerate(sorted(set(lines))) if q]
+        trie = CompletionTrieNode.build(queries, topk=5)
+        prefixes = [q[:3] for _, q in queries]
+        server = CompletionServer(trie, k=5, window=0.001, max_batch=8)
+
+        async def run():
+            await server.start(port=0)
+            res = await load_generator(prefixes, port=server.port,
+                                       concurrency=16, requests=500, k=5)
+            got = await server.complete(prefixes[0], 5)
+            await server.close()
+            return res, got
+
+        res, got = asyncio.run(run())
+        self.assertEqual(res['requests'], 500)
+        self.assertEqual(res['errors'], 0)
+        self.assertGreater(res['throughput'], 0)
+        self.assertEqual(got, trie.complete(prefixes[0], 5))
+        stats = server.stats()
+        self.assertEqual(stats['requests'], 500)
+        self.assertLesser(stats['max_batch'], 8)
+        self.assertLess(stats['batches'], 500)
+
+    def test_server_main(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        temp = get_temp_folder(__file__, "temp_completion_server")
+        data = os.path.join(temp, "queries.txt")
+        with open(data, "w", encoding="utf-8") as f:
+            f.write("2\tabc\nabd\n\nbcd\n")
+        self.assertEqual(_read_queries(data),
+                         [(2., 'abc'), (None, 'abd'), (None, 'bcd')])
+        rows = []
+        self.assertEmpty(main([], fLOG=rows.append))
+        with self.assertRaises(SystemExit):
+            main(["serve"], fLOG=rows.append)
+        with self.assertRaises(SystemExit):
+            main(["serve", "--data", data, "--trie", data], fLOG=rows.append)
+
+        trie = _load_engine(data=data, k=10, fLOG=rows.append)
+        snapshot = os.path.join(temp, "queries.trie")
+        CompactCompletionTrie.from_trie(trie).save(snapshot)
+        compact = _load_engine(trie=snapshot, fLOG=rows.append)
+        self.assertIsInstance(compact, CompactCompletionTrie)
+        self.assertEqual(len(rows), 2)
+
+        async def run():
+            server = CompletionServer(compact, k=10)
+            return await asyncio.gather(
+                server.complete('a'), server.complete('ab', 1), server.complete('zz'))
+
+        self.assertEqual(asyncio.run(run()),
+                         [trie.complete('a', 10), trie.complete('ab', 1), []])
+
+
+if __name__ == "__main__":
+    unittest.main()
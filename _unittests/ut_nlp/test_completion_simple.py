@@ -6,7 +6,7 @@ import os
 import unittest
 import itertools
 from pyquickhelper.loghelper import fLOG
-from mlstatpy.nlp.completion_simple import CompletionSystem, CompletionElement
+from mlstatpy.nlp.completion_simple import CompletionSystem, CompletionElement, CompletionDetails
 
 
 class TestCompletionSimple(unittest.TestCase):
@@ -74,6 +74,152 @@ class TestCompletionSimple(unittest.TestCase):
                 res = [_[-1] for _ in diffs]
                 raise Exception("\n".join(res))
 
+    def test_profile(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = ['actuellement', 'actualité', 'actu', 'actualités', 'acte']
+        system = CompletionSystem([(None, q) for q in queries])
+        profile = {}
+        nb = system.compute_metrics(profile=profile)
+        info = profile['compute_metrics']
+        self.assertEqual(info['iterations'], nb)
+        self.assertEqual(len(info['updates']), nb)
+        self.assertEqual(len(info['times']), nb)
+        self.assertEqual(info['updates'][-1], 0)
+        self.assertGreaterEqual(info['time'], info['init_time'])
+        # the first iteration processes every prefix of every element,
+        # the next ones only the elements which may change
+        self.assertEqual(info['visited'][0], len(queries))
+        self.assertEqual(info['prefixes'][0], sum(len(q) for q in queries))
+        self.assertLess(info['visited'][1], len(queries))
+
+    def test_engine_numpy(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        def metrics(queries, engine, delta=0.8):
+            system = CompletionSystem(queries)
+            nb = system.compute_metrics(engine=engine, delta=delta)
+            return nb, [(e.value, e.weight, e.mks0, e.mks0_, e.mks1, e.mks1_,
+                         e.mks2, e.mks2_, e.prefix.value) for e in system]
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        sets = [["por", "por rouge", "por vert", "por orange", "port", "port blanc", "port rouge"],
+                ["po", "po rouge", "po vert", "po orange", "port", "port blanc", "port rouge"]]
+        for name in ["sample300.txt", "sample_alpha_2.txt", "sample1000.txt"]:
+            with open(os.path.join(this, "data", name), "r", encoding="utf-8") as f:
+                sets.append([_.strip(" \n\r\t") for _ in f.readlines()])
+        for queries in sets:
+            queries = [(None, q) for q in queries]
+            self.assertEqual(metrics(queries, 'numpy'), metrics(queries, 'python'))
+
+        queries = ['actuellement', 'actualité', 'actu', 'actualités', 'a', 'ac']
+        for per in itertools.permutations(range(len(queries))):
+            weighted = [(w % 3 + 1, q) for w, q in zip(per, queries)]
+            for delta in [0.8, 0.2]:
+                self.assertEqual(metrics(weighted, 'numpy', delta),
+                                 metrics(weighted, 'python', delta))
+
+        # details=True falls back to engine 'python'
+        system = CompletionSystem(queries)
+        ref = CompletionSystem(queries)
+        self.assertEqual(system.compute_metrics(engine='numpy', details=True),
+                         ref.compute_metrics(engine='python', details=True))
+        self.assertEqual([e.str_all_completions() for e in system],
+                         [e.str_all_completions() for e in ref])
+        with self.assertRaises(ValueError):
+            system.compute_metrics(engine='c')
+
+    def test_find(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        def linear(system, value):
+            for e in system:
+                if e.value == value:
+                    return e
+            return None
+
+        queries = [(3, 'actu'), (1, 'acte'), (2, 'actualité'), (4, 'a')]
+        system = CompletionSystem(queries)
+        for v in ['actu', 'a', 'acte', 'b', '', 'actualités']:
+            self.assertIs(system.find(v), linear(system, v))
+        index = system._index
+        system.sort_weight()
+        self.assertIs(system._index, index)
+        self.assertEqual(system.find('acte').weight, 1)
+        system.sort_values()
+        for v in ['actu', 'a', 'acte', 'b', '', 'actualités', 'actualité', 'zz']:
+            self.assertIs(system.find(v, is_sorted=True), linear(system, v))
+            self.assertIs(system.find(v), linear(system, v))
+
+        # duplicated values, the first one in the current order is returned
+        system = CompletionSystem([(3, 'ab'), (1, 'ab'), (2, 'b')])
+        self.assertEqual(system.find('ab').weight, 3)
+        system.sort_weight()
+        self.assertEqual(system.find('ab').weight, 1)
+        system.sort_values()
+        self.assertEqual(system.find('ab', is_sorted=True).weight, 1)
+
+    def test_details(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.join(
+            os.path.dirname(__file__), "data", "sample1000.txt"))
+        with open(this, "r", encoding="utf-8") as f:
+            titles = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(i + 1, q) for i, q in enumerate(titles[:300]) if q]
+        queries += [(0.5, 'a'), (1.5, ''), (2.5, 'ab')]
+        system = CompletionSystem(queries)
+        profile = {}
+        system.compute_metrics(details=True, profile=profile)
+        self.assertGreater(profile['compute_metrics']['details'], 0)
+
+        # the first completions of every prefix until the element itself
+        ordered = sorted(system, key=lambda e: (e.weight, e.value))
+        for i, el in enumerate(ordered):
+            self.assertIsInstance(el._info.details, CompletionDetails)
+            completions = el._info._completions
+            cut = min(15, max(10, len(el.value)))
+            self.assertEqual(completions[''], ordered[:min(cut, i + 1)])
+            self.assertEqual(len(completions), max(len(el.value), 1))
+            for k in range(1, len(el.value)):
+                prefix = el.value[:k]
+                expected = [e for e in ordered[:i + 1]
+                            if e.value.startswith(prefix) and len(e.value) > k]
+                self.assertEqual(completions[prefix], expected[:cut])
+            self.assertIn(el.value, el.str_all_completions())
+
+    def test_details_log(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        # the prefix of an element is logged every time the element is processed
+        system = CompletionSystem([(1, 'a'), (5, 'ab'), (2, 'abc'), (4, 'abcd'),
+                                   (3, 'abcde'), (6, 'abd')])
+        system.compute_metrics(details=True)
+        logs = {e.value: [_ if isinstance(_, tuple) else _.value for _ in e._info._log_imp]
+                for e in system}
+        self.assertEqual(logs, {
+            'a': [], 'ab': [], 'abd': [],
+            'abc': [(0, 'mks0', 2, '', 'k=0', 'p=2', 'it=0')],
+            'abcd': [(2, 'mks1', 3, 'abc', 'k=3', 'p=1', 'it=1', 'last=abc'),
+                     (3, 'mks2', 3, 'abc', 'k=3', 'p=1', 'it=1', 'last=abc'),
+                     'abc', 'abc'],
+            'abcde': [(0, 'mks0', 3, '', 'k=0', 'p=3', 'it=0'), 'abc', 'abc', 'abc', 'abcd']})
+
     def test_mks_consistency(self):
         fLOG(
             __file__,
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=3s)
+"""
+import os
+import unittest
+import numpy
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase, get_temp_folder
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_compact import CompactCompletionTrie
+
+
+class TestCompletionSnapshot(ExtTestCase):
+
+    def test_save_load(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        temp = get_temp_folder(__file__, "temp_completion_snapshot")
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample300.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        queries = [(None, q.lower(), q) for q in lines]
+
+        trie = CompletionTrieNode.build(queries)
+        trie.precompute_stat()
+        trie.update_stat_dynamic()
+        name = os.path.join(temp, "trie.bin")
+        trie.save(name)
+
+        for mmap in [True, False]:
+            loaded = CompactCompletionTrie.load(name, mmap=mmap)
+            if mmap:
+                self.assertIsInstance(loaded.mks1, numpy.memmap)
+            self.assertEqual(len(loaded), sum(1 for _ in trie))
+            for _, q, d in queries:
+                node = trie.find(q)
+                i = loaded.find(q)
+                self.assertEqual(loaded.value(i), q)
+                self.assertEqual(loaded.disp[i], d)
+                self.assertEqual(loaded.completions(i),
+                                 [(w, s.value) for w, s in node.stat.completions])
+                self.assertEqual(loaded.min_keystroke0(q), trie.min_keystroke0(q))
+                self.assertEqual(loaded.min_dynamic_keystroke(q),
+                                 trie.min_dynamic_keystroke(q))
+                self.assertEqual(loaded.min_dynamic_keystroke2(q),
+                                 trie.min_dynamic_keystroke2(q))
+
+        # a trie without statistics
+        compact = CompactCompletionTrie.build(queries)
+        compact.save(name)
+        loaded = CompactCompletionTrie.load(name)
+        self.assertEqual(loaded.comp_nodes, None)
+        self.assertEqualArray(loaded.weights, compact.weights)
+        loaded.precompute_stat()
+        loaded.update_stat_dynamic()
+        self.assertEqual(loaded.min_dynamic_keystroke2(queries[5][1]),
+                         trie.min_dynamic_keystroke2(queries[5][1]))
+
+        with open(name, "wb") as f:
+            f.write(b"MLSTATPY.TRIX" + b"\0" * 20)
+        self.assertRaise(lambda: CompactCompletionTrie.load(name), ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=2s)
+"""
+import os
+import random
+import unittest
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+from mlstatpy.nlp.completion_simple import CompletionSystem
+from mlstatpy.nlp.completion_sorted import CompletionSortedArray
+
+
+class TestCompletionSorted(ExtTestCase):
+
+    def compare(self, queries, ks=(1, 3, 10)):
+        trie = CompletionTrieNode.build(queries, topk=max(ks))
+        engine = CompletionSortedArray(CompletionSystem(queries))
+        self.assertEqual(len(engine), len(queries))
+        for node in trie:
+            lo, hi = engine.prefix_range(node.value)
+            self.assertEqual(hi - lo, len(list(node.iter_leaves())))
+            for k in ks:
+                self.assertEqual((node.value, engine.complete(node.value, k)),
+                                 (node.value, trie.complete(node.value, k)))
+        return trie, engine
+
+    def test_sorted_small(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(3, 'ab'), (1, 'b'), (1, 'a'), (2, 'e'),
+                   (1, 'abc'), (0.5, 'ba'), (3, 'cd'), (4, 'abd')]
+        _, engine = self.compare(queries)
+        self.assertEqual(engine.buffer, 'aababcabdbbacde')
+        self.assertEqual(engine.value(2), 'abc')
+        self.assertEqual(engine.prefix_range('ab'), (1, 4))
+        self.assertEqual(engine.prefix_range('abe'), (4, 4))
+        self.assertEqual(engine.prefix_range('e'), (7, 8))
+        self.assertEqual(engine.prefix_range('f'), (8, 8))
+        self.assertEqual(engine.complete('f'), [])
+        self.assertEqual(engine.complete('ab', 2), [(1.0, 'abc'), (3.0, 'ab')])
+        self.assertEqual(engine.complete('', 0), [])
+        self.assertEqual(engine.argmin(0, 8), 5)
+        self.assertEqual(engine.argmin(0, 5), 0)
+        self.assertEqual(engine.argmin(1, 5), 2)
+        self.assertEqual(len(engine.table), 4)
+        mem = engine.memory_usage()
+        self.assertEqual(mem['words'], 8)
+
+        engine = CompletionSortedArray(['b', 'a'])
+        self.assertEqual(engine.complete(''), [(0.0, 'b'), (1.0, 'a')])
+        # a value must not be read beyond its end
+        engine = CompletionSortedArray(['ab', 'ab', 'ab', 'cd', 'cde'])
+        self.assertEqual(engine.prefix_range('abc'), (3, 3))
+        self.assertEqual(engine.prefix_range('bcd'), (3, 3))
+        self.assertEqual(engine.prefix_range('ab'), (0, 3))
+        self.assertEqual(engine.prefix_range('cd'), (3, 5))
+
+    def test_sorted_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+        lines = list(sorted(set(lines)))
+        rnd = random.Random(0)
+        # many ties to check they are broken by value
+        queries = [(rnd.randint(1, 20), q) for q in lines]
+        self.compare(queries)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+@brief      test log(time=3s)
+"""
+import os
+import unittest
+from itertools import islice
+from pyquickhelper.loghelper import fLOG
+from pyquickhelper.pycode import ExtTestCase
+from mlstatpy.nlp.completion import CompletionTrieNode
+
+
+class TestCompletionTopK(ExtTestCase):
+
+    def test_complete(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        queries = [(1, 'a'), (2, 'ab'), (3, 'abc'), (4, 'abcd'), (5, 'bc')]
+        trie = CompletionTrieNode.build(queries)
+        self.assertRaise(lambda: trie.complete('a'), AttributeError)
+        trie = CompletionTrieNode.build(queries, topk=2)
+        self.assertEqual(trie.complete('', 2), [(1, 'a'), (2, 'ab')])
+        self.assertEqual(trie.complete('ab', 2), [(2, 'ab'), (3, 'abc')])
+        self.assertEqual(trie.complete('b', 2), [(5, 'bc')])
+        self.assertEqual(trie.complete('abe', 2), [])
+        # more than the precomputed lists
+        self.assertEqual(trie.complete('', 10), list(trie.iter_leaves()))
+
+        class CountingTrie(CompletionTrieNode):
+            # counts the calls to iter_leaves
+            __slots__ = ()
+            calls = []
+
+            def iter_leaves(self, max_weight=None):
+                CountingTrie.calls.append(self.value)
+                return CompletionTrieNode.iter_leaves(self, max_weight)
+
+        # the lists are shorter than the bound, they hold every completion
+        trie = CompletionTrieNode.build(queries, topk=10)
+        for node in trie:
+            node.__class__ = CountingTrie
+        self.assertEqual(trie.complete('', 20), list(trie.iter_leaves()))
+        CountingTrie.calls.clear()
+        self.assertEqual(trie.complete('', 20), [(w, v) for w, v, _ in trie.topk])
+        self.assertEqual(trie.complete('b', 20), [(5, 'bc')])
+        self.assertEqual(CountingTrie.calls, [])
+
+    def test_complete_sample(self):
+        fLOG(
+            __file__,
+            self._testMethodName,
+            OutputPrint=__name__ == "__main__")
+
+        this = os.path.abspath(os.path.dirname(__file__))
+        data = os.path.join(this, "data", "sample1000.txt")
+        with open(data, "r", encoding="utf-8") as f:
+            lines = [_.strip(" \n\r\t") for _ in f.readlines()]
+
+        trie = CompletionTrieNode.build([(None, q) for q in lines], topk=10)
+        prefixes = set()
+        for q in lines[::10]:
+            for i in range(len(q) + 1):
+                prefixes.add(q[:i])
+        prefixes = list(sorted(prefixes, reverse=True)) + ['zzzz', 'Ann', '']
+        for k in [1, 5, 10]:
+            batch = trie.complete_many(prefixes, k)
+            for p, res in zip(prefixes, batch):
+                node = trie.find(p)
+                exp = [] if node is None else list(
+                    islice(node.iter_leaves(), k))
+                self.assertEqual(trie.complete(p, k), exp)
+                self.assertEqual(res, exp)
+
+
+if __name__ == "__main__":
+    unittest.main()
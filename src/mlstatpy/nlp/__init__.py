@@ -4,5 +4,12 @@
 """
 
 from .completion import CompletionTrieNode
-from .completion_simple import CompletionElement, CompletionSystem
+from .completion_cache import CompletionCache
+from .completion_columnar import ColumnarCompletionSystem
+from .completion_compact import CompactCompletionTrie
+from .completion_dawg import CompletionDAWG
+from .completion_overlay import CompletionOverlay
+from .completion_radix import RadixCompletionTrieNode
+from .completion_simple import CompletionDetails, CompletionElement, CompletionSystem
+from .completion_sorted import CompletionSortedArray
 from .normalize import remove_diacritics
@@ -2,8 +2,17 @@
 @file
 @brief About completion
 """
-from typing import Tuple, List, Iterator
-from collections import deque
+import os
+import sys
+import gc
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from operator import itemgetter
+from typing import Tuple, List, Iterator, Dict
+import numpy
+from pyquickhelper.loghelper import noLOG
 
 
 class CompletionTrieNode:
@@ -15,7 +24,7 @@ class CompletionTrieNode:
     """
 
     __slots__ = ("value", "children", "weight",
-                 "leave", "stat", "parent", "disp")
+                 "leave", "stat", "parent", "disp", "topk", "meta")
 
     def __init__(self, value, leave, weight=1.0, disp=None):
         """
@@ -34,6 +43,8 @@ class CompletionTrieNode:
         self.stat = None
         self.parent = None
         self.disp = disp
+        self.topk = None
+        self.meta = None
 
     @property
     def root(self):
@@ -105,6 +116,20 @@ class CompletionTrieNode:
             if node.children:
                 stack.extend(node.children.values())
 
+    def postorder_iter(self) -> Iterator['CompletionTrieNode']:
+        """
+        Iterates on all nodes, every node is returned
+        after all its children.
+        """
+        stack = [(self, False)]
+        while len(stack) > 0:
+            node, done = stack.pop()
+            if done or not node.children:
+                yield node
+            else:
+                stack.append((node, True))
+                stack.extend((v, False) for v in node.children.values())
+
     def items(self) -> Iterator[Tuple[float, str, 'CompletionTrieNode']]:
         """
         Iterates on children, iterates on weight, key, child.
@@ -201,30 +226,99 @@ class CompletionTrieNode:
         return "\n".join(rows)
 
     @staticmethod
-    def build(words) -> 'CompletionTrieNode':
+    def _split_word(wword) -> Tuple[float, str, str]:
+        """
+        Splits one element of the input given to @see me build.
+
+        @param  wword       ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @return             weight, word, display string
+        """
+        if isinstance(wword, tuple):
+            if len(wword) == 2:
+                w, word = wword
+                return w, word, None
+            if len(wword) == 3:
+                return wword
+            raise ValueError(
+                "Unexpected number of values, it should be (weight, word) or (weight, word, dispplay string): {0}".format(wword))
+        return 1.0, wword, None
+
+    @staticmethod
+    def build(words, topk=None, is_sorted=False, profile=None) -> 'CompletionTrieNode':
         """
         Builds a trie.
 
-        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``,
+                            any iterator, the function does not store it
+        @param  topk        if not None, calls @see me precompute_topk with ``k=topk``
+        @param  is_sorted   the words are sorted by alphabetical order,
+                            the function uses @see me _build_sorted
+                            and disables the garbage collector meanwhile
+        @param  profile     None, a dictionary or a function, see below
         @return             root of the trie (CompletionTrieNode)
+
+        The weight of a node holding a word (``leave == True``) is the weight
+        of this word, the weight of any other node is the lowest weight
+        of the words starting with its prefix, it does not depend on
+        the order of the words. @see me insert, @see me remove and @see me reweight
+        keep the same rule.
+
+        ::
+
+            from mlstatpy.data.wikipedia import enumerate_titles
+            # the file is sorted, the titles are read one by one
+            trie = CompletionTrieNode.build(enumerate_titles(filename), is_sorted=True)
+
+        If *profile* is not None, the function measures the time spent in every
+        phase and a few counters, it stores them in ``profile['build']``
+        or calls ``profile('build', info)``: *time*, *words*, *nodes* (created),
+        *topk_time* (@see me precompute_topk). The same parameter is available
+        for @see me precompute_stat and @see me update_stat_dynamic,
+        a dictionary can be given to every method to collect everything::
+
+            profile = {}
+            trie = CompletionTrieNode.build(queries, profile=profile)
+            trie.precompute_stat(profile=profile)
+            trie.update_stat_dynamic(profile=profile)
+        """
+        begin = time.perf_counter()
+        if is_sorted:
+            # the garbage collector keeps visiting the nodes already created
+            # for nothing, the nodes are released with the trie
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                counters = {}
+                root = CompletionTrieNode._build_sorted(words, counters)
+            finally:
+                if enabled:
+                    gc.enable()
+            nb, created = counters['words'], counters['nodes']
+        else:
+            root, nb, created = CompletionTrieNode._build_unsorted(words)
+        end = time.perf_counter()
+        if topk is not None:
+            root.precompute_topk(topk)
+        if profile is not None:
+            _profile_report(profile, 'build', dict(
+                time=end - begin, words=nb, nodes=created, is_sorted=is_sorted,
+                topk_time=time.perf_counter() - end if topk is not None else 0.))
+        return root
+
+    @staticmethod
+    def _build_unsorted(words) -> Tuple['CompletionTrieNode', int, int]:
+        """
+        Builds a trie, see @see me build.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @return             root, number of words, number of nodes
         """
         root = CompletionTrieNode('', False)
         nb = 0
+        created = 1
         minw = None
         for wword in words:
-            if isinstance(wword, tuple):
-                if len(wword) == 2:
-                    w, word = wword
-                    disp = None
-                elif len(wword) == 3:
-                    w, word, disp = wword
-                else:
-                    raise ValueError(
-                        "Unexpected number of values, it should be (weight, word) or (weight, word, dispplay string): {0}".format(wword))
-            else:
-                w = 1.0
-                word = wword
-                disp = None
+            w, word, disp = CompletionTrieNode._split_word(wword)
             if w is None:
                 w = nb
             if minw is None or minw > w:
@@ -232,15 +326,16 @@ class CompletionTrieNode:
             node = root
             new_node = None
             for c in word:
+                if not node.leave and node.weight is not None:
+                    node.weight = min(node.weight, w)
                 if node.children is not None and c in node.children:
-                    if not node.leave:
-                        node.weight = min(node.weight, w)
                     node = node.children[c]
                 else:
                     new_node = CompletionTrieNode(
                         node.value + c, False, weight=w)
                     node._add(c, new_node)
                     node = new_node
+                    created += 1
             if new_node is None:
                 if node.leave:
                     raise ValueError(
@@ -252,6 +347,187 @@ class CompletionTrieNode:
                 new_node.disp = disp
             nb += 1
         root.weight = minw
+        return root, nb, created
+
+    @staticmethod
+    def _build_sorted(words, counters=None) -> 'CompletionTrieNode':
+        """
+        Builds a trie from sorted words, the result is the same as
+        @see me build. The nodes of the previous word are kept in a stack,
+        the nodes of the common prefix are not visited again,
+        only the new suffix is created. @see me build updates the weight
+        of every node the word goes through (the lowest weight),
+        these updates are delayed: the lowest weight is stored for the deepest
+        node of the common prefix and moved to its parent when
+        the node is removed from the stack.
+        In a sorted list, a word is inserted before any other word starting
+        with it, a node never becomes a leave after it was created.
+
+        @param  words       sorted list of ``(word)`` or ``(weight, word)``
+                            or ``(weight, word, display string)``
+        @param  counters    if not None, the function stores the number
+                            of words and created nodes (keys *words*, *nodes*)
+        @return             root of the trie (CompletionTrieNode)
+        """
+        root = CompletionTrieNode('', False)
+        created = 1
+        # path[i] is the node for prev[:i], pending[i] the lowest weight
+        # not yet propagated to path[i] and its parents, top is the deepest
+        # level with a pending weight
+        path = [root]
+        pending = [None]
+        top = -1
+        prev = None
+        nb = 0
+        minw = None
+
+        def propagate(common, top):
+            # moves the pending weights of levels > common to level common
+            carry = None
+            for j in range(top, common, -1):
+                w = pending[j]
+                if w is not None and (carry is None or w < carry):
+                    carry = w
+                if carry is not None:
+                    node = path[j]
+                    if not node.leave and carry < node.weight:
+                        node.weight = carry
+            if carry is not None and common >= 0 and (
+                    pending[common] is None or pending[common] > carry):
+                pending[common] = carry
+
+        for wword in words:
+            w, word, disp = CompletionTrieNode._split_word(wword)
+            if w is None:
+                w = nb
+            if minw is None or minw > w:
+                minw = w
+            common = 0
+            if prev is not None:
+                if word <= prev:
+                    if word == prev:
+                        raise ValueError(
+                            "Value '{0}' appears twice in the input list (not allowed).".format(word))
+                    raise ValueError(
+                        "Words are not sorted, '{0}' comes after '{1}'.".format(word, prev))
+                for a, b in zip(prev, word):
+                    if a != b:
+                        break
+                    common += 1
+
+            if top > common:
+                # pending[top] is not None, pending[common] is not None after that
+                propagate(common, top)
+                top = common
+            del path[common + 1:]
+            del pending[common + 1:]
+            if pending[common] is None or pending[common] > w:
+                # the word goes through path[:common + 1]
+                pending[common] = w
+                if top < common:
+                    top = common
+
+            node = path[-1]
+            created += len(word) - common
+            for c in word[common:]:
+                new_node = CompletionTrieNode(node.value + c, False, weight=w)
+                node._add(c, new_node)
+                node = new_node
+                path.append(node)
+            pending.extend([None] * (len(word) - common))
+            node.leave = True
+            node.weight = w
+            if disp is not None:
+                node.disp = disp
+            prev = word
+            nb += 1
+
+        propagate(-1, top)
+        root.weight = minw
+        if counters is not None:
+            counters['words'] = nb
+            counters['nodes'] = created
+        return root
+
+    @staticmethod
+    def build_parallel(words, workers=None, precompute=True, topk=None) -> 'CompletionTrieNode':
+        """
+        Builds a trie with several processes. The words are split into
+        shards based on their first letter, every shard is built
+        (and precomputed) by a different process, the sub-tries
+        are grafted under a common root and only the statistics
+        of the root are computed at the end.
+        The result is the same as @see me build followed by
+        @see me precompute_stat.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @param  workers     number of processes, None for the number of cores,
+                            1 builds the shards in the current process
+        @param  precompute  calls @see me precompute_stat
+        @param  topk        if not None, calls @see me precompute_topk with ``k=topk``
+        @return             root of the trie (CompletionTrieNode)
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        root = CompletionTrieNode('', False)
+        minw = None
+        groups = {}
+        for nb, wword in enumerate(words):
+            w, word, disp = CompletionTrieNode._split_word(wword)
+            if w is None:
+                # build uses the position in the whole list
+                w = nb
+            if minw is None or minw > w:
+                minw = w
+            if len(word) == 0:
+                if root.leave:
+                    raise ValueError(
+                        "Value '{0}' appears twice in the input list (not allowed).".format(word))
+                root.leave = True
+                root.weight = w
+                if disp is not None:
+                    root.disp = disp
+                continue
+            if word[0] not in groups:
+                groups[word[0]] = []
+            groups[word[0]].append((w, word, disp))
+
+        # balances the shards, the biggest groups first,
+        # there is no shard if every word is empty
+        nshards = min(workers, len(groups))
+        shards = [[] for i in range(nshards)]
+        sizes = [0] * nshards
+        for c in sorted(groups, key=lambda c: -len(groups[c])):
+            i = sizes.index(min(sizes))
+            shards[i].append(groups[c])
+            sizes[i] += len(groups[c])
+        shards = [[w for group in shard for w in group] for shard in shards]
+
+        children = {}
+        if workers == 1 or nshards <= 1:
+            for shard in shards:
+                sub = _build_shard(shard, precompute, topk, False)
+                children.update(sub.children)
+        else:
+            # the sub-tries are sent back as flat lists, pickling
+            # the nodes is slower and recursive
+            with ProcessPoolExecutor(max_workers=nshards) as executor:
+                for data in executor.map(_build_shard, shards, [precompute] * nshards,
+                                         [topk] * nshards, [True] * nshards):
+                    for node in _decode_shard(data):
+                        children[node.value] = node
+
+        # the children of the root follow the order of the first letters
+        for c in groups:
+            root._add(c, children[c])
+        root.weight = minw
+
+        if precompute:
+            # only the root has no statistics
+            root._precompute_node_stat()
+        if topk is not None:
+            root._update_topk(topk)
+            root._set_meta(topk=topk)
         return root
 
     def find(self, prefix: str) -> 'CompletionTrieNode':
@@ -275,6 +551,167 @@ class CompletionTrieNode:
                 return None
         return node
 
+    def precompute_topk(self, k=10):
+        """
+        Stores in every node the *k* best completions
+        (the lowest weights) starting with the prefix the node holds,
+        the node itself included. They are used by @see me complete.
+
+        @param      k           number of completions to keep for every node
+        """
+        for node in self.postorder_iter():
+            node._update_topk(k)
+        self._set_meta(topk=k)
+
+    def _update_topk(self, k):
+        """
+        Updates member *topk* assuming the children are up to date.
+        """
+        lists = []
+        if self.leave:
+            lists.append([(self.weight, self.value, self)])
+        if self.children:
+            lists.extend(v.topk for v in self.children.values() if v.topk)
+        if len(lists) == 1:
+            self.topk = lists[0][:k]
+        else:
+            self.topk = list(
+                islice(heapq.merge(*lists, key=itemgetter(0, 1)), k))
+
+    def _set_meta(self, **kwargs):
+        """
+        Stores information about the whole trie in the root
+        (parameters used to precompute statistics).
+        """
+        if self.meta is None:
+            self.meta = {}
+        self.meta.update(kwargs)
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions for a prefix
+        (sorted by weight then value like @see me iter_leaves).
+        The method uses the lists stored by @see me precompute_topk,
+        the cost is :math:`O(l(prefix) + k)`. If *k* is greater than the number
+        of stored completions, it falls back to @see me iter_leaves.
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(weight, value)``
+        """
+        node = self.find(prefix)
+        return self._complete_node(node, k)
+
+    def _complete_node(self, node, k):
+        """
+        Returns the *k* best completions of a node,
+        see @see me complete.
+        """
+        if node is None:
+            return []
+        if node.topk is None:
+            raise AttributeError("run precompute_topk")
+        meta = self.meta if self.meta is not None else self.root.meta
+        if len(node.topk) < k and len(node.topk) >= meta['topk']:
+            # a truncated list has as many completions as the bound
+            # given to precompute_topk, a shorter list holds every completion
+            # of the subtree, otherwise k is bigger than the number of stored completions
+            return list(islice(node.iter_leaves(), k))
+        return [(w, v) for w, v, _ in node.topk[:k]]
+
+    def complete_many(self, prefixes: List[str], k=10) -> List[List[Tuple[float, str]]]:
+        """
+        Calls @see me complete for many prefixes, the prefixes are sorted
+        so that a prefix starting with the previous one
+        continues the walk from where the previous one stopped.
+
+        @param      prefixes    list of prefixes
+        @param      k           number of completions to return for every prefix
+        @return                 list of results in the same order as *prefixes*
+        """
+        res = [None] * len(prefixes)
+        last = None
+        node = None
+        for i, prefix in sorted(enumerate(prefixes), key=itemgetter(1)):
+            if node is not None and prefix.startswith(last):
+                for c in prefix[len(last):]:
+                    if node.children is not None and c in node.children:
+                        node = node.children[c]
+                    else:
+                        node = None
+                        break
+            else:
+                node = self.find(prefix)
+            last = prefix
+            res[i] = self._complete_node(node, k)
+        return res
+
+    def fuzzy_complete(self, prefix: str, max_edits=1, k=10) -> List[Tuple[int, float, str]]:
+        """
+        Returns the *k* best completions for a prefix which may contain typos.
+        A completion is kept if one of its prefixes is at a Levenshtein distance
+        lower or equal to *max_edits* from *prefix*, the completions are
+        sorted by distance, then weight, then value.
+        The trie is walked with one row of the edit distance matrix per node,
+        a branch is pruned as soon as the lowest value in the row
+        is above *max_edits*, no node deeper than ``len(prefix) + max_edits``
+        is visited. The completions of every matching node come from
+        @see me complete, it is faster after @see me precompute_topk.
+
+        @param      prefix      prefix
+        @param      max_edits   maximum number of insertions, deletions or substitutions
+        @param      k           number of completions to return
+        @return                 list of ``(distance, weight, value)``
+        """
+        n = len(prefix)
+        root_row = list(range(n + 1))
+        matched = []
+        # every element is (node, edit distance row, distance of the best
+        # matching ancestor), a node matching with a distance greater than
+        # its ancestor's does not bring any better completion
+        stack = [(self, root_row, max_edits + 1)]
+        if root_row[-1] <= max_edits:
+            matched.append((root_row[-1], self))
+            stack[0] = (self, root_row, root_row[-1])
+        while stack:
+            node, row, dist = stack.pop()
+            if not node.children:
+                continue
+            for child in node.children.values():
+                # a radix trie stores more than one character on an edge
+                crow = row
+                cdist = dist
+                for c in child.value[len(node.value):]:
+                    prev = crow
+                    crow = [prev[0] + 1]
+                    for i in range(1, n + 1):
+                        crow.append(min(crow[i - 1] + 1, prev[i] + 1,
+                                        prev[i - 1] + (prefix[i - 1] != c)))
+                    if crow[-1] < cdist:
+                        cdist = crow[-1]
+                    if min(crow) > max_edits:
+                        break
+                else:
+                    if cdist < dist:
+                        matched.append((cdist, child))
+                    stack.append((child, crow, cdist))
+                    continue
+                if cdist < dist:
+                    # the edge matches before the branch is pruned
+                    matched.append((cdist, child))
+
+        best = {}
+        for d, node in matched:
+            if self.topk is None:
+                comp = islice(node.iter_leaves(), k)
+            else:
+                comp = self._complete_node(node, k)
+            for w, v in comp:
+                if v not in best or best[v][0] > d:
+                    best[v] = (d, w)
+        res = sorted((d, w, v) for v, (d, w) in best.items())
+        return res[:k]
+
     def min_keystroke(self, word: str) -> Tuple[int, int]:
         """
         Returns the minimum keystrokes for a word without optimisation,
@@ -318,6 +755,105 @@ class CompletionTrieNode:
                 break
         return metric, best
 
+    def min_keystroke_many(self, words: List[str]) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Computes @see me min_keystroke for many words without
+        @see me precompute_stat. Leaves are numbered in depth-first order
+        so that every node owns a contiguous range of leaves, every leaf
+        gets its rank among all leaves sorted by weight. The position of a word
+        among the completions of a prefix is the number of leaves of that
+        node with a lower rank, it is obtained with a bisection
+        in the sorted ranks of the node. Words are sorted so that
+        consecutive words share the nodes of their common prefix
+        and the sorted ranks of these nodes.
+
+        @param      words       list of words
+        @return                 two arrays, minimum keystroke and length of best prefix,
+                                a word which is not a completion of the trie
+                                gets ``len(word), -1``
+        """
+        ranges, ranks = self._leaf_ranks()
+        mks = numpy.empty(len(words), dtype=numpy.int64)
+        best = numpy.empty(len(words), dtype=numpy.int64)
+        # path[i] is the node for prefix last[:i],
+        # cache[i] the sorted ranks of its leaves or None
+        path = [self]
+        cache = [None]
+        last = ''
+        for index, word in sorted(enumerate(words), key=itemgetter(1)):
+            common = 0
+            for a, b in zip(last, word):
+                if a != b:
+                    break
+                common += 1
+            common = min(common, len(path) - 1)
+            del path[common + 1:]
+            del cache[common + 1:]
+            node = path[-1]
+            for c in word[common:]:
+                if node.children is not None and c in node.children:
+                    node = node.children[c]
+                    path.append(node)
+                    cache.append(None)
+                else:
+                    break
+            last = word
+            if len(word) == 0:
+                mks[index] = 0
+                best[index] = 0
+                continue
+            if len(path) != len(word) + 1 or not path[-1].leave:
+                mks[index] = len(word)
+                best[index] = -1
+                continue
+
+            rank = ranks[ranges[path[-1]][0]]
+            metric = len(word)
+            bestl = len(word)
+            for k in range(len(word) - 1, -1, -1):
+                if cache[k] is None:
+                    lo, hi = ranges[path[k]]
+                    cache[k] = numpy.sort(ranks[lo:hi])
+                ind = int(numpy.searchsorted(cache[k], rank))
+                m = k + ind + 1
+                if m < metric:
+                    metric = m
+                    bestl = k
+                if ind >= len(word):
+                    # no need to go further, the position will increase
+                    break
+            mks[index] = metric
+            best[index] = bestl
+        return mks, best
+
+    def _leaf_ranks(self) -> Tuple[Dict['CompletionTrieNode', Tuple[int, int]], numpy.ndarray]:
+        """
+        Numbers the leaves in depth-first order and ranks them
+        by weight, see @see me min_keystroke_many.
+
+        @return     ranges, ranks: leaves below *node* are numbered
+                    in ``range(*ranges[node])``, *ranks[i]* is the rank
+                    of leaf *i* among all leaves sorted by weight then value
+        """
+        ranges = {}
+        leaves = []
+        stack = [(self, -1)]
+        while len(stack) > 0:
+            node, lo = stack.pop()
+            if lo >= 0:
+                ranges[node] = (lo, len(leaves))
+                continue
+            stack.append((node, len(leaves)))
+            if node.leave:
+                leaves.append(node)
+            if node.children:
+                stack.extend((v, -1) for v in node.children.values())
+        order = sorted(range(len(leaves)),
+                       key=lambda i: (leaves[i].weight, leaves[i].value))
+        ranks = numpy.empty(len(leaves), dtype=numpy.int64)
+        ranks[order] = numpy.arange(len(leaves))
+        return ranges, ranks
+
     def min_keystroke0(self, word: str) -> Tuple[int, int]:
         """
         Returns the minimum keystrokes for a word.
@@ -342,11 +878,9 @@ class CompletionTrieNode:
         if node is None:
             raise NotImplementedError(
                 "this metric is not yet computed for a query outside the trie: '{0}'".format(word))
-        if not hasattr(node, "stat"):
-            raise AttributeError("run precompute_stat and update_stat_dynamic")
-        if not hasattr(node.stat, "mks1"):
+        if node.stat is None or node.stat.mks1 is None:
             raise AttributeError("run precompute_stat and update_stat_dynamic\nnode={0}\n{1}".format(
-                self, "\n".join(sorted(self.stat.__dict__.keys()))))
+                node, "-" if node.stat is None else node.stat.str_mks()))
         return node.stat.mks0, node.stat.mks0_, 0
 
     def min_dynamic_keystroke(self, word: str) -> Tuple[int, int]:
@@ -372,11 +906,9 @@ class CompletionTrieNode:
         if node is None:
             raise NotImplementedError(
                 "this metric is not yet computed for a query outside the trie: '{0}'".format(word))
-        if not hasattr(node, "stat"):
-            raise AttributeError("run precompute_stat and update_stat_dynamic")
-        if not hasattr(node.stat, "mks1"):
+        if node.stat is None or node.stat.mks1 is None:
             raise AttributeError("run precompute_stat and update_stat_dynamic\nnode={0}\n{1}".format(
-                self, "\n".join(sorted(self.stat.__dict__.keys()))))
+                node, "-" if node.stat is None else node.stat.str_mks()))
         return node.stat.mks1, node.stat.mks1_, node.stat.mks1i_
 
     def min_dynamic_keystroke2(self, word: str) -> Tuple[int, int]:
@@ -405,78 +937,588 @@ class CompletionTrieNode:
         if node is None:
             raise NotImplementedError(
                 "this metric is not yet computed for a query outside the trie: '{0}'".format(word))
-        if not hasattr(node, "stat"):
-            raise AttributeError("run precompute_stat and update_stat_dynamic")
-        if not hasattr(node.stat, "mks2"):
+        if node.stat is None or node.stat.mks2 is None:
             raise AttributeError("run precompute_stat and update_stat_dynamic\nnode={0}\n{1}".format(
-                self, "\n".join(sorted(self.stat.__dict__.keys()))))
+                node, "-" if node.stat is None else node.stat.str_mks()))
         return node.stat.mks2, node.stat.mks2_, node.stat.mks2i_
 
-    def precompute_stat(self):
+    def _longest_prefix(self, query: str) -> 'CompletionTrieNode':
         """
-        Computes and stores list of completions for each node,
-        computes *mks*.
+        Returns the deepest node whose value is a prefix of *query*.
 
-        @param      clean   clean stat
+        @param      query       query
+        @return                 node (*self* if no other node matches)
         """
-        stack = deque()
-        stack.extend(self.leaves())
-        while len(stack) > 0:
-            pop = stack.popleft()
-            if pop.stat is not None:
-                continue
-            if not pop.children:
-                pop.stat = CompletionTrieNode._Stat()
-                pop.stat.completions = []
-                pop.stat.mks0 = len(pop.value)
-                pop.stat.mks0_ = len(pop.value)
-                if pop.parent is not None:
-                    stack.append(pop.parent)
-            elif all(v.stat is not None for v in pop.children.values()):
-                pop.stat = CompletionTrieNode._Stat()
-                if pop.leave:
-                    pop.stat.mks0 = len(pop.value)
-                    pop.stat.mks0_ = len(pop.value)
-                stack.extend(pop.children.values())
-                pop.stat.merge_completions(pop.value, pop.children.values())
-                pop.stat.next_nodes = pop.children
-                pop.stat.update_minimum_keystroke(len(pop.value))
-                if pop.parent is not None:
-                    stack.append(pop.parent)
+        node = self
+        children = node.children
+        for c in query:
+            if children is None:
+                break
+            child = children.get(c, None)
+            if child is None:
+                break
+            node = child
+            children = child.children
+        return node
+
+    def test_metric(self, qset: Iterator[Tuple[str, float]], batch=65536) -> Dict[str, float]:
+        """
+        Evaluates the trie on a set of weighted queries,
+        the function returns the same dictionary as
+        @see me CompletionSystem.test_metric: the weighted sums of
+        *mks0*, *mks1*, *mks2*, the query lengths (*sum_wlen*), the weights
+        (*sum_weights*), the number of queries *n* and two histograms,
+        *hist* (sum of weights) and *histnow* (number of queries)
+        for every value of every metric and every length *l*.
+        It also adds *found*, the number of queries which are words of the trie.
+
+        @param      qset        iterator on tuple(str, float) = (query, weight),
+                                it is read once
+        @param      batch       metrics are stored in a buffer of this size,
+                                it is converted into numpy arrays and aggregated
+                                every time it is full, the memory does not depend
+                                on the number of queries
+        @return                 dictionary
+
+        This function must be called after @see me precompute_stat
+        and @see me update_stat_dynamic. A query which is not in the trie
+        is typed until the longest prefix found in the trie, the user then
+        types the remaining characters: *mks1* and *mks2* are the metrics
+        of the prefix plus the number of remaining characters,
+        *mks0* is the length of the query as it never appears in a completion list.
+        """
+        if self.stat is None or self.stat.mks1 is None:
+            raise AttributeError("run precompute_stat and update_stat_dynamic\nnode={0}".format(self))
+        names = ("mks0", "mks1", "mks2", "l")
+        hist = {k: {} for k in names}
+        wei = {k: {} for k in names}
+        res = dict(mks0=0.0, mks1=0.0, mks2=0.0,
+                   sum_weights=0.0, sum_wlen=0.0, n=0, found=0,
+                   hist=hist, histnow=wei)
+        # numpy arrays are filled by blocks, writing one element is slow
+        buffer = []
+
+        def flush():
+            values = numpy.array(buffer, dtype=numpy.float64).T
+            w = values[-1]
+            res["sum_weights"] += float(w.sum())
+            res["n"] += values.shape[1]
+            for name, vals in zip(names, values[:-1]):
+                res["sum_wlen" if name == "l" else name] += float(vals @ w)
+                keys, inv = numpy.unique(vals, return_inverse=True)
+                sums = numpy.bincount(inv, weights=w)
+                counts = numpy.bincount(inv)
+                h, c = hist[name], wei[name]
+                for key, sw, nb in zip(keys.tolist(), sums.tolist(), counts.tolist()):
+                    if name != "mks2":
+                        key = int(key)
+                    h[key] = h.get(key, 0) + sw
+                    c[key] = c.get(key, 0) + nb
+            buffer.clear()
+
+        found = 0
+        append = buffer.append
+        longest_prefix = self._longest_prefix
+        for query, weight in qset:
+            node = longest_prefix(query)
+            stat = node.stat
+            lq = len(query)
+            rest = lq - len(node.value)
+            if rest == 0:
+                append((stat.mks0, stat.mks1, stat.mks2, lq, weight))
+                if node.leave:
+                    found += 1
             else:
-                # we'll do it again later
-                stack.append(pop)
+                append((lq, stat.mks1 + rest, stat.mks2 + rest, lq, weight))
+            if len(buffer) == batch:
+                flush()
+        if buffer:
+            flush()
+        res["found"] = found
+        return res
 
-    def update_stat_dynamic(self, delta=0.8):
+    def precompute_stat(self, profile=None):
+        """
+        Computes and stores list of completions for each node,
+        computes *mks*. Every node is visited once,
+        after all its children (see @see me postorder_iter).
+
+        @param      profile     None, a dictionary or a function, it receives
+                                the information about phase ``'precompute_stat'``:
+                                *time*, *nodes* (computed), *merges* (nodes merging
+                                more than one list of completions), *chains* (one list),
+                                *completions* (total length of the merged lists),
+                                see @see me build
+        """
+        begin = time.perf_counter()
+        if profile is None:
+            for pop in self.postorder_iter():
+                if pop.stat is None:
+                    pop._precompute_node_stat()
+            return
+
+        nodes = merges = chains = completions = 0
+        for pop in self.postorder_iter():
+            if pop.stat is None:
+                pop._precompute_node_stat()
+                nodes += 1
+                if pop.children:
+                    lists = sum(1 for c in pop.children.values() if c.stat.completions)
+                    if any(c.leave for c in pop.children.values()):
+                        lists += 1
+                    if lists > 1:
+                        merges += 1
+                    else:
+                        chains += 1
+                    completions += len(pop.stat.completions)
+        _profile_report(profile, 'precompute_stat', dict(
+            time=time.perf_counter() - begin, nodes=nodes, merges=merges,
+            chains=chains, completions=completions))
+
+    def _precompute_node_stat(self):
+        """
+        Computes the statistics of one node for @see me precompute_stat,
+        the children must be already done.
+        """
+        self.stat = CompletionTrieNode._Stat()
+        if not self.children:
+            self.stat.completions = []
+            self.stat.mks0 = len(self.value)
+            self.stat.mks0_ = len(self.value)
+        else:
+            if self.leave:
+                self.stat.mks0 = len(self.value)
+                self.stat.mks0_ = len(self.value)
+            self.stat.merge_completions(self.value, self.children.values())
+            self.stat.next_nodes = self.children
+            self.stat.update_minimum_keystroke(len(self.value))
+
+    def update_stat_dynamic(self, delta=0.8, fLOG=noLOG, profile=None):
         """
         Must be called after @see me precompute_stat
         and computes dynamic mks (see :ref:`Dynamic Minimum Keystroke <def-mks2>`).
 
         @param      delta       parameter :math:`\\delta` in defintion
                                 :ref:`Modified Dynamic KeyStroke <def-mks3>`
-        @return                 number of iterations to converge
+        @param      fLOG        logging function
+        @param      profile     None, a dictionary or a function, it receives
+                                the information about phase ``'update_stat_dynamic'``:
+                                *time*, *init_time*, *iterations*, *touched* and *updates*
+                                (visited nodes and updated metrics for every iteration),
+                                see @see me build
+        @return                 number of iterations to converge, the last one
+                                does not update anything
+
+        The first iteration visits every node (see @see me unsorted_iter).
+        A node pushes its metrics to its completions and its children,
+        it only needs to be visited again if its own metrics were improved
+        after it was visited. The next iterations only visit these nodes
+        (ancestors first) until no node is left. If the last iteration
+        which ran updated something, the iteration which would confirm
+        nothing changes is counted but not run.
+        The number of visited nodes for every iteration which ran
+        is stored in ``meta['touched']``.
         """
+        begin = time.perf_counter()
         for node in self.unsorted_iter():
             node.stat.init_dynamic_minimum_keystroke(len(node.value))
             node.stat.iter_ = 0
-        updates = 1
+        init_time = time.perf_counter() - begin
+
+        def visit(pop, itera, pending):
+            pop.stat.mks_iter = itera
+            pop.stat.iter_ = itera + 1
+            updated = []
+            nb = pop.stat.update_dynamic_minimum_keystroke(
+                len(pop.value), delta, updated)
+            for node in updated:
+                if node.stat.iter_ > itera or (
+                        pending is not None and id(node) not in pending):
+                    # the node was already visited with its previous metrics
+                    dirty[id(node)] = node
+            return nb
+
+        touched = []
+        all_updates = []
         itera = 0
-        while updates > 0:
+        dirty = {}
+        # first iteration, every node
+        updates = 0
+        visited = 0
+        for pop in self.unsorted_iter():
+            updates += visit(pop, itera, None)
+            visited += 1
+        touched.append(visited)
+        all_updates.append(updates)
+        fLOG("iteration {0}: touched={1} updates={2}".format(
+            itera, visited, updates))
+        itera += 1
+
+        while len(dirty) > 0:
+            work = sorted(dirty.values(), key=lambda n: len(n.value))
+            pending = set(dirty)
+            dirty = {}
             updates = 0
-            stack = []
-            stack.append(self)
-            while len(stack) > 0:
-                pop = stack.pop()
-                if pop.stat.iter_ > itera:
-                    continue
-                updates += pop.stat.update_dynamic_minimum_keystroke(
-                    len(pop.value), delta)
-                if pop.children:
-                    stack.extend(pop.children.values())
-                pop.stat.iter_ += 1
+            for pop in work:
+                updates += visit(pop, itera, pending)
+            touched.append(len(work))
+            all_updates.append(updates)
+            fLOG("iteration {0}: touched={1} updates={2}".format(
+                itera, len(work), updates))
             itera += 1
+        if updates > 0:
+            # the last iteration, nothing would be updated
+            itera += 1
+
+        self._set_meta(delta=delta, touched=touched)
+        if profile is not None:
+            _profile_report(profile, 'update_stat_dynamic', dict(
+                time=time.perf_counter() - begin, init_time=init_time,
+                iterations=itera, touched=touched, updates=all_updates))
         return itera
 
+    def _path(self, word: str) -> List['CompletionTrieNode']:
+        """
+        Returns the nodes from the root to the node holding *word*
+        or None if the word is not in the trie.
+        """
+        path = [self]
+        node = self
+        for c in word:
+            if node.children is not None and c in node.children:
+                node = node.children[c]
+                path.append(node)
+            else:
+                return None
+        return path
+
+    def insert(self, word: str, weight=1.0, disp=None):
+        """
+        Inserts a word into a trie already built and repairs
+        the precomputed data (see @see me precompute_stat,
+        @see me update_stat_dynamic, @see me precompute_topk)
+        only for the nodes the new word may change (see @see me _repair).
+
+        @param      word        word to insert
+        @param      weight      weight
+        @param      disp        display string
+        """
+        path = [self]
+        node = self
+        for c in word:
+            if not node.leave:
+                node.weight = weight if node.weight is None else min(node.weight, weight)
+            if node.children is not None and c in node.children:
+                node = node.children[c]
+            else:
+                new_node = CompletionTrieNode(
+                    node.value + c, False, weight=weight)
+                node._add(c, new_node)
+                node = new_node
+            path.append(node)
+        if node.leave:
+            raise ValueError(
+                "Value '{0}' appears twice in the input list (not allowed).".format(word))
+        node.leave = True
+        node.weight = weight
+        if disp is not None:
+            node.disp = disp
+        self._repair(path)
+
+    def remove(self, word: str):
+        """
+        Removes a word from a trie and repairs
+        the precomputed data (see @see me insert).
+
+        @param      word        word to remove
+        """
+        path = self._path(word)
+        if path is None or not path[-1].leave:
+            raise KeyError("Unable to find '{0}'.".format(word))
+        path[-1].leave = False
+        path[-1].disp = None
+        # removes the nodes which do not lead to any completion anymore
+        while len(path) > 1 and not path[-1].children and not path[-1].leave:
+            child = path.pop()
+            parent = path[-1]
+            del parent.children[child.value[-1]]
+            if not parent.children:
+                parent.children = None
+            child.parent = None
+        self._repair(path)
+
+    def reweight(self, word: str, weight):
+        """
+        Changes the weight of a word and repairs
+        the precomputed data (see @see me insert).
+
+        @param      word        word
+        @param      weight      new weight
+        """
+        path = self._path(word)
+        if path is None or not path[-1].leave:
+            raise KeyError("Unable to find '{0}'.".format(word))
+        path[-1].weight = weight
+        self._repair(path)
+
+    def _lowest_weight(self):
+        """
+        Returns the lowest weight of the completions in the subtree
+        (the node included), None if there is no completion.
+        It is the first weight of the lists computed by
+        @see me precompute_topk or @see me precompute_stat if they exist,
+        otherwise the weight of a child which is not a completion
+        is already the lowest weight below it, the function only goes
+        down through the children which are completions.
+        """
+        if self.topk is not None:
+            return self.topk[0][0] if self.topk else None
+        res = self.weight if self.leave else None
+        if self.stat is not None and self.stat.completions is not None:
+            if self.stat.completions:
+                w = self.stat.completions[0][0]
+                if res is None or w < res:
+                    res = w
+            return res
+        if self.children:
+            for child in self.children.values():
+                w = child._lowest_weight() if child.leave else child.weight
+                if w is not None and (res is None or w < res):
+                    res = w
+        return res
+
+    def _repair(self, path: List['CompletionTrieNode']):
+        """
+        Repairs the precomputed data after a word was modified.
+        The lists of completions can only change for the nodes
+        in *path* (from the root to the modified node),
+        they are merged again from the deepest node to the root,
+        the weight of a node which is not a completion is the first
+        weight of these lists (see @see me _lowest_weight).
+        *mks0* is computed again for every completion which
+        appears in one of these lists before or after the change.
+        The dynamic metrics of a node only depend on its ancestors,
+        the nodes which may change are processed by increasing depth
+        and a node whose metrics changed adds to the queue the nodes
+        which depend on it (see @see me _dynamic_from_ancestors).
+
+        @param      path        nodes from the root to the modified node
+        """
+        version = 0 if self.meta is None else self.meta.get('version', 0)
+        self._set_meta(version=version + 1)
+        topk = self.meta.get('topk', None)
+        dynamic = self.stat is not None and self.stat.mks1 is not None
+        affected = {}
+        for node in reversed(path):
+            if topk is not None:
+                node._update_topk(topk)
+            if self.stat is not None:
+                if node.stat is None:
+                    node.stat = CompletionTrieNode._Stat()
+                    if dynamic:
+                        node.stat.mks_iter = self.stat.mks_iter
+                        node.stat.iter_ = self.stat.iter_
+                else:
+                    for _, s in node.stat.completions:
+                        affected[id(s)] = s
+                if node.children:
+                    node.stat.merge_completions(
+                        node.value, node.children.values())
+                    node.stat.next_nodes = node.children
+                else:
+                    node.stat.completions = []
+                    node.stat.next_nodes = None
+                for _, s in node.stat.completions:
+                    affected[id(s)] = s
+            # the weight of a node which is not a completion is the lowest weight below
+            if not node.leave:
+                node.weight = node._lowest_weight()
+
+        if self.stat is None:
+            return
+
+        # mks0
+        for node in path:
+            if not node.leave:
+                if dynamic or not node.children:
+                    node.stat.mks0 = len(node.value)
+                    node.stat.mks0_ = 0 if dynamic else len(node.value)
+                else:
+                    node.stat.mks0 = None
+                    node.stat.mks0_ = None
+        # a removed word is not a completion anymore,
+        # the other completions are still in the trie
+        for node in list(affected.values()) + path:
+            if node.leave:
+                node._mks0_from_ancestors()
+        if not dynamic:
+            return
+
+        # dynamic metrics, nodes are processed by increasing depth
+        delta = self.meta['delta']
+        heap = []
+        queued = set()
+
+        def push(node):
+            if id(node) not in queued:
+                queued.add(id(node))
+                heapq.heappush(heap, (len(node.value), id(node), node))
+
+        for node in path[1:]:
+            push(node)
+        for node in affected.values():
+            if node.leave:
+                push(node)
+        while len(heap) > 0:
+            _, __, node = heapq.heappop(heap)
+            st = node.stat
+            before = (st.mks1, st.mks1_, st.mks2, st.mks2_)
+            node._dynamic_from_ancestors(delta)
+            if before == (st.mks1, st.mks1_, st.mks2, st.mks2_):
+                continue
+            # the nodes which depend on this one
+            for _, s in st.completions:
+                push(s)
+            if node.children:
+                for child in node.children.values():
+                    push(child)
+                    for _, s in child.stat.completions:
+                        push(s)
+
+    def _mks0_from_ancestors(self):
+        """
+        Computes *mks0* for a completion from the lists of
+        completions of its ancestors, it gives the same result
+        as @see me precompute_stat.
+        """
+        mks0 = len(self.value)
+        mks0_ = len(self.value)
+        node = self.parent
+        while node is not None:
+            for i, (_, sug) in enumerate(node.stat.completions):
+                if sug is self:
+                    nl = len(node.value) + i + 1
+                    if mks0 > nl:
+                        mks0 = nl
+                        mks0_ = len(node.value)
+                    break
+            node = node.parent
+        self.stat.mks0 = mks0
+        self.stat.mks0_ = mks0_
+
+    def _dynamic_from_ancestors(self, delta):
+        """
+        Computes the dynamic metrics of a node (*mks1*, *mks2*)
+        from the metrics of its ancestors assuming these are final.
+        The ancestors are considered from the root and the updates
+        follow the same order as @see me update_stat_dynamic
+        to obtain the same results.
+
+        @param      delta       parameter :math:`\\delta` in defintion
+                                :ref:`Modified Dynamic KeyStroke <def-mks3>`
+        """
+        st = self.stat
+        lw = len(self.value)
+        if self.leave:
+            st.mks1 = st.mks2 = st.mks0
+            st.mks1_ = st.mks2_ = st.mks0_
+        else:
+            st.mks1 = st.mks2 = lw
+            st.mks1_ = st.mks2_ = lw
+        st.mks1i_ = st.mks2i_ = 0
+
+        ancestors = []
+        node = self.parent
+        while node is not None:
+            ancestors.append(node)
+            node = node.parent
+        ancestors.reverse()
+        ancestors.append(self)
+        for i, node in enumerate(ancestors[:-1]):
+            ps = node.stat
+            lp = len(node.value)
+            # the iteration in which the ancestor pushed its final metrics,
+            # see @see me _Stat.update_dynamic_minimum_keystroke
+            it = ps.mks_iter
+            if self.leave:
+                for r, (_, sug) in enumerate(ps.completions):
+                    if sug is self:
+                        nl = ps.mks1 + r + 1
+                        if st.mks1 > nl:
+                            st.mks1 = nl
+                            st.mks1_ = lp
+                            st.mks1i_ = it
+                        nl = ps.mks2 + r + 1 + delta
+                        if st.mks2 > nl:
+                            st.mks2 = nl
+                            st.mks2_ = lp
+                            st.mks2i_ = it
+                        break
+                child = ancestors[i + 1]
+                if child is not self:
+                    for r, (_, sug) in enumerate(child.stat.completions):
+                        if sug is self:
+                            nl = ps.mks2 + r + 2
+                            if st.mks2 > nl:
+                                st.mks2 = nl
+                                st.mks2_ = lp
+                                st.mks2i_ = it
+                            break
+            if ancestors[i + 1] is self:
+                if st.mks1 > ps.mks1 + 1:
+                    st.mks1 = ps.mks1 + 1
+                    st.mks1_ = ps.mks1_
+                    st.mks1i_ = it
+                if st.mks2 > ps.mks2 + 1:
+                    st.mks2 = ps.mks2 + 1
+                    st.mks2_ = ps.mks2_
+                    st.mks2i_ = it
+
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Estimates the memory used by the trie, it sums up
+        the size of every node, its dictionary of children,
+        its value and its statistics if @see me precompute_stat was run.
+
+        @return     dictionary with keys *nodes*, *words*, *bytes*,
+                    *bytes_per_node*, *bytes_per_word*
+        """
+        size = 0
+        nodes = 0
+        words = 0
+        for node in self.unsorted_iter():
+            nodes += 1
+            if node.leave:
+                words += 1
+            size += sys.getsizeof(node) + sys.getsizeof(node.value)
+            if node.children is not None:
+                size += sys.getsizeof(node.children)
+            if node.topk is not None:
+                size += sys.getsizeof(node.topk)
+                size += sum(sys.getsizeof(c) for c in node.topk)
+            if node.stat is not None:
+                size += sys.getsizeof(node.stat)
+                if node.stat.completions is not None:
+                    size += sys.getsizeof(node.stat.completions)
+                    size += sum(sys.getsizeof(c)
+                                for c in node.stat.completions)
+        return dict(nodes=nodes, words=words, bytes=size,
+                    bytes_per_node=size / max(nodes, 1),
+                    bytes_per_word=size / max(words, 1))
+
+    def save(self, path: str):
+        """
+        Saves the trie and its statistics (if @see me precompute_stat
+        and @see me update_stat_dynamic were called) into a flat file.
+        The file is loaded with
+        @see me CompactCompletionTrie.load (in :mod:`mlstatpy.nlp.completion_compact`),
+        it returns a @see cl CompactCompletionTrie which gives the same results.
+
+        @param      path        filename
+        """
+        from .completion_compact import CompactCompletionTrie
+        CompactCompletionTrie.from_trie(self).save(path)
+
     ##
     # end of methods, beginning of subclasses
     ##
@@ -498,46 +1540,69 @@ class CompletionTrieNode:
         * *mks2*: value of modified dynamic minimum keystroke
         * *mks2_*: length of the prefix to obtain *mks2*
         * *mks2i*: iteration when it converged
+
+        Every member is declared in ``__slots__``, None means
+        the value was not computed yet.
         """
 
+        __slots__ = ("completions", "next_nodes", "iter_", "mks_iter",
+                     "mks0", "mks0_", "mks1", "mks1_", "mks1i_",
+                     "mks2", "mks2_", "mks2i_")
+
+        def __init__(self):
+            self.completions = None
+            self.next_nodes = None
+            self.iter_ = 0
+            self.mks_iter = 0
+            self.mks0 = None
+            self.mks0_ = None
+            self.mks1 = None
+            self.mks1_ = None
+            self.mks1i_ = None
+            self.mks2 = None
+            self.mks2_ = None
+            self.mks2i_ = None
+
         def merge_completions(self, prefix: int, nodes: '[CompletionTrieNode]'):
             """
             Merges list of completions and cut the list, we assume
-            given lists are sorted.
+            given lists are sorted. The lists are merged with a heap
+            and the merge stops once the cut-off is reached.
             """
-            class Fake:
-                pass
-            res = []
-            indexes = [0 for _ in nodes]
-            indexes.append(0)
-            last = Fake()
-            last.value = None
-            last.stat = CompletionTrieNode._Stat()
-            last.stat.completions = list(
-                sorted((_.weight, _) for _ in nodes if _.leave))
             nodes = list(nodes)
-            nodes.append(last)
-
-            maxl = 0
-            while True:
-                en = [(_.stat.completions[indexes[i]][0], i, _.stat.completions[indexes[i]][1])
-                      for i, _ in enumerate(nodes) if indexes[i] < len(_.stat.completions)]
-                if not en:
-                    break
-                e = min(en)
-                i = e[1]
-                res.append((e[0], e[2]))
-                indexes[i] += 1
-                maxl = max(maxl, len(res[-1][1].value))
+            # the completions of a node do not include the node itself,
+            # leaves among the children are added as an extra list
+            last = sorted(((_.weight, _) for _ in nodes if _.leave),
+                          key=itemgetter(0))
+            lists = [_.stat.completions for _ in nodes if _.stat.completions]
+            if last:
+                lists.append(last)
+            self.completions = CompletionTrieNode._Stat.merge_lists(lists)
+
+        @staticmethod
+        def merge_lists(lists):
+            """
+            Merges sorted lists of completions and cuts the result,
+            see @see me merge_completions.
 
+            @param      lists       non empty lists of ``(weight, node)``
+            @return                 merged list
+            """
             # maxl - len(prefix) represents the longest list which reduces the number of keystrokes
             # however, as the method aggregates completions at a lower lovel,
             # we must keep longer completions for lower levels
-            ind = maxl
-            if len(res) > ind:
-                self.completions = res[:ind]
-            else:
-                self.completions = res
+            maxl = 0
+            for li in lists:
+                for _, sug in li:
+                    if len(sug.value) > maxl:
+                        maxl = len(sug.value)
+
+            if len(lists) == 1:
+                # a chain of nodes, nothing to merge
+                return lists[0][:maxl]
+            # heapq.merge is stable, completions with the same weight
+            # are ordered by the position of the list they come from
+            return list(islice(heapq.merge(*lists, key=itemgetter(0)), maxl))
 
         def update_minimum_keystroke(self, lw):
             """
@@ -548,17 +1613,18 @@ class CompletionTrieNode:
             for i, wsug in enumerate(self.completions):
                 sug = wsug[1]
                 nl = lw + i + 1
-                if not hasattr(sug.stat, "mks0") or sug.stat.mks0 > nl:
+                if sug.stat.mks0 is None or sug.stat.mks0 > nl:
                     sug.stat.mks0 = nl
                     sug.stat.mks0_ = lw
 
-        def update_dynamic_minimum_keystroke(self, lw, delta):
+        def update_dynamic_minimum_keystroke(self, lw, delta, updated=None):
             """
             Updates dynamic minimum keystroke for the completions.
 
             @param      lw      prefix length
             @param      delta   parameter :math:`\\delta` in defintion
                                 :ref:`Modified Dynamic KeyStroke <def-mks3>`
+            @param      updated if not None, the updated nodes are appended to this list
             @return             number of updates
             """
             self.mks_iter += 1
@@ -574,19 +1640,23 @@ class CompletionTrieNode:
                         sug.stat.mks1_ = lw
                         sug.stat.mks1i_ = self.mks_iter
                         update += 1
+                        if updated is not None:
+                            updated.append(sug)
                     nl = self.mks2 + i + 1 + delta
                     if sug.stat.mks2 > nl:
                         sug.stat.mks2 = nl
                         sug.stat.mks2_ = lw
                         sug.stat.mks2i_ = self.mks_iter
                         update += 1
+                        if updated is not None:
+                            updated.append(sug)
                 else:
                     raise Exception("this case should not happen")
 
             # optimisation of second case of modified metric
             # in a separate function for profiling
             def second_step(update):
-                if hasattr(self, "next_nodes"):
+                if self.next_nodes is not None:
                     for _, child in self.next_nodes.items():
                         for i, wsug in enumerate(child.stat.completions):
                             sug = wsug[1]
@@ -598,6 +1668,8 @@ class CompletionTrieNode:
                                 sug.stat.mks2_ = lw
                                 sug.stat.mks2i_ = self.mks_iter
                                 update += 1
+                                if updated is not None:
+                                    updated.append(sug)
                 return update
 
             update = second_step(update)
@@ -606,18 +1678,22 @@ class CompletionTrieNode:
             # this is not necessary a leave so it does not appear in the list of completions
             # but we need to update mks for these strings, we assume it just
             # requires an extra character, somehow, we propagate the values
-            if hasattr(self, "next_nodes"):
+            if self.next_nodes is not None:
                 for _, n in self.next_nodes.items():
-                    if not hasattr(n.stat, "mks1") or n.stat.mks1 > self.mks1 + 1:
+                    if n.stat.mks1 is None or n.stat.mks1 > self.mks1 + 1:
                         n.stat.mks1 = self.mks1 + 1
                         n.stat.mks1_ = self.mks1_
                         n.stat.mks1i_ = self.mks_iter
                         update += 1
-                    if not hasattr(n.stat, "mks2") or n.stat.mks2 > self.mks2 + 1:
+                        if updated is not None:
+                            updated.append(n)
+                    if n.stat.mks2 is None or n.stat.mks2 > self.mks2 + 1:
                         n.stat.mks2 = self.mks2 + 1
                         n.stat.mks2_ = self.mks2_
                         n.stat.mks2i_ = self.mks_iter
                         update += 1
+                        if updated is not None:
+                            updated.append(n)
 
             return update
 
@@ -627,7 +1703,7 @@ class CompletionTrieNode:
 
             @param      lw      length of the prefix
             """
-            if hasattr(self, "mks0"):
+            if self.mks0 is not None:
                 self.mks1 = self.mks0
                 self.mks1_ = self.mks0_
                 self.mks_iter = 0
@@ -650,7 +1726,7 @@ class CompletionTrieNode:
             """
             Returns a string with metric information.
             """
-            if hasattr(self, "mks0"):
+            if self.mks0 is not None:
                 return "MKS={0} *={1}".format(self.mks0, self.mks0_)
             else:
                 return "-"
@@ -660,8 +1736,165 @@ class CompletionTrieNode:
             Returns a string with metric information.
             """
             s0 = self.str_mks0()
-            if hasattr(self, "mks1"):
+            if self.mks1 is not None:
                 return s0 + " |'={0} *={1},{2} |\"={3} *={4},{5} |nn={6}".format(
-                    self.mks1, self.mks1_, self.mks1i_, self.mks2, self.mks2i_, self.mks2i_, '+' if hasattr(self, "next_nodes") else '-')
+                    self.mks1, self.mks1_, self.mks1i_, self.mks2, self.mks2i_, self.mks2i_, '+' if self.next_nodes is not None else '-')
             else:
                 return s0
+
+
+def _profile_report(profile, phase, info):
+    """
+    Sends the information collected about a phase
+    (see parameter *profile* in @see me build).
+
+    @param      profile     None, a dictionary (*info* is stored in ``profile[phase]``)
+                            or a function called with ``(phase, info)``
+    @param      phase       name of the phase
+    @param      info        dictionary
+    """
+    if profile is None:
+        return
+    if callable(profile):
+        profile(phase, info)
+    else:
+        profile[phase] = info
+
+
+def _build_shard(words, precompute, topk, encode):
+    """
+    Builds a sub-trie for @see me CompletionTrieNode.build_parallel,
+    it needs to be a function to be pickled.
+
+    @param  words       list of ``(weight, word, display string)``
+    @param  precompute  calls @see me CompletionTrieNode.precompute_stat
+    @param  topk        calls @see me CompletionTrieNode.precompute_topk if not None
+    @param  encode      returns the sub-trie as flat lists (see @see fn _encode_shard)
+    @return             root of the sub-trie or flat lists
+    """
+    # the garbage collector keeps visiting the nodes already created
+    # for nothing, the nodes are released with the trie
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        root = CompletionTrieNode.build(words, topk=topk)
+        if precompute and root.children:
+            # the root of the whole trie updates mks0 as well,
+            # the root of the sub-trie must not
+            for child in root.children.values():
+                child.precompute_stat()
+        return _encode_shard(root) if encode else root
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _encode_shard(root):
+    """
+    Converts a sub-trie into flat lists, the nodes are numbered
+    in pre-order, children follow their insertion order.
+    The root is not included.
+
+    @param  root        root of the sub-trie
+    @return             dictionary of lists
+    """
+    index = {}
+    nodes = []
+    parents, chars, weights, leaves, disps, mks0 = [], [], [], [], [], []
+    stack = list(reversed(list(root.children.values())))
+    while len(stack) > 0:
+        node = stack.pop()
+        index[id(node)] = len(nodes)
+        nodes.append(node)
+        parents.append(index.get(id(node.parent), -1))
+        chars.append(node.value[-1])
+        weights.append(node.weight)
+        leaves.append(node.leave)
+        disps.append(node.disp)
+        if node.stat is not None and node.stat.mks0 is not None:
+            mks0.append((node.stat.mks0, node.stat.mks0_))
+        else:
+            mks0.append(None)
+        if node.children:
+            stack.extend(reversed(list(node.children.values())))
+
+    data = dict(parents=parents, chars=chars, weights=weights,
+                leaves=leaves, disps=disps, mks0=mks0)
+    if root.children and nodes[0].stat is not None:
+        counts = []
+        comp = []
+        for node in nodes:
+            counts.append(len(node.stat.completions))
+            comp.extend(index[id(s)] for _, s in node.stat.completions)
+        data['comp_counts'] = counts
+        data['comp'] = comp
+    if root.children and nodes[0].topk is not None:
+        counts = []
+        topk = []
+        for node in nodes:
+            counts.append(len(node.topk))
+            topk.extend(index[id(t[2])] for t in node.topk)
+        data['topk_counts'] = counts
+        data['topk'] = topk
+    return data
+
+
+def _decode_shard(data):
+    """
+    Restores a sub-trie converted by @see fn _encode_shard.
+
+    @param  data        dictionary of lists
+    @return             list of nodes attached to the root of the sub-trie
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _decode_shard_nogc(data)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _decode_shard_nogc(data):
+    """
+    Implements @see fn _decode_shard.
+    """
+    nodes = []
+    roots = []
+    stat = 'comp' in data
+    for p, c, w, l, d, m in zip(data['parents'], data['chars'], data['weights'],
+                                data['leaves'], data['disps'], data['mks0']):
+        if p == -1:
+            node = CompletionTrieNode(c, l, weight=w, disp=d)
+            roots.append(node)
+        else:
+            parent = nodes[p]
+            node = CompletionTrieNode(parent.value + c, l, weight=w, disp=d)
+            if parent.children is None:
+                parent.children = {c: node}
+            else:
+                parent.children[c] = node
+            node.parent = parent
+        if stat:
+            node.stat = CompletionTrieNode._Stat()
+            if m is not None:
+                node.stat.mks0, node.stat.mks0_ = m
+        nodes.append(node)
+
+    if stat:
+        comp = data['comp']
+        pos = 0
+        for node, count in zip(nodes, data['comp_counts']):
+            node.stat.completions = [(nodes[i].weight, nodes[i])
+                                     for i in comp[pos:pos + count]]
+            pos += count
+            if node.children:
+                node.stat.next_nodes = node.children
+    if 'topk' in data:
+        topk = data['topk']
+        pos = 0
+        for node, count in zip(nodes, data['topk_counts']):
+            node.topk = [(nodes[i].weight, nodes[i].value, nodes[i])
+                         for i in topk[pos:pos + count]]
+            pos += count
+    return roots
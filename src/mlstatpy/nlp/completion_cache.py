@@ -0,0 +1,162 @@
+"""
+@file
+@brief About completion, a cache in front of completion queries
+"""
+from collections import OrderedDict
+from typing import Tuple, List, Dict
+
+
+class CompletionCache:
+    """
+    Bounded cache in front of the method *complete* of a completion engine
+    (@see cl CompletionTrieNode, @see cl CompactCompletionTrie,
+    @see cl CompletionSortedArray...), the keys are ``(prefix, k)``.
+    Two eviction policies are available:
+
+    * ``'lru'``: the least recently used key is removed first,
+    * ``'lfu'``: the least frequently used key is removed first,
+      the least recently used one among keys with the same frequency.
+
+    Both of them cost :math:`O(1)` per query.
+    @see cl CompletionTrieNode increments ``meta['version']``
+    in the root every time a word is inserted, removed or reweighted,
+    the cache is emptied if the version changed since the last query.
+    Method @see me clear must be called after any other modification
+    of the engine.
+
+    ::
+
+        trie = CompletionTrieNode.build(queries, topk=10)
+        cache = CompletionCache(trie, maxsize=10000)
+        cache.complete('mach', 10)
+        cache.stats()
+    """
+
+    def __init__(self, engine, maxsize=10000, policy='lru'):
+        """
+        @param      engine      any object with a method ``complete(prefix, k)``
+        @param      maxsize     maximum number of cached results
+        @param      policy      ``'lru'`` or ``'lfu'``
+        """
+        if policy not in ('lru', 'lfu'):
+            raise ValueError("Unknown policy '{0}'.".format(policy))
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive not {0}.".format(maxsize))
+        self.engine = engine
+        self.maxsize = maxsize
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._version = self._engine_version()
+        self.clear()
+
+    def _engine_version(self):
+        """
+        Returns the version of the engine or None if it has none.
+        """
+        meta = getattr(self.engine, 'meta', None)
+        return None if meta is None else meta.get('version', None)
+
+    def clear(self):
+        """
+        Empties the cache, the counters are kept.
+        """
+        # lru: key -> result
+        # lfu: key -> (frequency, result) and frequency -> keys in lru order
+        self._values = OrderedDict() if self.policy == 'lru' else {}
+        self._freqs = {}
+        self._minfreq = 0
+
+    def __len__(self) -> int:
+        """
+        Returns the number of cached results.
+        """
+        return len(self._values)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns the counters, *hits*, *misses*, *evictions*, *invalidations*,
+        *size* and *maxsize*.
+        """
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                    invalidations=self.invalidations, size=len(self),
+                    maxsize=self.maxsize)
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions for a prefix,
+        see @see me CompletionTrieNode.complete.
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(weight, value)``, the caller may modify it
+        """
+        version = self._engine_version()
+        if version != self._version:
+            self._version = version
+            self.invalidations += 1
+            self.clear()
+
+        key = (prefix, k)
+        if self.policy == 'lru':
+            res = self._values.get(key, None)
+            if res is not None:
+                self.hits += 1
+                self._values.move_to_end(key)
+                return list(res)
+        else:
+            item = self._values.get(key, None)
+            if item is not None:
+                self.hits += 1
+                freq, res = item
+                self._touch(key, freq)
+                self._values[key] = (freq + 1, res)
+                return list(res)
+
+        self.misses += 1
+        res = self.engine.complete(prefix, k)
+        if len(self._values) >= self.maxsize:
+            self.evictions += 1
+            if self.policy == 'lru':
+                self._values.popitem(last=False)
+            else:
+                keys = self._freqs[self._minfreq]
+                old, _ = keys.popitem(last=False)
+                if not keys:
+                    del self._freqs[self._minfreq]
+                del self._values[old]
+        if self.policy == 'lru':
+            self._values[key] = res
+        else:
+            self._values[key] = (1, res)
+            if 1 not in self._freqs:
+                self._freqs[1] = OrderedDict()
+            self._freqs[1][key] = None
+            self._minfreq = 1
+        return list(res)
+
+    def _touch(self, key, freq):
+        """
+        Moves a key from one frequency to the next one (policy ``'lfu'``).
+        """
+        keys = self._freqs[freq]
+        del keys[key]
+        if not keys:
+            del self._freqs[freq]
+            if self._minfreq == freq:
+                self._minfreq = freq + 1
+        if freq + 1 not in self._freqs:
+            self._freqs[freq + 1] = OrderedDict()
+        self._freqs[freq + 1][key] = None
+
+    def complete_many(self, prefixes: List[str], k=10) -> List[List[Tuple[float, str]]]:
+        """
+        Calls @see me complete for many prefixes.
+
+        @param      prefixes    list of prefixes
+        @param      k           number of completions to return for every prefix
+        @return                 list of results in the same order as *prefixes*
+        """
+        return [self.complete(p, k) for p in prefixes]
@@ -0,0 +1,307 @@
+"""
+@file
+@brief About completion, a completion system stored in columns
+"""
+import time
+from typing import Tuple, List, Iterator
+import numpy
+from pyquickhelper.loghelper import noLOG
+from .completion import CompletionTrieNode, _profile_report
+from .completion_simple import CompletionElement, CompletionSystem
+
+
+class ColumnarCompletionSystem(CompletionSystem):
+    """
+    Same as @see cl CompletionSystem but the elements are not
+    stored as @see cl CompletionElement, every attribute is a column:
+
+    * *buffer*: all values concatenated in a single string
+    * *offsets*: position of every value in *buffer*, length is ``n + 1``
+    * *weights*: weight of every value
+    * *order*: the elements in their current order, ``self[i]``
+      is the value ``buffer[offsets[order[i]]:offsets[order[i] + 1]]``
+    * *metrics*: None or a dictionary with one array for every metric
+      (*mks0*, *mks0_*, ...) filled by @see me compute_metrics,
+      *prefix* is the last element used as a prefix (-1 for none)
+    * *details*: None or the details logged for every row
+      by @see me compute_metrics with ``details=True``
+
+    The columns are never moved, methods @see me sort_values and
+    @see me sort_weight only change the permutation *order*
+    computed with ``numpy.lexsort``, the values are ranked once
+    in the constructor. A @see cl CompletionElement is created
+    every time an element is accessed, it is a copy.
+    """
+
+    def __init__(self, elements: List[CompletionElement]):
+        """
+        @param      elements    same as @see cl CompletionSystem
+        """
+        values = []
+        weights = []
+        disp = None
+        for i, e in enumerate(elements):
+            if isinstance(e, CompletionElement):
+                value, weight = e.value, e.weight
+                if e.disp is not None:
+                    if disp is None:
+                        disp = {}
+                    disp[i] = e.disp
+            elif isinstance(e, tuple):
+                value, weight = e[1], e[0] if e[0] else i
+            else:
+                value, weight = e, i
+            if not isinstance(value, str):
+                raise TypeError(
+                    "value must be str not '{0}' - type={1}".format(value, type(value)))
+            values.append(value)
+            weights.append(weight)
+        n = len(values)
+        self.buffer = "".join(values)
+        self.offsets = numpy.zeros(n + 1, dtype=numpy.int64)
+        self.offsets[1:] = numpy.cumsum([len(v) for v in values])
+        self.weights = numpy.array(weights, dtype=numpy.float64)
+        self.order = numpy.arange(n, dtype=numpy.int64)
+        self.metrics = None
+        self.details = None
+        self._disp = disp
+        # rank of every value in alphabetical order, equal values share the same rank
+        rank = numpy.empty(n, dtype=numpy.int64)
+        prev = None
+        r = -1
+        for i in sorted(range(n), key=values.__getitem__):
+            if values[i] != prev:
+                r += 1
+                prev = values[i]
+            rank[i] = r
+        self._rank = rank
+        # index value -> row built by method find
+        self._index = None
+        self._index_dups = False
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "ColumnarCompletionSystem(n={0}, size={1})".format(
+            len(self), len(self.buffer))
+
+    def _value(self, row: int) -> str:
+        """
+        Returns the value stored in a row.
+        """
+        return self.buffer[self.offsets[row]:self.offsets[row + 1]]
+
+    def _element(self, row: int) -> CompletionElement:
+        """
+        Creates the @see cl CompletionElement stored in a row,
+        the prefixes are created as well.
+        """
+        el = CompletionElement(self._value(row), float(self.weights[row]),
+                               None if self._disp is None else self._disp.get(row, None))
+        if self.metrics is not None:
+            m = self.metrics
+            el.mks0 = int(m['mks0'][row])
+            el.mks0_ = int(m['mks0_'][row])
+            el.mks1 = int(m['mks1'][row])
+            el.mks1_ = int(m['mks1_'][row])
+            el.mks2 = float(m['mks2'][row])
+            el.mks2_ = int(m['mks2_'][row])
+            prefix = int(m['prefix'][row])
+            el.prefix = CompletionElement.empty_prefix() if prefix < 0 else self._element(prefix)
+        if self.details is not None:
+            el._info = self.details[row]
+        return el
+
+    def values(self) -> List[str]:
+        """
+        Returns the list of values in the current order.
+        """
+        buffer = self.buffer
+        offsets = self.offsets.tolist()
+        return [buffer[offsets[r]:offsets[r + 1]] for r in self.order.tolist()]
+
+    def __getitem__(self, i):
+        """
+        Returns a copy of ``elements[i]``.
+        """
+        return self._element(self.order[i])
+
+    def find(self, value: str, is_sorted=False) -> CompletionElement:
+        """
+        Same as @see me CompletionSystem.find, the index
+        stores rows and not elements.
+        """
+        order = self.order
+        if is_sorted:
+            lo, hi = 0, len(order)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self._value(order[mid]) < value:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < len(order) and self._value(order[lo]) == value:
+                return self._element(order[lo])
+            return None
+        if self._index is None:
+            index = {}
+            dups = False
+            for v, row in zip(self.values(), order.tolist()):
+                if v in index:
+                    dups = True
+                else:
+                    index[v] = row
+            self._index = index
+            self._index_dups = dups
+        row = self._index.get(value, None)
+        return None if row is None else self._element(row)
+
+    def items(self) -> Iterator[Tuple[str, CompletionElement]]:
+        """
+        Iterates on ``(e.value, e)``.
+        """
+        for e in self:
+            yield e.value, e
+
+    def tuples(self) -> Iterator[Tuple[float, str]]:
+        """
+        Iterates on ``(e.weight, e.value)``, no element is created.
+        """
+        return zip(self.weights[self.order].tolist(), self.values())
+
+    def __len__(self) -> int:
+        """
+        Number of elements.
+        """
+        return self.order.shape[0]
+
+    def __iter__(self) -> Iterator[CompletionElement]:
+        """
+        Iterates over copies of the elements.
+        """
+        for row in self.order.tolist():
+            yield self._element(row)
+
+    def sort_values(self):
+        """
+        Sorts the elements by value then weight.
+        """
+        self.order = numpy.lexsort((self.weights, self._rank))
+        if self._index_dups:
+            self._index = None
+
+    def sort_weight(self):
+        """
+        Sorts the elements by weight then value.
+        """
+        self.order = numpy.lexsort((self._rank, self.weights))
+        if self._index_dups:
+            self._index = None
+
+    def compare_with_trie(self, delta=0.8, fLOG=noLOG):
+        """
+        Compares the results with the other implementation,
+        see @see me CompletionSystem.compare_with_trie,
+        the differences do not include the displayed completions.
+
+        @param      delta       parameter *delta* in the dynamic modified mks
+        @param      fLOG        logging function
+        @return                 None or differences
+        """
+        trie = CompletionTrieNode.build(self.tuples())
+        self.compute_metrics(delta=delta, fLOG=fLOG)
+        trie.precompute_stat()
+        trie.update_stat_dynamic(delta=delta)
+        diffs = []
+        for el in self:
+            f = trie.find(el.value)
+            d0 = el.mks0 - f.stat.mks0
+            d1 = el.mks1 - f.stat.mks1
+            d2 = el.mks2 - f.stat.mks2
+            d4 = el.mks0_ - f.stat.mks0_
+            if d0 != 0 or d1 != 0 or d2 != 0 or d4 != 0:
+                s = "VALUE={0}\nSYST=[{1}]\nTRIE=[{2}]".format(
+                    el.value, el.str_mks(), f.stat.str_mks())
+                diffs.append((d0, d1, d2, d4, el, f, s))
+        if diffs:
+            diffs.sort(key=str)
+            return diffs
+        else:
+            return None
+
+    def compute_metrics(self, ffilter=None, delta=0.8,
+                        details=False, fLOG=noLOG, profile=None,
+                        engine='numpy') -> int:
+        """
+        Computes the metrics, see @see me CompletionSystem.compute_metrics,
+        only engine ``'numpy'`` is available.
+        The metrics are stored in member *metrics*.
+        The function ends by sorting the set of completion by alphabetical order.
+        With *details* True, the metrics are computed by
+        @see me CompletionSystem.compute_metrics with engine ``'python'``,
+        see @see me _compute_metrics_details.
+        """
+        if ffilter is not None:
+            raise NotImplementedError(  # pragma: no cover
+                "ffilter not None is not implemented")
+        if engine != 'numpy':
+            raise NotImplementedError(
+                "Only engine='numpy' is implemented not '{0}'.".format(engine))
+        self.details = None
+        if details:
+            return self._compute_metrics_details(delta=delta, fLOG=fLOG, profile=profile)
+        self.sort_weight()
+        order = self.order
+        metrics, info = CompletionSystem._metrics_numpy(
+            self.values(), delta=delta, fLOG=fLOG)
+        # the metrics are computed in the order of the weights
+        n = len(self)
+        columns = {}
+        for name in ['mks0', 'mks0_', 'mks1', 'mks1_', 'mks2_']:
+            col = numpy.empty(n, dtype=numpy.int32)
+            col[order] = metrics[name]
+            columns[name] = col
+        col = numpy.empty(n, dtype=numpy.float64)
+        col[order] = metrics['mks2']
+        columns['mks2'] = col
+        prefix = numpy.array(metrics['prefix'], dtype=numpy.int64)
+        col = numpy.empty(n, dtype=numpy.int64)
+        col[order] = numpy.where(prefix < 0, -1, order[prefix])
+        columns['prefix'] = col
+        self.metrics = columns
+        self.sort_values()
+        if profile is not None:
+            info['time'] = time.perf_counter() - info.pop('begin')
+            _profile_report(profile, 'compute_metrics', info)
+        return info['iterations']
+
+    def _compute_metrics_details(self, delta=0.8, fLOG=noLOG, profile=None) -> int:
+        """
+        Computes the metrics with ``details=True``, see @see me compute_metrics.
+        The elements are copied into a @see cl CompletionSystem
+        which computes the metrics and logs the details,
+        the metrics are then stored in member *metrics*,
+        member *details* keeps the details of every row.
+        The details refer to the copies and not to the elements
+        returned by this class.
+        """
+        n = len(self)
+        elements = [CompletionElement(self._value(row), float(self.weights[row]),
+                                      None if self._disp is None else self._disp.get(row, None))
+                    for row in range(n)]
+        system = CompletionSystem(elements)
+        it = system.compute_metrics(delta=delta, details=True, fLOG=fLOG,
+                                    profile=profile, engine='python')
+        rows = {id(el): row for row, el in enumerate(elements)}
+        columns = {}
+        for name, dtype in [('mks0', numpy.int32), ('mks0_', numpy.int32),
+                            ('mks1', numpy.int32), ('mks1_', numpy.int32),
+                            ('mks2', numpy.float64), ('mks2_', numpy.int32)]:
+            columns[name] = numpy.array([getattr(el, name) for el in elements], dtype=dtype)
+        columns['prefix'] = numpy.array([rows.get(id(el.prefix), -1) for el in elements],
+                                        dtype=numpy.int64)
+        self.metrics = columns
+        self.details = [el._info for el in elements]
+        self.sort_values()
+        return it
@@ -0,0 +1,686 @@
+"""
+@file
+@brief About completion, a trie stored in arrays
+"""
+import sys
+import json
+import heapq
+import struct
+from array import array
+from itertools import islice
+from typing import Tuple, List, Dict
+import numpy
+from .completion import CompletionTrieNode
+
+_MAGIC = b"MLSTATPY.TRIE"
+_VERSION = 1
+_HEADER_STRUCT = struct.Struct("<13sHI")
+
+
+def _align(offset, alignment=64):
+    "Returns the first multiple of *alignment* greater or equal to *offset*."
+    return (offset + alignment - 1) // alignment * alignment
+
+
+class CompactCompletionTrie:
+    """
+    Trie used to do completion, it implements the same algorithms
+    as @see cl CompletionTrieNode but every node is an integer
+    and the trie is stored in parallel :epkg:`numpy` arrays
+    instead of one python object and one dictionary per node.
+    The root is node 0, nodes are numbered in breadth-first order
+    so that the children of node *i* are the nodes
+    ``child_offsets[i]`` to ``child_offsets[i + 1] - 1``,
+    they keep the order they were inserted in.
+
+    It contains the following arrays:
+
+    * *child_offsets*: first child of every node, length is ``n + 1``
+    * *chars*: code of the last character of the prefix a node represents
+    * *weights*: weight of every node (same as @see cl CompletionTrieNode)
+    * *leaves*: is the node a completion
+    * *parents*: parent index, -1 for the root
+    * *depths*: length of the prefix a node represents
+
+    Method @see me precompute_stat adds the lists of completions
+    (*comp_start*, *comp_count*, *comp_nodes*) and *mks0*, *mks0_*,
+    method @see me update_stat_dynamic adds *mks1*, *mks1_*, *mks1i_*,
+    *mks2*, *mks2_*, *mks2i_*.
+    """
+
+    _structure = ('child_offsets', 'chars', 'weights',
+                  'leaves', 'parents', 'depths')
+    _precomputed = ('comp_start', 'comp_count', 'comp_nodes',
+                    'mks0', 'mks0_')
+    _dynamic = ('mks1', 'mks1_', 'mks1i_', 'mks2', 'mks2_', 'mks2i_')
+
+    def __init__(self, child_offsets, chars, weights, leaves, parents,
+                 depths, disp=None, **stat):
+        """
+        @param      child_offsets   first child of every node
+        @param      chars           last character (code) of every node
+        @param      weights         weights
+        @param      leaves          is the node a completion
+        @param      parents         parent index
+        @param      depths          length of the prefix
+        @param      disp            display strings ``{node: string}``
+        @param      stat            precomputed arrays, see the class documentation
+        """
+        self.child_offsets = child_offsets
+        self.chars = chars
+        self.weights = weights
+        self.leaves = leaves
+        self.parents = parents
+        self.depths = depths
+        self.disp = disp or {}
+        for k in CompactCompletionTrie._precomputed + CompactCompletionTrie._dynamic:
+            setattr(self, k, stat.get(k, None))
+        unexpected = set(stat) - set(
+            CompactCompletionTrie._precomputed + CompactCompletionTrie._dynamic)
+        if unexpected:
+            raise KeyError("Unexpected arrays {0}.".format(
+                list(sorted(unexpected))))
+
+    def __len__(self) -> int:
+        """
+        Returns the number of nodes.
+        """
+        return self.chars.shape[0]
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "CompactCompletionTrie(nodes={0}, words={1})".format(
+            len(self), int(self.leaves.sum()))
+
+    @staticmethod
+    def build(words) -> 'CompactCompletionTrie':
+        """
+        Builds a trie, the method follows the same logic as
+        @see me CompletionTrieNode.build.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @return             @see cl CompactCompletionTrie
+        """
+        # a node is identified by its creation order during the build,
+        # children are found with key ``(parent << 21) | code`` (code < 2**21)
+        children = {}
+        parents = array('q', [-1])
+        chars = array('q', [0])
+        weights = array('d', [1.0])
+        leaves = array('b', [0])
+        depths = array('q', [0])
+        disp = {}
+        nb = 0
+        minw = None
+        for wword in words:
+            w, word, dsp = CompletionTrieNode._split_word(wword)
+            if w is None:
+                w = nb
+            if minw is None or minw > w:
+                minw = w
+            node = 0
+            new_node = None
+            for i, c in enumerate(word):
+                if not leaves[node]:
+                    weights[node] = min(weights[node], w)
+                code = ord(c)
+                child = children.get((node << 21) | code, None)
+                if child is not None:
+                    node = child
+                else:
+                    new_node = len(parents)
+                    children[(node << 21) | code] = new_node
+                    parents.append(node)
+                    chars.append(code)
+                    weights.append(w)
+                    leaves.append(0)
+                    depths.append(i + 1)
+                    node = new_node
+            if new_node is None:
+                if leaves[node]:
+                    raise ValueError(
+                        "Value '{0}' appears twice in the input list (not allowed).".format(word))
+                new_node = node
+            leaves[new_node] = 1
+            weights[new_node] = w
+            if dsp is not None:
+                disp[new_node] = dsp
+            nb += 1
+        if minw is not None:
+            weights[0] = minw
+        del children
+        return CompactCompletionTrie._from_creation_order(
+            parents, chars, weights, leaves, depths, disp)
+
+    @staticmethod
+    def _from_creation_order(parents, chars, weights, leaves, depths, disp):
+        """
+        Renumbers the nodes in breadth-first order, children of the same
+        node keep their creation order. Parents must be created before
+        their children.
+        """
+        parents = numpy.frombuffer(parents, dtype=numpy.int64)
+        depths = numpy.frombuffer(depths, dtype=numpy.int64)
+        n = parents.shape[0]
+        itype = numpy.int32 if n < 2 ** 31 - 1 else numpy.int64
+
+        new_id = numpy.zeros(n, dtype=numpy.int64)
+        by_depth = numpy.argsort(depths, kind='stable')
+        bounds = numpy.searchsorted(
+            depths[by_depth], numpy.arange(depths.max() + 2))
+        pos = 1
+        for d in range(1, bounds.shape[0] - 1):
+            ids = by_depth[bounds[d]:bounds[d + 1]]
+            ids = ids[numpy.argsort(new_id[parents[ids]], kind='stable')]
+            new_id[ids] = numpy.arange(pos, pos + ids.shape[0])
+            pos += ids.shape[0]
+        old_id = numpy.empty(n, dtype=numpy.int64)
+        old_id[new_id] = numpy.arange(n)
+
+        new_parents = numpy.full(n, -1, dtype=itype)
+        new_parents[1:] = new_id[parents[old_id[1:]]]
+        counts = numpy.bincount(new_parents[1:], minlength=n)
+        child_offsets = numpy.empty(n + 1, dtype=itype)
+        child_offsets[0] = 1
+        child_offsets[1:] = numpy.cumsum(counts) + 1
+
+        return CompactCompletionTrie(
+            child_offsets=child_offsets,
+            chars=numpy.frombuffer(chars, dtype=numpy.int64)[
+                old_id].astype(numpy.uint32),
+            weights=numpy.frombuffer(weights, dtype=numpy.float64)[old_id],
+            leaves=numpy.frombuffer(leaves, dtype=numpy.int8)[
+                old_id].astype(numpy.bool_),
+            parents=new_parents, depths=depths[old_id].astype(numpy.int32),
+            disp={int(new_id[k]): v for k, v in disp.items()})
+
+    @staticmethod
+    def from_trie(trie: CompletionTrieNode) -> 'CompactCompletionTrie':
+        """
+        Converts a @see cl CompletionTrieNode into a @see cl CompactCompletionTrie,
+        the statistics are converted as well if @see me CompletionTrieNode.precompute_stat
+        and @see me CompletionTrieNode.update_stat_dynamic were called.
+
+        @param      trie        root of a trie
+        @return                 @see cl CompactCompletionTrie
+        """
+        nodes = [trie]
+        index = {id(trie): 0}
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            if node.children:
+                for v in node.children.values():
+                    index[id(v)] = len(nodes)
+                    nodes.append(v)
+            i += 1
+
+        n = len(nodes)
+        itype = numpy.int32 if n < 2 ** 31 - 1 else numpy.int64
+        counts = numpy.array([len(node.children) if node.children else 0
+                              for node in nodes], dtype=numpy.int64)
+        child_offsets = numpy.empty(n + 1, dtype=itype)
+        child_offsets[0] = 1
+        child_offsets[1:] = numpy.cumsum(counts) + 1
+        parents = numpy.array([-1] + [index[id(node.parent)] for node in nodes[1:]],
+                              dtype=itype)
+        depths = [len(node.value) for node in nodes]
+        disp = {i: node.disp for i, node in enumerate(nodes)
+                if node.disp is not None}
+
+        stat = {}
+        if trie.stat is not None:
+            comp_count = [len(node.stat.completions) for node in nodes]
+            stat['comp_count'] = numpy.array(comp_count, dtype=numpy.int32)
+            stat['comp_start'] = numpy.zeros(n, dtype=numpy.int64)
+            stat['comp_start'][1:] = numpy.cumsum(comp_count)[:-1]
+            stat['comp_nodes'] = numpy.array(
+                [index[id(s)] for node in nodes for _, s in node.stat.completions],
+                dtype=itype)
+            stat['mks0'] = numpy.array(
+                [d if node.stat.mks0 is None else node.stat.mks0
+                 for node, d in zip(nodes, depths)],
+                dtype=numpy.int32)
+            stat['mks0_'] = numpy.array(
+                [0 if node.stat.mks0_ is None else node.stat.mks0_ for node in nodes],
+                dtype=numpy.int32)
+            if trie.stat.mks1 is not None:
+                for k in CompactCompletionTrie._dynamic:
+                    stat[k] = numpy.array(
+                        [getattr(node.stat, k) for node in nodes],
+                        dtype=numpy.float64 if k == 'mks2' else numpy.int32)
+
+        return CompactCompletionTrie(
+            child_offsets=child_offsets,
+            chars=numpy.array([ord(node.value[-1]) if node.value else 0 for node in nodes],
+                              dtype=numpy.uint32),
+            weights=numpy.array([node.weight if node.weight is not None else numpy.nan
+                                 for node in nodes], dtype=numpy.float64),
+            leaves=numpy.array([node.leave for node in nodes], dtype=numpy.bool_),
+            parents=parents, depths=numpy.array(depths, dtype=numpy.int32),
+            disp=disp, **stat)
+
+    def save(self, path: str):
+        """
+        Saves the trie and its statistics into a single file.
+        The file starts with a fixed header (a magic string,
+        a version number and the length of a :epkg:`json` description),
+        then the description of every array (name, dtype, shape, offset)
+        and finally the arrays themselves, each aligned on 64 bytes.
+        @see me load can then map the arrays without copying them.
+
+        @param      path        filename
+        """
+        arrays = {}
+        for k in (CompactCompletionTrie._structure +
+                  CompactCompletionTrie._precomputed +
+                  CompactCompletionTrie._dynamic):
+            v = getattr(self, k)
+            if v is not None:
+                arrays[k] = numpy.ascontiguousarray(v)
+        if self.disp:
+            keys = list(sorted(self.disp))
+            data = [self.disp[k].encode('utf-8') for k in keys]
+            offsets = numpy.zeros(len(data) + 1, dtype=numpy.int64)
+            offsets[1:] = numpy.cumsum([len(d) for d in data])
+            arrays['disp_nodes'] = numpy.array(keys, dtype=numpy.int64)
+            arrays['disp_offsets'] = offsets
+            arrays['disp_data'] = numpy.frombuffer(
+                b"".join(data), dtype=numpy.uint8)
+
+        # the header size depends on the offsets, the offsets depend
+        # on the header size, the header is padded to a fixed size
+        descr = []
+        for k, v in arrays.items():
+            descr.append(dict(name=k, dtype=v.dtype.str,
+                              shape=list(v.shape), offset=0))
+        size = len(json.dumps(descr)) + 32 * len(descr) + 64
+        header_size = _HEADER_STRUCT.size + size
+        offset = _align(header_size)
+        for d, v in zip(descr, arrays.values()):
+            d['offset'] = offset
+            offset = _align(offset + v.nbytes)
+        header = json.dumps(descr).encode('utf-8')
+        if len(header) > size:
+            raise RuntimeError(  # pragma: no cover
+                "Header is too long {0} > {1}.".format(len(header), size))
+        header = header + b" " * (size - len(header))
+
+        with open(path, "wb") as f:
+            f.write(_HEADER_STRUCT.pack(_MAGIC, _VERSION, size))
+            f.write(header)
+            for d, v in zip(descr, arrays.values()):
+                f.write(b"\0" * (d['offset'] - f.tell()))
+                f.write(v.tobytes())
+
+    @staticmethod
+    def load(path: str, mmap=True) -> 'CompactCompletionTrie':
+        """
+        Loads a trie saved with @see me save.
+
+        @param      path        filename
+        @param      mmap        if True, arrays are mapped with :epkg:`numpy:memmap`,
+                                nothing is copied, the data is loaded by the
+                                system when it is accessed and processes
+                                loading the same file share the same pages
+        @return                 @see cl CompactCompletionTrie
+        """
+        with open(path, "rb") as f:
+            head = f.read(_HEADER_STRUCT.size)
+            if len(head) != _HEADER_STRUCT.size:
+                raise ValueError("File '{0}' is too short.".format(path))
+            magic, version, size = _HEADER_STRUCT.unpack(head)
+            if magic != _MAGIC:
+                raise ValueError(
+                    "File '{0}' is not a saved trie.".format(path))
+            if version > _VERSION:
+                raise ValueError("Unable to read version {0} (> {1}) in '{2}'.".format(
+                    version, _VERSION, path))
+            descr = json.loads(f.read(size).decode('utf-8'))
+
+        arrays = {}
+        for d in descr:
+            dtype = numpy.dtype(d['dtype'])
+            shape = tuple(d['shape'])
+            count = int(numpy.prod(shape))
+            if mmap and count > 0:
+                arrays[d['name']] = numpy.memmap(
+                    path, dtype=dtype, mode='r', offset=d['offset'], shape=shape)
+            else:
+                arrays[d['name']] = numpy.fromfile(
+                    path, dtype=dtype, count=count, offset=d['offset']).reshape(shape)
+
+        disp = {}
+        if 'disp_nodes' in arrays:
+            offsets = arrays.pop('disp_offsets')
+            data = arrays.pop('disp_data').tobytes()
+            for i, k in enumerate(arrays.pop('disp_nodes')):
+                disp[int(k)] = data[offsets[i]:offsets[i + 1]].decode('utf-8')
+        return CompactCompletionTrie(disp=disp, **arrays)
+
+    def children(self, node: int) -> range:
+        """
+        Returns the children of a node.
+
+        @param      node        node index
+        @return                 range
+        """
+        return range(int(self.child_offsets[node]), int(self.child_offsets[node + 1]))
+
+    def value(self, node: int) -> str:
+        """
+        Returns the prefix a node represents.
+
+        @param      node        node index
+        @return                 string
+        """
+        res = []
+        while node > 0:
+            res.append(chr(self.chars[node]))
+            node = self.parents[node]
+        return "".join(reversed(res))
+
+    def find(self, prefix: str) -> int:
+        """
+        Returns the node which holds all completions starting with a given prefix.
+
+        @param      prefix      prefix
+        @return                 node index or None for no result
+        """
+        node = 0
+        for c in prefix:
+            lo = self.child_offsets[node]
+            hi = self.child_offsets[node + 1]
+            if lo == hi:
+                return None
+            found = numpy.flatnonzero(self.chars[lo:hi] == ord(c))
+            if found.shape[0] == 0:
+                return None
+            node = int(lo + found[0])
+        return node
+
+    def completions(self, node: int) -> List[Tuple[float, str]]:
+        """
+        Returns the precomputed completions for a node,
+        it is the equivalent of ``node.stat.completions``
+        for @see cl CompletionTrieNode.
+
+        @param      node        node index
+        @return                 list of ``(weight, value)``
+        """
+        if self.comp_nodes is None:
+            raise AttributeError("run precompute_stat")
+        start = self.comp_start[node]
+        sug = self.comp_nodes[start:start + self.comp_count[node]]
+        return [(float(self.weights[s]), self.value(s)) for s in sug]
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions for a prefix
+        (sorted by weight then value like @see me CompletionTrieNode.complete).
+        The arrays do not store the lists of
+        @see me CompletionTrieNode.precompute_topk, the method walks
+        the nodes below the prefix, the cost is :math:`O(n \\ln k)`
+        for *n* nodes.
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(weight, value)``
+        """
+        node = self.find(prefix)
+        if node is None:
+            return []
+        offsets = self.child_offsets
+        chars = self.chars
+        weights = self.weights
+        leaves = self.leaves
+
+        def iter_local():
+            stack = [(node, prefix)]
+            while stack:
+                i, value = stack.pop()
+                if leaves[i]:
+                    yield float(weights[i]), value
+                for c in range(int(offsets[i]), int(offsets[i + 1])):
+                    stack.append((c, value + chr(chars[c])))
+
+        return heapq.nsmallest(k, iter_local())
+
+    def precompute_stat(self):
+        """
+        Computes and stores list of completions for each node,
+        computes *mks*, see @see me CompletionTrieNode.precompute_stat.
+        Nodes are processed from the last one to the first one,
+        the breadth-first order guarantees every child
+        is processed before its parent.
+        """
+        n = len(self)
+        offsets = self.child_offsets.tolist()
+        weights = self.weights.tolist()
+        leaves = self.leaves.tolist()
+        depths = self.depths.tolist()
+        mks0 = list(depths)
+        mks0_ = [d if le else 0 for d, le in zip(depths, leaves)]
+
+        comp_start = [0] * n
+        comp_count = [0] * n
+        # longest completion in every list of completions
+        maxlen = [0] * n
+        buffer = array('q')
+        key = weights.__getitem__
+
+        for i in range(n - 1, -1, -1):
+            lo, hi = offsets[i], offsets[i + 1]
+            comp_start[i] = len(buffer)
+            if lo == hi:
+                continue
+            lists = []
+            maxl = 0
+            for c in range(lo, hi):
+                s = comp_start[c]
+                lists.append(buffer[s:s + comp_count[c]])
+                if maxlen[c] > maxl:
+                    maxl = maxlen[c]
+            last = sorted((c for c in range(lo, hi) if leaves[c]), key=key)
+            for c in last:
+                if depths[c] > maxl:
+                    maxl = depths[c]
+            lists.append(last)
+
+            # maxl - len(prefix) represents the longest list which reduces
+            # the number of keystrokes, see CompletionTrieNode._Stat.merge_completions
+            res = list(islice(heapq.merge(*lists, key=key), maxl))
+            buffer.extend(res)
+            comp_count[i] = len(res)
+            lw = depths[i]
+            ml = 0
+            for r, sug in enumerate(res):
+                nl = lw + r + 1
+                if mks0[sug] > nl:
+                    mks0[sug] = nl
+                    mks0_[sug] = lw
+                if depths[sug] > ml:
+                    ml = depths[sug]
+            maxlen[i] = ml
+
+        itype = self.child_offsets.dtype
+        self.comp_start = numpy.array(comp_start, dtype=numpy.int64)
+        self.comp_count = numpy.array(comp_count, dtype=numpy.int32)
+        self.comp_nodes = numpy.frombuffer(buffer, dtype=numpy.int64).astype(itype)
+        self.mks0 = numpy.array(mks0, dtype=numpy.int32)
+        self.mks0_ = numpy.array(mks0_, dtype=numpy.int32)
+        for k in CompactCompletionTrie._dynamic:
+            setattr(self, k, None)
+
+    def update_stat_dynamic(self, delta=0.8):
+        """
+        Must be called after @see me precompute_stat
+        and computes dynamic mks, see @see me CompletionTrieNode.update_stat_dynamic.
+
+        @param      delta       parameter :math:`\\delta` in defintion
+                                :ref:`Modified Dynamic KeyStroke <def-mks3>`
+        @return                 number of iterations to converge, the last one
+                                does not update anything
+        """
+        if self.comp_nodes is None:
+            raise AttributeError("run precompute_stat")
+        n = len(self)
+        offsets = self.child_offsets.tolist()
+        depths = self.depths.tolist()
+        comp_start = self.comp_start.tolist()
+        comp_count = self.comp_count.tolist()
+        comp = self.comp_nodes.tolist()
+        mks1 = self.mks0.tolist()
+        mks1_ = self.mks0_.tolist()
+        mks1i_ = [0] * n
+        mks2 = list(mks1)
+        mks2_ = list(mks1_)
+        mks2i_ = [0] * n
+
+        # a node is visited again only if its metrics were improved
+        # after it was visited (see CompletionTrieNode.update_stat_dynamic)
+        visited = [0] * n
+        dirty = set()
+
+        def improved(node, itera):
+            updates[0] += 1
+            if visited[node] > itera or (pending is not None and node not in pending):
+                dirty.add(node)
+
+        itera = 0
+        pending = None
+        work = [0]
+        updates = [0]
+        while len(work) > 0:
+            updates[0] = 0
+            stack = work
+            while len(stack) > 0:
+                pop = stack.pop()
+                visited[pop] = itera + 1
+                lw = depths[pop]
+                it = itera + 1
+                m1 = mks1[pop]
+                m2 = mks2[pop]
+                start = comp_start[pop]
+                for i, sug in enumerate(comp[start:start + comp_count[pop]]):
+                    nl = m1 + i + 1
+                    if mks1[sug] > nl:
+                        mks1[sug] = nl
+                        mks1_[sug] = lw
+                        mks1i_[sug] = it
+                        improved(sug, itera)
+                    nl = m2 + i + 1 + delta
+                    if mks2[sug] > nl:
+                        mks2[sug] = nl
+                        mks2_[sug] = lw
+                        mks2i_[sug] = it
+                        improved(sug, itera)
+                lo, hi = offsets[pop], offsets[pop + 1]
+                for child in range(lo, hi):
+                    start = comp_start[child]
+                    for i, sug in enumerate(comp[start:start + comp_count[child]]):
+                        nl = m2 + i + 2
+                        if mks2[sug] > nl:
+                            mks2[sug] = nl
+                            mks2_[sug] = lw
+                            mks2i_[sug] = it
+                            improved(sug, itera)
+                for child in range(lo, hi):
+                    if mks1[child] > m1 + 1:
+                        mks1[child] = m1 + 1
+                        mks1_[child] = mks1_[pop]
+                        mks1i_[child] = it
+                        improved(child, itera)
+                    if mks2[child] > m2 + 1:
+                        mks2[child] = m2 + 1
+                        mks2_[child] = mks2_[pop]
+                        mks2i_[child] = it
+                        improved(child, itera)
+                if pending is None:
+                    stack.extend(range(lo, hi))
+            itera += 1
+            # deepest nodes first since the stack is popped from the end
+            work = sorted(dirty, key=lambda i: -depths[i])
+            pending = dirty
+            dirty = set()
+        if updates[0] > 0:
+            # the last iteration, nothing would be updated
+            itera += 1
+
+        self.mks1 = numpy.array(mks1, dtype=numpy.int32)
+        self.mks1_ = numpy.array(mks1_, dtype=numpy.int32)
+        self.mks1i_ = numpy.array(mks1i_, dtype=numpy.int32)
+        self.mks2 = numpy.array(mks2, dtype=numpy.float64)
+        self.mks2_ = numpy.array(mks2_, dtype=numpy.int32)
+        self.mks2i_ = numpy.array(mks2i_, dtype=numpy.int32)
+        return itera
+
+    def _find_stat(self, word: str) -> int:
+        """
+        Returns the node for *word* and checks the metrics were computed.
+        """
+        node = self.find(word)
+        if node is None:
+            raise NotImplementedError(
+                "this metric is not yet computed for a query outside the trie: '{0}'".format(word))
+        if self.mks1 is None:
+            raise AttributeError(
+                "run precompute_stat and update_stat_dynamic")
+        return node
+
+    def min_keystroke0(self, word: str) -> Tuple[int, int]:
+        """
+        Returns the minimum keystrokes for a word,
+        see @see me CompletionTrieNode.min_keystroke0.
+
+        @param      word        word
+        @return                 number, length of best prefix, iteration it stops moving
+        """
+        node = self._find_stat(word)
+        return int(self.mks0[node]), int(self.mks0_[node]), 0
+
+    def min_dynamic_keystroke(self, word: str) -> Tuple[int, int]:
+        """
+        Returns the dynamic minimum keystrokes for a word,
+        see @see me CompletionTrieNode.min_dynamic_keystroke.
+
+        @param      word        word
+        @return                 number, length of best prefix, iteration it stops moving
+        """
+        node = self._find_stat(word)
+        return int(self.mks1[node]), int(self.mks1_[node]), int(self.mks1i_[node])
+
+    def min_dynamic_keystroke2(self, word: str) -> Tuple[int, int]:
+        """
+        Returns the modified dynamic minimum keystrokes for a word,
+        see @see me CompletionTrieNode.min_dynamic_keystroke2.
+
+        @param      word        word
+        @return                 number, length of best prefix, iteration it stops moving
+        """
+        node = self._find_stat(word)
+        return float(self.mks2[node]), int(self.mks2_[node]), int(self.mks2i_[node])
+
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Returns the memory used by the trie, it sums up
+        the size of every array, the result can be compared to
+        @see me CompletionTrieNode.memory_usage.
+
+        @return     dictionary with keys *nodes*, *words*, *bytes*,
+                    *bytes_per_node*, *bytes_per_word*
+        """
+        size = sys.getsizeof(self.disp)
+        for k in (CompactCompletionTrie._structure +
+                  CompactCompletionTrie._precomputed +
+                  CompactCompletionTrie._dynamic):
+            v = getattr(self, k)
+            if v is not None:
+                size += v.nbytes
+        nodes = len(self)
+        words = int(self.leaves.sum())
+        return dict(nodes=nodes, words=words, bytes=size,
+                    bytes_per_node=size / max(nodes, 1),
+                    bytes_per_word=size / max(words, 1))
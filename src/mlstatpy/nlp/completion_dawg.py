@@ -0,0 +1,366 @@
+"""
+@file
+@brief About completion, a minimal acyclic automaton (DAWG)
+"""
+import sys
+from array import array
+from typing import Tuple, List, Dict, Optional
+import numpy
+from .completion import CompletionTrieNode
+
+
+class CompletionDAWG:
+    """
+    Stores a vocabulary in a minimal acyclic automaton
+    (*Directed Acyclic Word Graph*): prefixes are shared like in
+    a trie and suffixes are shared as well, two states are merged
+    if the same set of suffixes can be read from them.
+    The automaton is built incrementally from a sorted list of words
+    (Daciuk's algorithm), only the states of the last
+    word may still change, the others are registered once.
+
+    A word is no longer a node. Every word receives its
+    position in the sorted vocabulary, it is computed while
+    walking through the automaton with the number of words
+    which can be read from every state. The words starting with a prefix
+    are a contiguous range of positions, weights and ranks
+    (position of the word sorted by weight and value)
+    are stored in arrays indexed by these positions.
+
+    It contains the following arrays:
+
+    * *edge_start*: first edge of every state, length is ``states + 1``
+    * *edge_chars*: code of the character of every edge, sorted for every state
+    * *edge_targets*: state an edge leads to
+    * *edge_before*: number of words which come before the first word
+      reachable through an edge among the words reachable from its state
+    * *finals*: is a state final (the end of a word)
+    * *counts*: number of words which can be read from a state
+    * *weights*: weight of every word
+    * *ranks*: rank of every word sorted by weight, then value
+
+    ::
+
+        from mlstatpy.data.wikipedia import enumerate_titles
+        titles = sorted(set(enumerate_titles(filename)))
+        dawg = CompletionDAWG.build(titles)
+    """
+
+    _arrays = ('edge_start', 'edge_chars', 'edge_targets', 'edge_before',
+               'finals', 'counts', 'weights', 'ranks')
+
+    def __init__(self, edge_start, edge_chars, edge_targets, finals,
+                 counts, root, weights, disp=None):
+        """
+        @param      edge_start      first edge of every state
+        @param      edge_chars      character code of every edge
+        @param      edge_targets    target state of every edge
+        @param      finals          is a state final
+        @param      counts          number of words reachable from a state
+        @param      root            initial state
+        @param      weights         weight of every word (sorted by value)
+        @param      disp            display strings ``{position: string}``
+        """
+        self.edge_start = edge_start
+        self.edge_chars = edge_chars
+        self.edge_targets = edge_targets
+        self.finals = finals
+        self.counts = counts
+        self.root = root
+        self.disp = disp or {}
+        # number of words before an edge among the words of its state
+        before = counts[edge_targets]
+        before = numpy.cumsum(before) - before
+        first = edge_start[:-1]
+        has_edges = edge_start[1:] > first
+        before -= numpy.repeat(before[first[has_edges]],
+                               (edge_start[1:] - first)[has_edges])
+        before += numpy.repeat(finals[has_edges].astype(numpy.int64),
+                               (edge_start[1:] - first)[has_edges])
+        self.edge_before = before
+        self.set_weights(weights)
+
+    def __len__(self) -> int:
+        """
+        Returns the number of states.
+        """
+        return self.finals.shape[0]
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "CompletionDAWG(states={0}, edges={1}, words={2})".format(
+            len(self), self.edge_chars.shape[0], self.weights.shape[0])
+
+    @staticmethod
+    def build(words) -> 'CompletionDAWG':
+        """
+        Builds the automaton.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+                            sorted by word, a missing weight is replaced by the position
+                            of the word like in @see me CompletionTrieNode.build
+        @return             @see cl CompletionDAWG
+        """
+        register = {}
+        finals = array('b')
+        counts = array('q')
+        edges = []
+
+        def freeze(final, out):
+            key = (final, tuple(out))
+            sid = register.get(key, None)
+            if sid is None:
+                sid = len(finals)
+                register[key] = sid
+                finals.append(final)
+                counts.append(final + sum(counts[t] for _, t in key[1]))
+                edges.append(key[1])
+            return sid
+
+        # path[i] is the state reached with prev[:i],
+        # a state is a list [final, [(char, state id), ...]]
+        path = [[False, []]]
+        prev = None
+        weights = array('d')
+        disp = {}
+        for wword in words:
+            w, word, dsp = CompletionTrieNode._split_word(wword)
+            if w is None:
+                w = len(weights)
+            if prev is not None:
+                if word <= prev:
+                    raise ValueError(
+                        "Words must be sorted and unique, '{0}' comes after '{1}'.".format(
+                            word, prev))
+                common = 0
+                for a, b in zip(prev, word):
+                    if a != b:
+                        break
+                    common += 1
+                # the states after the common prefix cannot change anymore
+                while len(path) > common + 1:
+                    final, out = path.pop()
+                    path[-1][1].append((ord(prev[len(path) - 1]), freeze(final, out)))
+            else:
+                common = 0
+            for c in word[common:]:
+                path.append([False, []])
+            path[-1][0] = True
+            if dsp is not None:
+                disp[len(weights)] = dsp
+            weights.append(w)
+            prev = word
+
+        while len(path) > 1:
+            final, out = path.pop()
+            path[-1][1].append((ord(prev[len(path) - 1]), freeze(final, out)))
+        root = freeze(*path[0])
+        del register
+
+        edge_start = numpy.zeros(len(edges) + 1, dtype=numpy.int64)
+        edge_start[1:] = numpy.cumsum([len(e) for e in edges])
+        edge_chars = numpy.array([c for e in edges for c, _ in e], dtype=numpy.uint32)
+        edge_targets = numpy.array([t for e in edges for _, t in e], dtype=numpy.int32)
+        return CompletionDAWG(
+            edge_start=edge_start, edge_chars=edge_chars, edge_targets=edge_targets,
+            finals=numpy.array(finals, dtype=numpy.bool_),
+            counts=numpy.array(counts, dtype=numpy.int64),
+            root=root, weights=numpy.array(weights, dtype=numpy.float64),
+            disp=disp)
+
+    def set_weights(self, weights):
+        """
+        Replaces the weights and computes the ranks.
+
+        @param      weights     array, weight of every word sorted by value
+        """
+        weights = numpy.asarray(weights, dtype=numpy.float64)
+        if weights.shape != (int(self.counts[self.root]), ):
+            raise ValueError("Expecting {0} weights not {1}.".format(
+                self.counts[self.root], weights.shape))
+        self.weights = weights
+        # numpy.argsort is stable and words are sorted by value
+        order = numpy.argsort(weights, kind='stable')
+        self.ranks = numpy.empty(order.shape[0], dtype=numpy.int64)
+        self.ranks[order] = numpy.arange(order.shape[0])
+
+    def _walk(self, prefix: str) -> List[Tuple[int, int]]:
+        """
+        Walks through the automaton.
+
+        @param      prefix      prefix
+        @return                 list of ``(state, position)`` for every prefix
+                                of *prefix* found in the automaton,
+                                *position* is the position of the first word
+                                starting with this prefix
+        """
+        state = self.root
+        pos = 0
+        res = [(state, pos)]
+        for c in prefix:
+            s, e = self.edge_start[state], self.edge_start[state + 1]
+            code = ord(c)
+            i = s + int(numpy.searchsorted(self.edge_chars[s:e], code))
+            if i == e or self.edge_chars[i] != code:
+                break
+            pos += int(self.edge_before[i])
+            state = int(self.edge_targets[i])
+            res.append((state, pos))
+        return res
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Returns the positions of the words starting with a prefix.
+
+        @param      prefix      prefix
+        @return                 ``(first, last + 1)`` or None if there is none
+        """
+        path = self._walk(prefix)
+        if len(path) != len(prefix) + 1:
+            return None
+        state, pos = path[-1]
+        return pos, pos + int(self.counts[state])
+
+    def index(self, word: str) -> int:
+        """
+        Returns the position of a word or -1 if it is not found.
+        """
+        path = self._walk(word)
+        if len(path) != len(word) + 1 or not self.finals[path[-1][0]]:
+            return -1
+        return path[-1][1]
+
+    def word(self, position: int) -> str:
+        """
+        Returns the word at a given position.
+        """
+        if position < 0 or position >= self.weights.shape[0]:
+            raise IndexError("Position {0} is out of range.".format(position))
+        state = self.root
+        chars = []
+        while not (self.finals[state] and position == 0):
+            s, e = self.edge_start[state], self.edge_start[state + 1]
+            i = s + int(numpy.searchsorted(
+                self.edge_before[s:e], position, side='right')) - 1
+            position -= int(self.edge_before[i])
+            chars.append(chr(self.edge_chars[i]))
+            state = int(self.edge_targets[i])
+        return "".join(chars)
+
+    def __iter__(self):
+        """
+        Iterates on ``(weight, word)`` sorted by word.
+        """
+        for i in range(self.weights.shape[0]):
+            yield float(self.weights[i]), self.word(i)
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions of a prefix
+        sorted by weight then value (like @see me CompletionTrieNode.complete).
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(weight, value)``
+        """
+        rg = self.prefix_range(prefix)
+        if rg is None:
+            return []
+        lo, hi = rg
+        ranks = self.ranks[lo:hi]
+        if hi - lo > k:
+            sel = numpy.argpartition(ranks, k)[:k]
+            sel = sel[numpy.argsort(ranks[sel])]
+        else:
+            sel = numpy.argsort(ranks)
+        return [(float(self.weights[lo + i]), self.word(lo + i)) for i in sel]
+
+    def _min_keystroke(self, word: str, exclude: bool) -> Optional[Tuple[int, int]]:
+        """
+        Implements @see me min_keystroke and @see me min_keystroke0.
+
+        @param      word        word
+        @param      exclude     the completions of a prefix do not include
+                                the prefix itself if it is a word
+        @return                 number, length of best prefix,
+                                None for a word outside the vocabulary
+        """
+        path = self._walk(word)
+        if len(path) != len(word) + 1 or not self.finals[path[-1][0]]:
+            return None
+        rank = self.ranks[path[-1][1]]
+        metric = len(word)
+        best = len(word)
+        for k in range(len(word) - 1, -1, -1):
+            state, pos = path[k]
+            ind = int(numpy.count_nonzero(
+                self.ranks[pos:pos + self.counts[state]] < rank))
+            if exclude and self.finals[state] and self.ranks[pos] < rank:
+                # the prefix is the first word of its range
+                ind -= 1
+            m = k + ind + 1
+            if m < metric:
+                metric = m
+                best = k
+            if ind >= len(word):
+                # no need to go further, the position will increase
+                break
+        return metric, best
+
+    def min_keystroke(self, word: str) -> Tuple[int, int]:
+        """
+        Returns the minimum keystrokes for a word,
+        it returns the same value as @see me CompletionTrieNode.min_keystroke.
+        The position of a word among the completions of a prefix is
+        the number of words in its range with a lower rank.
+
+        @param      word        word
+        @return                 number, length of best prefix,
+                                ``len(word), -1`` for a word outside the vocabulary
+        """
+        res = self._min_keystroke(word, False)
+        return (len(word), -1) if res is None else res
+
+    def min_keystroke0(self, word: str) -> Tuple[int, int, int]:
+        """
+        Returns the minimum keystrokes for a word,
+        it returns the same value as @see me CompletionTrieNode.min_keystroke0
+        if the weights are distinct. Completions with the same weight
+        are ordered by value in the automaton, @see me CompletionTrieNode.precompute_stat
+        does not follow this order and the positions may differ.
+        It only differs from @see me min_keystroke by the completions
+        of a prefix, @see me CompletionTrieNode.precompute_stat
+        does not include the prefix itself if it is a word.
+        The prefix is the first word of the range, it is removed
+        from the count if its rank is lower.
+
+        @param      word        word
+        @return                 number, length of best prefix, 0 (iteration
+                                it stops moving, for compatibility)
+        """
+        res = self._min_keystroke(word, True)
+        if res is None:
+            raise NotImplementedError(
+                "this metric is not yet computed for a query outside the trie: '{0}'".format(word))
+        metric, best = res
+        return metric, best, 0
+
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Returns the memory used by the automaton, it sums up
+        the size of every array, the result can be compared to
+        @see me CompletionTrieNode.memory_usage.
+
+        @return     dictionary with keys *nodes* (states), *words*, *bytes*,
+                    *bytes_per_node*, *bytes_per_word*
+        """
+        size = sys.getsizeof(self.disp)
+        for k in CompletionDAWG._arrays:
+            size += getattr(self, k).nbytes
+        nodes = len(self)
+        words = self.weights.shape[0]
+        return dict(nodes=nodes, words=words, bytes=size,
+                    bytes_per_node=size / max(nodes, 1),
+                    bytes_per_word=size / max(words, 1))
@@ -0,0 +1,149 @@
+"""
+@file
+@brief About completion, personalised completions on top of a shared trie
+"""
+from typing import Tuple, List, Dict
+from .completion import CompletionTrieNode
+
+
+class CompletionOverlay:
+    """
+    Combines a small trie built from the queries of one user
+    with a large trie shared by every user (the global trie).
+    The global trie is never modified, it is only read,
+    the overlay only stores the user trie.
+    The weights of every source are multiplied by a scale,
+    a lower weight is a better completion, a user scale below
+    the global one promotes the user's history.
+    A query merges the precomputed completions of both tries
+    (see @see me CompletionTrieNode.precompute_topk), it reads
+    at most *k* completions from each of them and sorts
+    at most *2k* elements.
+
+    ::
+
+        trie = CompletionTrieNode.build(queries, topk=10)
+        overlay = CompletionOverlay.build(trie, [(0, 'machine learning'), (1, 'matrix')],
+                                          user_scale=0.1)
+        overlay.complete('ma', 10)
+    """
+
+    def __init__(self, base, user, base_scale=1., user_scale=1.):
+        """
+        @param      base        global trie (@see cl CompletionTrieNode),
+                                @see me CompletionTrieNode.precompute_topk must have been called
+        @param      user        user trie, same requirement
+        @param      base_scale  weights of the global trie are multiplied by this factor
+        @param      user_scale  weights of the user trie are multiplied by this factor
+        """
+        if base_scale <= 0 or user_scale <= 0:
+            raise ValueError("Scales must be positive not {0}, {1}.".format(
+                base_scale, user_scale))
+        self.base = base
+        self.user = user
+        self.base_scale = base_scale
+        self.user_scale = user_scale
+
+    @staticmethod
+    def build(base, queries, topk=None, base_scale=1., user_scale=1.) -> 'CompletionOverlay':
+        """
+        Builds the user trie and the overlay.
+
+        @param      base        global trie
+        @param      queries     queries of the user, any input @see me CompletionTrieNode.build accepts
+        @param      topk        number of completions stored in every node of the user trie,
+                                the same as the global trie if None
+        @param      base_scale  see @see me __init__
+        @param      user_scale  see @see me __init__
+        @return                 @see cl CompletionOverlay
+        """
+        if topk is None:
+            topk = base.meta.get('topk', 10) if base.meta else 10
+        user = CompletionTrieNode.build(queries, topk=topk)
+        return CompletionOverlay(base, user, base_scale=base_scale, user_scale=user_scale)
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "CompletionOverlay(base_scale={0}, user_scale={1})".format(
+            self.base_scale, self.user_scale)
+
+    @property
+    def meta(self) -> Dict:
+        """
+        Returns the version of both tries, @see cl CompletionCache
+        uses it to detect any change.
+        """
+        return dict(version=(None if self.base.meta is None else self.base.meta.get('version', None),
+                             None if self.user.meta is None else self.user.meta.get('version', None)))
+
+    def add(self, query: str, weight=1.0):
+        """
+        Adds a query to the user trie or changes its weight
+        if it is already there (see @see me CompletionTrieNode.insert).
+
+        @param      query       query
+        @param      weight      weight (before scaling)
+        """
+        path = self.user._path(query)
+        if path is not None and path[-1].leave:
+            self.user.reweight(query, weight)
+        else:
+            self.user.insert(query, weight)
+
+    def _merge(self, base, user, k) -> List[Tuple[float, str]]:
+        """
+        Merges two lists of completions sorted by weight then value,
+        the weights are scaled, a value found in both lists
+        is kept with its lowest weight.
+        """
+        if self.user_scale != 1.:
+            user = [(w * self.user_scale, v) for w, v in user]
+        if not base:
+            return user
+        if self.base_scale != 1.:
+            base = [(w * self.base_scale, v) for w, v in base]
+        if not user:
+            return base
+        # both lists hold at most k elements, sorting them
+        # is faster than heapq.merge
+        merged = base + user
+        merged.sort()
+        res = []
+        seen = set()
+        for w, v in merged:
+            if v in seen:
+                continue
+            seen.add(v)
+            res.append((w, v))
+            if len(res) >= k:
+                break
+        return res
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions of a prefix from both tries
+        sorted by scaled weight then value.
+        A value among the *k* best ones of the merged list is
+        necessarily among the *k* best ones of the trie it comes from.
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(scaled weight, value)``
+        """
+        return self._merge(self.base.complete(prefix, k),
+                           self.user.complete(prefix, k), k)
+
+    def complete_many(self, prefixes: List[str], k=10) -> List[List[Tuple[float, str]]]:
+        """
+        Calls @see me complete for many prefixes
+        (see @see me CompletionTrieNode.complete_many).
+
+        @param      prefixes    list of prefixes
+        @param      k           number of completions to return for every prefix
+        @return                 list of results in the same order as *prefixes*
+        """
+        base = self.base.complete_many(prefixes, k)
+        user = self.user.complete_many(prefixes, k)
+        return [self._merge(b, u, k) for b, u in zip(base, user)]
@@ -0,0 +1,779 @@
+"""
+@file
+@brief Path-compressed trie (radix tree) for completion
+"""
+import sys
+import time
+from operator import itemgetter
+from typing import Tuple, List
+import numpy
+from pyquickhelper.loghelper import noLOG
+from .completion import CompletionTrieNode, _profile_report
+
+
+class RadixCompletionTrieNode(CompletionTrieNode):
+    """
+    Path-compressed version of @see cl CompletionTrieNode.
+    A node is kept if it is the root, a completion or if it has
+    more than one child, every other prefix is implicit and lies
+    on an edge labelled with a substring. Member *value* still holds
+    the whole prefix, *children* are indexed by the first letter
+    of the edge.
+
+    Methods @see me find, @see me precompute_stat, @see me update_stat_dynamic
+    and the metrics return the same results as @see cl CompletionTrieNode.
+    Methods @see me insert, @see me remove and @see me reweight split or merge
+    the edge on the path of the word, @see me save expands the trie
+    (see @see me to_trie).
+    Statistics are only stored for the explicit nodes, method @see me find
+    returns a transient node for an implicit prefix whose statistics are
+    derived on the fly from the edge it belongs to.
+
+    The list of completions does not change much along an edge.
+    For an edge from *B* to *E* of length *m*, the implicit prefixes
+    :math:`X_1, ..., X_{m-1}` have the same list of completions (member *up*)
+    cut to a length which only depends on *j* (member *cuts*).
+    Member *up* is the list of the deepest implicit prefix :math:`X_{m-1}`,
+    member *cuts* is a short list of ``(j, n)``, by decreasing *j*,
+    the list of :math:`X_i` has *n* elements for every *i* lower than *j*
+    and greater than the next *j* in the list.
+    """
+
+    __slots__ = ("up", "cuts")
+
+    def __init__(self, value, leave, weight=1.0, disp=None):
+        """
+        @param      value       value (the whole prefix)
+        @param      leave       boolean (is it a completion)
+        @param      weight      ordering (the lower, the first)
+        @param      disp        original string, use this to identify the node
+        """
+        CompletionTrieNode.__init__(self, value, leave, weight=weight, disp=disp)
+        self.up = None
+        self.cuts = None
+
+    @staticmethod
+    def build(words, topk=None, is_sorted=False, profile=None) -> 'RadixCompletionTrieNode':
+        """
+        Builds a radix trie.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @param  topk        if not None, calls @see me precompute_topk with ``k=topk``
+        @param  is_sorted   the words are sorted by alphabetical order,
+                            the radix trie is built the same way in both cases
+        @param  profile     None, a dictionary or a function,
+                            see @see me CompletionTrieNode.build
+        @return             root of the trie (RadixCompletionTrieNode)
+
+        The weight of a node which is not a completion is the lowest
+        weight of the completions below.
+        """
+        begin = time.perf_counter()
+        root = RadixCompletionTrieNode('', False)
+        nb = 0
+        created = 1
+        minw = None
+        for wword in words:
+            w, word, disp = CompletionTrieNode._split_word(wword)
+            if w is None:
+                w = nb
+            if minw is None or minw > w:
+                minw = w
+            created += root._insert_word(word, w, disp)[1]
+            nb += 1
+        root.weight = minw
+        end = time.perf_counter()
+        if topk is not None:
+            root.precompute_topk(topk)
+        if profile is not None:
+            _profile_report(profile, 'build', dict(
+                time=end - begin, words=nb, nodes=created, is_sorted=is_sorted,
+                topk_time=time.perf_counter() - end if topk is not None else 0.))
+        return root
+
+    def _insert_word(self, word: str, w, disp) -> Tuple['RadixCompletionTrieNode', int]:
+        """
+        Adds a word below this node (the root), an edge is split
+        if the word ends inside it or leaves it, see @see me build.
+        The weights of the nodes which are not completions
+        on the way are lowered to *w* if needed.
+
+        @param      word        word
+        @param      w           weight
+        @param      disp        display string
+        @return                 node holding the word, number of created nodes
+        """
+        created = 0
+        node = self
+        while True:
+            lw = len(node.value)
+            if lw == len(word):
+                break
+            if not node.leave:
+                node.weight = w if node.weight is None else min(node.weight, w)
+            c = word[lw]
+            if node.children is None or c not in node.children:
+                child = RadixCompletionTrieNode(word, False, weight=w)
+                node._add(c, child)
+                created += 1
+                node = child
+                break
+            child = node.children[c]
+            # length of the common part
+            end = min(len(child.value), len(word))
+            i = lw + 1
+            while i < end and child.value[i] == word[i]:
+                i += 1
+            if i == len(child.value):
+                node = child
+                continue
+            # the edge is split, the new node replaces child
+            # and keeps its position among the children of node,
+            # child.weight is not the lowest one below if child is a completion
+            split = RadixCompletionTrieNode(
+                word[:i], False, weight=min(child._lowest_weight(), w))
+            node.children[c] = split
+            split.parent = node
+            split._add(child.value[i], child)
+            created += 1
+            node = split
+        if node.leave:
+            raise ValueError(
+                "Value '{0}' appears twice in the input list (not allowed).".format(word))
+        node.leave = True
+        node.weight = w
+        if disp is not None:
+            node.disp = disp
+        return node, created
+
+    @staticmethod
+    def from_trie(trie: CompletionTrieNode) -> 'RadixCompletionTrieNode':
+        """
+        Compresses a @see cl CompletionTrieNode into a radix trie,
+        a node is kept if it is the root, a completion or if it has
+        more than one child. The precomputed data is not converted.
+
+        @param      trie        root of a trie
+        @return                 root of the radix trie
+        """
+        root = RadixCompletionTrieNode('', trie.leave, weight=trie.weight, disp=trie.disp)
+        stack = [(trie, root)]
+        while len(stack) > 0:
+            node, rnode = stack.pop()
+            if not node.children:
+                continue
+            for c, child in node.children.items():
+                while not child.leave and len(child.children) == 1:
+                    child = next(iter(child.children.values()))
+                rchild = RadixCompletionTrieNode(
+                    child.value, child.leave, weight=child.weight, disp=child.disp)
+                rnode._add(c, rchild)
+                stack.append((child, rchild))
+        return root
+
+    def to_trie(self) -> CompletionTrieNode:
+        """
+        Expands the radix trie into a @see cl CompletionTrieNode
+        holding the same completions, the children keep the same order.
+        The statistics and the lists of @see me precompute_topk
+        are computed again if they were computed for the radix trie.
+
+        @return     root of the trie
+        """
+        words = []
+        stack = [self]
+        while len(stack) > 0:
+            node = stack.pop()
+            if node.leave:
+                words.append((node.weight, node.value, node.disp))
+            if node.children:
+                stack.extend(reversed(list(node.children.values())))
+        meta = self.meta or {}
+        trie = CompletionTrieNode.build(words, topk=meta.get('topk', None))
+        if self.stat is not None:
+            trie.precompute_stat()
+            if self.stat.mks1 is not None:
+                trie.update_stat_dynamic(delta=meta['delta'])
+        return trie
+
+    def find(self, prefix: str) -> 'RadixCompletionTrieNode':
+        """
+        Returns the node which holds all completions starting with a given prefix.
+        If the prefix is implicit, the function returns a transient node
+        (see @see me _implicit), it is not attached to the trie.
+
+        @param      prefix      prefix
+        @return                 node or None for no result
+        """
+        if len(prefix) == 0:
+            if not self.value:
+                return self
+            else:
+                raise ValueError(
+                    "find '{0}' but node is not empty '{1}'".format(prefix, self.value))
+        node = self
+        while True:
+            lw = len(node.value)
+            if lw == len(prefix):
+                return node
+            if node.children is None or prefix[lw] not in node.children:
+                return None
+            child = node.children[prefix[lw]]
+            end = min(len(child.value), len(prefix))
+            if child.value[lw:end] != prefix[lw:end]:
+                return None
+            if end < len(child.value):
+                return child._implicit(end - lw)
+            node = child
+
+    def _longest_prefix(self, query: str) -> 'RadixCompletionTrieNode':
+        """
+        Returns the deepest explicit node whose value is a prefix of *query*.
+
+        @param      query       query
+        @return                 node (*self* if no other node matches)
+        """
+        node = self
+        lq = len(query)
+        while True:
+            lw = len(node.value)
+            if lw >= lq or node.children is None:
+                return node
+            child = node.children.get(query[lw], None)
+            if child is None or not query.startswith(child.value):
+                return node
+            node = child
+
+    def _implicit(self, j: int) -> 'RadixCompletionTrieNode':
+        """
+        Returns a transient node for the implicit prefix
+        ``self.value[:len(self.parent.value) + j]``, its statistics
+        are the ones @see cl CompletionTrieNode would compute.
+        Its parent is the explicit node above, its only child
+        is *self*.
+
+        @param      j       position of the prefix on the edge above *self*
+        @return             RadixCompletionTrieNode
+        """
+        parent = self.parent
+        lp = len(parent.value)
+        lw = lp + j
+        if self.up is not None:
+            weight = self.up[0][0]
+        else:
+            weight = self._lowest_weight()
+        node = RadixCompletionTrieNode(self.value[:lw], False, weight=weight)
+        node.parent = parent
+        node.children = {self.value[lw]: self}
+        node.topk = self.topk
+        if parent.stat is None:
+            return node
+        st = CompletionTrieNode._Stat()
+        node.stat = st
+        st.completions = self.up[:self._cut(j)]
+        st.next_nodes = node.children
+        ps = parent.stat
+        if ps.mks1 is not None:
+            # the metrics are propagated from the parent
+            # if they are lower than the length of the prefix
+            st.mks_iter = ps.mks_iter
+            st.iter_ = ps.iter_
+            st.mks0, st.mks0_ = lw, 0
+            if ps.mks1 < lp:
+                st.mks1, st.mks1_, st.mks1i_ = ps.mks1 + j, ps.mks1_, 1
+            else:
+                st.mks1, st.mks1_, st.mks1i_ = lw, lw, 0
+            if ps.mks2 < lp:
+                st.mks2, st.mks2_, st.mks2i_ = ps.mks2 + j, ps.mks2_, 1
+            else:
+                st.mks2, st.mks2_, st.mks2i_ = lw, lw, 0
+        return node
+
+    def _cut(self, j: int) -> int:
+        """
+        Returns the number of completions of the implicit prefix
+        *j* on the edge above the node (see @see me _implicit).
+        """
+        n = None
+        for k, c in self.cuts:
+            if k < j:
+                break
+            n = c
+        return n
+
+    def _first_containing(self, rank: int) -> int:
+        """
+        Returns the smallest *j* such as the implicit prefix *j*
+        on the edge above the node has more than *rank* completions.
+        The lists get shorter when *j* decreases.
+        """
+        j = None
+        for i, (k, c) in enumerate(self.cuts):
+            if c <= rank:
+                break
+            j = 1 if i + 1 == len(self.cuts) else self.cuts[i + 1][0] + 1
+        return j
+
+    def _precompute_node_stat(self):
+        """
+        Computes the statistics of one node for @see me precompute_stat,
+        the children must be already done. The statistics of the
+        implicit prefixes on the edge above the node are computed too.
+        """
+        self.stat = CompletionTrieNode._Stat()
+        lw = len(self.value)
+        if not self.children:
+            self.stat.completions = []
+            self.stat.mks0 = lw
+            self.stat.mks0_ = lw
+        else:
+            if self.leave:
+                self.stat.mks0 = lw
+                self.stat.mks0_ = lw
+            lists = []
+            last = []
+            for child in self.children.values():
+                if child.up is None:
+                    if child.stat.completions:
+                        lists.append(child.stat.completions)
+                    if child.leave:
+                        last.append((child.weight, child))
+                else:
+                    lists.append(child.up[:child.cuts[-1][1]])
+            if last:
+                last.sort(key=lambda c: c[0])
+                lists.append(last)
+            self.stat.completions = CompletionTrieNode._Stat.merge_lists(lists)
+            self.stat.next_nodes = self.children
+            self.stat.update_minimum_keystroke(lw)
+
+        if self.parent is None:
+            return
+        lp = len(self.parent.value)
+        m = lw - lp
+        if m < 2:
+            return
+        # implicit prefixes, the deepest one merges the completions
+        # of the node and the node itself, the others cut the list
+        lists = [self.stat.completions] if self.stat.completions else []
+        if self.leave:
+            lists.append([(self.weight, self)])
+        self.up = up = CompletionTrieNode._Stat.merge_lists(lists)
+        cuts = [(m - 1, len(up))]
+        n = len(up)
+        for j in range(m - 2, 0, -1):
+            maxl = max(len(s.value) for _, s in up[:n])
+            if maxl >= n:
+                break
+            n = maxl
+            cuts.append((j, n))
+        self.cuts = cuts
+
+        # mks0, the shortest prefix holding a completion is the best one
+        for r, (_, sug) in enumerate(up):
+            j = self._first_containing(r)
+            nl = lp + j + r + 1
+            if sug.stat.mks0 > nl:
+                sug.stat.mks0 = nl
+                sug.stat.mks0_ = lp + j
+
+    def update_stat_dynamic(self, delta=0.8, fLOG=noLOG, profile=None):
+        """
+        Must be called after @see me precompute_stat
+        and computes dynamic mks (see :ref:`Dynamic Minimum Keystroke <def-mks2>`).
+        Nodes are visited once from the root, the metrics of a node
+        only depend on the metrics of its ancestors.
+
+        @param      delta       parameter :math:`\\delta` in defintion
+                                :ref:`Modified Dynamic KeyStroke <def-mks3>`
+        @param      fLOG        logging function
+        @param      profile     None, a dictionary or a function,
+                                see @see me CompletionTrieNode.update_stat_dynamic
+        @return                 number of iterations to converge, the same
+                                as @see me CompletionTrieNode.update_stat_dynamic
+
+        The only iteration does not change anything if no metric is
+        lower than the length of its prefix, otherwise a second iteration
+        would confirm nothing changes, it is counted but not run.
+        The updates include the implicit prefixes, ``meta['touched']``
+        only counts the explicit nodes.
+        """
+        begin = time.perf_counter()
+        for node in self.unsorted_iter():
+            node.stat.init_dynamic_minimum_keystroke(len(node.value))
+            node.stat.iter_ = 0
+        init_time = time.perf_counter() - begin
+        updates = [0]
+
+        def update1(sug, nl, lw):
+            st = sug.stat
+            if st.mks1 > nl:
+                st.mks1 = nl
+                st.mks1_ = lw
+                st.mks1i_ = 1
+                updates[0] += 1
+
+        def update2(sug, nl, lw):
+            st = sug.stat
+            if st.mks2 > nl:
+                st.mks2 = nl
+                st.mks2_ = lw
+                st.mks2i_ = 1
+                updates[0] += 1
+
+        visited = 0
+        stack = [self]
+        while len(stack) > 0:
+            pop = stack.pop()
+            visited += 1
+            ps = pop.stat
+            ps.mks_iter = 1
+            ps.iter_ = 1
+            lp = len(pop.value)
+            for r, (_, sug) in enumerate(ps.completions):
+                update1(sug, ps.mks1 + r + 1, lp)
+                update2(sug, ps.mks2 + r + 1 + delta, lp)
+            if not pop.children:
+                continue
+
+            for child in pop.children.values():
+                cs = child.stat
+                if child.up is None:
+                    for r, (_, sug) in enumerate(cs.completions):
+                        update2(sug, ps.mks2 + r + 2, lp)
+                    if cs.mks1 > ps.mks1 + 1:
+                        cs.mks1 = ps.mks1 + 1
+                        cs.mks1_ = ps.mks1_
+                        cs.mks1i_ = 1
+                        updates[0] += 1
+                    if cs.mks2 > ps.mks2 + 1:
+                        cs.mks2 = ps.mks2 + 1
+                        cs.mks2_ = ps.mks2_
+                        cs.mks2i_ = 1
+                        updates[0] += 1
+                    continue
+
+                # implicit prefixes X_1, ..., X_k, the metrics of X_j
+                # are ps.mks1 + j and ps.mks2 + j (see _implicit)
+                k = len(child.value) - lp - 1
+                # the implicit prefixes improved by the parent
+                if ps.mks1 < lp:
+                    updates[0] += k
+                if ps.mks2 < lp:
+                    updates[0] += k
+                inup = False
+                for r, (_, sug) in enumerate(child.up):
+                    if sug is child:
+                        inup = True
+                    j = child._first_containing(r)
+                    # the parent X_{j-1} sees the completion in the list of X_j
+                    update2(sug, ps.mks2 + (j - 1) + r + 2, lp + j - 1)
+                    update1(sug, ps.mks1 + j + r + 1, lp + j)
+                    update2(sug, ps.mks2 + j + r + 1 + delta, lp + j)
+                # completions of child removed from the list of X_k
+                start = len(child.up) - (1 if inup else 0)
+                for r, (_, sug) in enumerate(cs.completions[start:]):
+                    update2(sug, ps.mks2 + k + r + start + 2, lp + k)
+                # propagation from X_k to child
+                nl = ps.mks1 + k + 1
+                if cs.mks1 > nl:
+                    cs.mks1 = nl
+                    cs.mks1_ = ps.mks1_ if ps.mks1 < lp else lp + k
+                    cs.mks1i_ = 1
+                    updates[0] += 1
+                nl = ps.mks2 + k + 1
+                if cs.mks2 > nl:
+                    cs.mks2 = nl
+                    cs.mks2_ = ps.mks2_ if ps.mks2 < lp else lp + k
+                    cs.mks2i_ = 1
+                    updates[0] += 1
+            stack.extend(pop.children.values())
+        fLOG("iteration 0: touched={0} updates={1}".format(visited, updates[0]))
+        itera = 2 if updates[0] > 0 else 1
+
+        self._set_meta(delta=delta, touched=[visited])
+        if profile is not None:
+            _profile_report(profile, 'update_stat_dynamic', dict(
+                time=time.perf_counter() - begin, init_time=init_time,
+                iterations=itera, touched=[visited], updates=[updates[0]]))
+        return itera
+
+    def complete_many(self, prefixes: List[str], k=10) -> List[List[Tuple[float, str]]]:
+        """
+        Calls @see me complete for many prefixes.
+
+        @param      prefixes    list of prefixes
+        @param      k           number of completions to return for every prefix
+        @return                 list of results in the same order as *prefixes*
+        """
+        return [self.complete(prefix, k) for prefix in prefixes]
+
+    def min_keystroke(self, word: str) -> Tuple[int, int]:
+        """
+        Returns the minimum keystrokes for a word without optimisation,
+        see @see me CompletionTrieNode.min_keystroke.
+
+        @param      word        word
+        @return                 number, length of best prefix
+        """
+        if self.find(word) is None:
+            return len(word), -1
+        metric = len(word)
+        best = len(word)
+        for k in range(len(word) - 1, -1, -1):
+            res = list(n[1] for n in self.find(word[:k]).iter_leaves())
+            ind = res.index(word)
+            m = k + ind + 1
+            if m < metric:
+                metric = m
+                best = k
+            if ind >= len(word):
+                break
+        return metric, best
+
+    def all_completions(self) -> List[Tuple['CompletionTrieNone', List[str]]]:
+        """
+        Retrieves all completions for every explicit node
+        from the root to this one,
+        the method does not need @see me precompute_stat to be run first.
+        """
+        all_res = []
+        node = self
+        while node is not None:
+            all_res.append((node, list(n[1] for n in node.iter_leaves())))
+            node = node.parent
+        all_res.reverse()
+        return all_res
+
+    def memory_usage(self):
+        """
+        Returns an estimation of the memory used by the trie,
+        see @see me CompletionTrieNode.memory_usage.
+        """
+        res = CompletionTrieNode.memory_usage(self)
+        size = 0
+        for node in self.unsorted_iter():
+            if node.up is not None:
+                size += sys.getsizeof(node.up) + sys.getsizeof(node.cuts)
+                size += sum(sys.getsizeof(c) for c in node.up)
+                size += sum(sys.getsizeof(c) for c in node.cuts)
+        res['bytes'] += size
+        res['bytes_per_node'] = res['bytes'] / max(res['nodes'], 1)
+        res['bytes_per_word'] = res['bytes'] / max(res['words'], 1)
+        return res
+
+    @staticmethod
+    def build_parallel(words, workers=None, precompute=True, topk=None) -> 'RadixCompletionTrieNode':
+        """
+        Builds the trie with @see me CompletionTrieNode.build_parallel
+        and compresses it (see @see me from_trie), the statistics are
+        computed after the compression.
+
+        @param  words       list of ``(word)`` or ``(weight, word)`` or ``(weight, word, display string)``
+        @param  workers     number of processes, see @see me CompletionTrieNode.build_parallel
+        @param  precompute  calls @see me precompute_stat
+        @param  topk        if not None, calls @see me precompute_topk with ``k=topk``
+        @return             root of the trie (RadixCompletionTrieNode)
+        """
+        trie = CompletionTrieNode.build_parallel(words, workers=workers, precompute=False)
+        root = RadixCompletionTrieNode.from_trie(trie)
+        del trie
+        if precompute:
+            root.precompute_stat()
+        if topk is not None:
+            root.precompute_topk(topk)
+        return root
+
+    def _path(self, word: str) -> List['RadixCompletionTrieNode']:
+        """
+        Returns the explicit nodes from the root to the node holding *word*
+        or None if the word is not an explicit node of the trie.
+        """
+        path = [self]
+        while len(path[-1].value) < len(word):
+            node = path[-1]
+            child = None if node.children is None else node.children.get(
+                word[len(node.value)], None)
+            if child is None or not word.startswith(child.value):
+                return None
+            path.append(child)
+        return path if path[-1].value == word else None
+
+    def insert(self, word: str, weight=1.0, disp=None):
+        """
+        Inserts a word into a radix trie already built,
+        at most one edge is split (see @see me build), then
+        the precomputed data is repaired (see @see me _repair).
+
+        @param      word        word to insert
+        @param      weight      weight
+        @param      disp        display string
+        """
+        path = self._path(word)
+        if path is not None and path[-1].leave:
+            raise ValueError(
+                "Value '{0}' appears twice in the input list (not allowed).".format(word))
+        self._insert_word(word, weight, disp)
+        self._repair(self._path(word))
+
+    def remove(self, word: str):
+        """
+        Removes a word from a radix trie, a node which is not
+        a completion anymore and has less than two children
+        is removed and its edges are merged,
+        then the precomputed data is repaired (see @see me _repair).
+
+        @param      word        word to remove
+        """
+        path = self._path(word)
+        if path is None or not path[-1].leave:
+            raise KeyError("Unable to find '{0}'.".format(word))
+        node = path[-1]
+        node.leave = False
+        node.disp = None
+        if len(path) > 1 and not node.children:
+            path.pop()
+            parent = path[-1]
+            del parent.children[node.value[len(parent.value)]]
+            if not parent.children:
+                parent.children = None
+            node.parent = None
+            node = parent
+        if len(path) > 1 and not node.leave and node.children and len(node.children) == 1:
+            # the node is now implicit, its only child takes its place
+            path.pop()
+            parent = path[-1]
+            child = next(iter(node.children.values()))
+            parent.children[node.value[len(parent.value)]] = child
+            child.parent = parent
+            node.parent = None
+            node.children = None
+        self._repair(path)
+
+    def reweight(self, word: str, weight):
+        """
+        Changes the weight of a word and repairs
+        the precomputed data (see @see me _repair).
+
+        @param      word        word
+        @param      weight      new weight
+        """
+        path = self._path(word)
+        if path is None or not path[-1].leave:
+            raise KeyError("Unable to find '{0}'.".format(word))
+        path[-1].weight = weight
+        self._repair(path)
+
+    def _repair(self, path: List['RadixCompletionTrieNode']):
+        """
+        Repairs the precomputed data after a word was modified.
+        The weights and the lists of @see me precompute_topk
+        only change for the explicit nodes in *path*, they are updated
+        from the deepest node to the root. The lists of completions
+        of an edge (member *up*) and the metrics are computed again
+        for the whole trie (see @see me precompute_stat,
+        @see me update_stat_dynamic).
+
+        @param      path        explicit nodes from the root to the modified node
+        """
+        version = 0 if self.meta is None else self.meta.get('version', 0)
+        self._set_meta(version=version + 1)
+        topk = self.meta.get('topk', None)
+        # the statistics of the path are not valid anymore,
+        # the lowest weight of the subtree of the previous node is kept
+        low = None
+        prev = None
+        for node in reversed(path):
+            if topk is not None:
+                node._update_topk(topk)
+            below = None
+            if node.children:
+                for child in node.children.values():
+                    if child is prev:
+                        w = low
+                    else:
+                        w = child._lowest_weight() if child.leave else child.weight
+                    if w is not None and (below is None or w < below):
+                        below = w
+            if not node.leave:
+                node.weight = below
+            low = below
+            if node.leave and (low is None or node.weight < low):
+                low = node.weight
+            prev = node
+
+        if self.stat is None:
+            return
+        dynamic = self.stat.mks1 is not None
+        for node in self.unsorted_iter():
+            node.stat = None
+            node.up = None
+            node.cuts = None
+        self.precompute_stat()
+        if dynamic:
+            self.update_stat_dynamic(delta=self.meta['delta'])
+
+    def min_keystroke_many(self, words: List[str]):
+        """
+        Computes @see me min_keystroke for many words without
+        @see me precompute_stat, see @see me CompletionTrieNode.min_keystroke_many.
+        The completions of an implicit prefix are the completions
+        of the explicit node at the end of its edge.
+
+        @param      words       list of words
+        @return                 two arrays, minimum keystroke and length of best prefix,
+                                a word which is not a completion of the trie
+                                gets ``len(word), -1``
+        """
+        ranges, ranks = self._leaf_ranks()
+        mks = numpy.empty(len(words), dtype=numpy.int64)
+        best = numpy.empty(len(words), dtype=numpy.int64)
+        # sorted ranks of the nodes on the path of the previous word
+        cache = {}
+        for index, word in sorted(enumerate(words), key=itemgetter(1)):
+            if len(word) == 0:
+                mks[index] = 0
+                best[index] = 0
+                continue
+            path = self._path(word)
+            if path is None or not path[-1].leave:
+                mks[index] = len(word)
+                best[index] = -1
+                continue
+            cache = {id(n): cache[id(n)] for n in path if id(n) in cache}
+
+            rank = ranks[ranges[path[-1]][0]]
+            metric = len(word)
+            bestl = len(word)
+            # node holding the completions of the prefix of length k
+            p = len(path) - 1
+            for k in range(len(word) - 1, -1, -1):
+                while p > 0 and len(path[p - 1].value) >= k:
+                    p -= 1
+                node = path[p]
+                sorted_ranks = cache.get(id(node), None)
+                if sorted_ranks is None:
+                    lo, hi = ranges[node]
+                    sorted_ranks = numpy.sort(ranks[lo:hi])
+                    cache[id(node)] = sorted_ranks
+                ind = int(numpy.searchsorted(sorted_ranks, rank))
+                m = k + ind + 1
+                if m < metric:
+                    metric = m
+                    bestl = k
+                if ind >= len(word):
+                    # no need to go further, the position will increase
+                    break
+            mks[index] = metric
+            best[index] = bestl
+        return mks, best
+
+    def save(self, path: str):
+        """
+        Saves the trie into a flat file, see @see me CompletionTrieNode.save.
+        The radix trie is expanded first (see @see me to_trie),
+        the file is the same as the one saved by the expanded trie.
+
+        @param      path        filename
+        """
+        self.to_trie().save(path)
@@ -0,0 +1,461 @@
+"""
+@file
+@brief About completion, a small :epkg:`asyncio` HTTP server
+which groups concurrent requests, and a load generator to test it.
+It only depends on the standard library (and the completion engine).
+
+::
+
+    python -m mlstatpy.nlp.completion_server serve --data titles.txt --port 8765
+    python -m mlstatpy.nlp.completion_server serve --trie titles.trie --port 8765
+    python -m mlstatpy.nlp.completion_server load --data titles.txt --port 8765
+
+The server answers ``GET /complete?q=<prefix>&k=<k>`` with
+``{"prefix": ..., "completions": [[weight, value], ...]}``
+and ``GET /stats`` with the counters returned by @see me stats.
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from bisect import bisect_left
+from collections import deque
+from typing import List, Tuple, Dict
+from urllib.parse import urlsplit, parse_qs, quote
+
+
+#: upper bounds (seconds) of the latency histogram
+LATENCY_BUCKETS = (0.0001, 0.0002, 0.0005, 0.001, 0.002, 0.005, 0.01,
+                   0.02, 0.05, 0.1, 0.2, 0.5, 1., float('inf'))
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _percentile(buckets, counts, q):
+    """
+    Returns the upper bound of the bucket containing
+    the quantile *q* of a histogram.
+    """
+    total = sum(counts)
+    if total == 0:
+        return 0.
+    cum = 0
+    for b, c in zip(buckets, counts):
+        cum += c
+        if cum >= q * total:
+            return b
+    return buckets[-1]  # pragma: no cover
+
+
+class CompletionServer:
+    """
+    Serves completions from an engine loaded once
+    (@see cl CompletionTrieNode, @see cl CompletionCache...).
+    Requests arriving within *window* seconds are grouped
+    and sent to the engine in a single call to
+    ``complete_many`` (or ``complete`` for every prefix if
+    the engine does not have it), a batch is processed as soon
+    as it holds *max_batch* requests. The window adds its duration
+    to the latency when the server is not loaded, ``window=0``
+    only groups the requests already received when the event loop
+    gets back to the batch.
+
+    The server keeps the following counters (see @see me stats):
+    number of requests, number of batches, a histogram of
+    the latencies (time between the reception of a request
+    and its response, see *LATENCY_BUCKETS*) and
+    the number of requests received during the last seconds.
+    """
+
+    def __init__(self, engine, k=10, window=0., max_batch=256):
+        """
+        @param      engine      any object with a method ``complete(prefix, k)``
+        @param      k           default number of completions
+        @param      window      time (seconds) a request waits for others
+        @param      max_batch   maximum number of requests in a batch
+        """
+        self.engine = engine
+        self.k = k
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self._server = None
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.max_batch_seen = 0
+        self.latencies = [0] * len(LATENCY_BUCKETS)
+        # (second, number of requests)
+        self._seconds = deque(maxlen=61)
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Starts listening, *port* can be 0 to get any free port
+        (see @see me port).
+
+        @param      host        host
+        @param      port        port
+        @return                 :epkg:`asyncio` server
+        """
+        self.started = time.perf_counter()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        """
+        Returns the port the server listens to.
+        """
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """
+        Stops the server.
+        """
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def complete(self, prefix: str, k=None) -> List[Tuple[float, str]]:
+        """
+        Queues a prefix and waits for the batch it belongs to.
+
+        @param      prefix      prefix
+        @param      k           number of completions, None for the default value
+        @return                 list of ``(weight, value)``
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((prefix, self.k if k is None else k, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _flush(self):
+        """
+        Processes the pending requests, grouped by *k*.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.batched += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        byk = {}
+        for i, (_, k, _) in enumerate(batch):
+            if k not in byk:
+                byk[k] = [i]
+            else:
+                byk[k].append(i)
+        many = getattr(self.engine, 'complete_many', None)
+        for k, index in byk.items():
+            prefixes = [batch[i][0] for i in index]
+            try:
+                if many is None:
+                    res = [self.engine.complete(p, k) for p in prefixes]
+                else:
+                    res = many(prefixes, k)
+            except Exception as e:  # pylint: disable=W0703
+                for i in index:
+                    if not batch[i][2].done():
+                        batch[i][2].set_exception(e)
+                continue
+            for i, r in zip(index, res):
+                if not batch[i][2].done():
+                    batch[i][2].set_result(r)
+
+    def _count(self, begin):
+        """
+        Updates the counters after a request.
+        """
+        end = time.perf_counter()
+        self.requests += 1
+        self.latencies[bisect_left(LATENCY_BUCKETS, end - begin)] += 1
+        second = int(end)
+        if self._seconds and self._seconds[-1][0] == second:
+            self._seconds[-1][1] += 1
+        else:
+            self._seconds.append([second, 1])
+
+    def stats(self) -> Dict:
+        """
+        Returns the counters.
+
+        * *requests*, *errors*: number of answered completion requests and errors
+        * *batches*, *mean_batch*, *max_batch*: number and size of the batches
+        * *uptime*, *qps*: time since the server started, mean number of requests per second
+        * *qps_1s*, *qps_10s*, *qps_60s*: number of requests per second
+          during the last complete second, ten seconds, minute
+        * *latency*: ``{'buckets': upper bounds in seconds, 'counts': counts}``,
+          *p50*, *p90*, *p99*: upper bound of the bucket containing the percentile
+        """
+        now = time.perf_counter()
+        uptime = now - self.started
+        second = int(now)
+        qps = {}
+        for d in [1, 10, 60]:
+            n = sum(c for s, c in self._seconds if second - d <= s < second)
+            qps['qps_{0}s'.format(d)] = n / d
+        buckets = [b if b != float('inf') else None for b in LATENCY_BUCKETS]
+        res = dict(requests=self.requests, errors=self.errors,
+                   batches=self.batches,
+                   mean_batch=self.batched / self.batches if self.batches else 0.,
+                   max_batch=self.max_batch_seen, uptime=uptime,
+                   qps=self.requests / uptime if uptime > 0 else 0.,
+                   latency=dict(buckets=buckets, counts=list(self.latencies)))
+        for q in [50, 90, 99]:
+            p = _percentile(LATENCY_BUCKETS, self.latencies, q / 100.)
+            res['p{0}'.format(q)] = p if p != float('inf') else None
+        res.update(qps)
+        return res
+
+    async def _handle(self, reader, writer):
+        """
+        Handles a connection, it may contain several requests
+        (``Connection: keep-alive`` is the default for HTTP/1.1).
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                begin = time.perf_counter()
+                keep_alive = line.rstrip().endswith(b'HTTP/1.1')
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = header.decode('latin-1').partition(':')
+                    name = name.strip().lower()
+                    value = value.strip().lower()
+                    if name == 'connection':
+                        keep_alive = value == 'keep-alive'
+                    elif name == 'content-length':
+                        length = int(value)
+                if length:
+                    await reader.readexactly(length)
+                status, body, counted = await self._route(line)
+                data = json.dumps(body).encode('utf-8')
+                writer.write(
+                    "HTTP/1.1 {0} {1}\r\nContent-Type: application/json\r\n"
+                    "Content-Length: {2}\r\nConnection: {3}\r\n\r\n".format(
+                        status, _REASONS[status], len(data),
+                        'keep-alive' if keep_alive else 'close').encode('ascii') + data)
+                await writer.drain()
+                if counted:
+                    self._count(begin)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, line):
+        """
+        Returns the status, the body of the response and
+        whether the request is counted in the statistics.
+        """
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            return 400, dict(error="malformed request line"), False
+        method, target, _ = parts
+        if method != 'GET':
+            return 405, dict(error="only GET is supported"), False
+        url = urlsplit(target)
+        if url.path == '/stats':
+            return 200, self.stats(), False
+        if url.path != '/complete':
+            return 404, dict(error="unknown path '{0}'".format(url.path)), False
+        query = parse_qs(url.query, keep_blank_values=True)
+        prefix = query.get('q', [''])[0]
+        try:
+            k = int(query['k'][0]) if 'k' in query else None
+        except ValueError:
+            return 400, dict(error="k must be an integer"), False
+        try:
+            res = await self.complete(prefix, k)
+        except Exception as e:  # pylint: disable=W0703
+            self.errors += 1
+            return 500, dict(error=str(e)), True
+        return 200, dict(prefix=prefix, completions=[list(r) for r in res]), True
+
+
+async def load_generator(prefixes: List[str], host='127.0.0.1', port=8765,
+                         concurrency=16, requests=10000, k=10) -> Dict[str, float]:
+    """
+    Sends requests to a @see cl CompletionServer from *concurrency*
+    clients, every one of them sends one request after another on the
+    same connection.
+
+    @param      prefixes        prefixes to send, picked in that order, again and again
+    @param      host            host
+    @param      port            port
+    @param      concurrency     number of clients
+    @param      requests        total number of requests
+    @param      k               number of completions
+    @return                     dictionary, *requests*, *errors*, *duration*, *throughput*
+                                (requests per second), *p50*, *p99*, *max* (latencies in seconds)
+    """
+    latencies = []
+    errors = [0]
+    counter = [0]
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while counter[0] < requests:
+                prefix = prefixes[counter[0] % len(prefixes)]
+                counter[0] += 1
+                begin = time.perf_counter()
+                writer.write("GET /complete?q={0}&k={1} HTTP/1.1\r\nHost: {2}\r\n\r\n".format(
+                    quote(prefix), k, host).encode('ascii'))
+                await writer.drain()
+                status = await reader.readline()
+                length = 0
+                while True:
+                    header = await reader.readline()
+                    if header in (b'\r\n', b'\n', b''):
+                        break
+                    if header.lower().startswith(b'content-length:'):
+                        length = int(header.split(b':')[1])
+                await reader.readexactly(length)
+                latencies.append(time.perf_counter() - begin)
+                if b' 200 ' not in status:
+                    errors[0] += 1
+        finally:
+            writer.close()
+
+    begin = time.perf_counter()
+    await asyncio.gather(*[client() for i in range(concurrency)])
+    duration = time.perf_counter() - begin
+    latencies.sort()
+    n = len(latencies)
+    return dict(requests=n, errors=errors[0], duration=duration,
+                throughput=n / duration if duration > 0 else 0.,
+                p50=latencies[n // 2] if n else 0.,
+                p99=latencies[min(n * 99 // 100, n - 1)] if n else 0.,
+                max=latencies[-1] if n else 0.)
+
+
+def _read_queries(filename):
+    """
+    Reads one query per line, ``weight<tab>query`` or ``query``.
+    """
+    queries = []
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line:
+                continue
+            if "\t" in line:
+                w, q = line.split("\t", 1)
+                queries.append((float(w), q))
+            else:
+                queries.append((None, line))
+    return queries
+
+
+def _load_engine(data=None, trie=None, k=10, fLOG=print):
+    """
+    Builds a trie from a file of queries (see @see fn _read_queries)
+    or loads a snapshot saved by @see me CompactCompletionTrie.save.
+    A snapshot avoids building the trie every time the server starts,
+    its arrays are mapped, not read.
+
+    @param      data        one query per line
+    @param      trie        snapshot
+    @param      k           number of completions the trie must return quickly
+    @param      fLOG        logging function
+    @return                 completion engine
+    """
+    begin = time.perf_counter()
+    if trie is not None:
+        from .completion_compact import CompactCompletionTrie
+        engine = CompactCompletionTrie.load(trie)
+        fLOG("trie loaded in {0:.3f}s".format(time.perf_counter() - begin))
+    else:
+        from .completion import CompletionTrieNode
+        engine = CompletionTrieNode.build(_read_queries(data), topk=k)
+        fLOG("trie built in {0:.3f}s".format(time.perf_counter() - begin))
+    return engine
+
+
+def main(argv=None, fLOG=print):
+    """
+    Command line, ``serve`` builds a trie from a file (or loads
+    a snapshot) and starts a server, ``load`` sends requests
+    to a server with prefixes of the queries in a file.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m mlstatpy.nlp.completion_server",
+        description="completion server and load generator")
+    sub = parser.add_subparsers(dest="command")
+    serve = sub.add_parser("serve", help="starts a server")
+    source = serve.add_mutually_exclusive_group(required=True)
+    source.add_argument("--data",
+                        help="one query per line, weight<tab>query or query")
+    source.add_argument("--trie",
+                        help="snapshot saved by CompactCompletionTrie.save")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--k", type=int, default=10)
+    serve.add_argument("--window", type=float, default=0.,
+                       help="batching window in seconds")
+    serve.add_argument("--max-batch", type=int, default=256)
+    load = sub.add_parser("load", help="sends requests to a server")
+    load.add_argument("--data", required=True,
+                      help="queries, random prefixes of them are sent")
+    load.add_argument("--host", default="127.0.0.1")
+    load.add_argument("--port", type=int, default=8765)
+    load.add_argument("--k", type=int, default=10)
+    load.add_argument("--concurrency", type=int, default=16)
+    load.add_argument("--requests", type=int, default=10000)
+    load.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        engine = _load_engine(args.data, args.trie, k=args.k, fLOG=fLOG)
+        server = CompletionServer(engine, k=args.k, window=args.window,
+                                  max_batch=args.max_batch)
+
+        async def run():
+            srv = await server.start(args.host, args.port)
+            fLOG("listening on http://{0}:{1}/complete?q=".format(args.host, server.port))
+            async with srv:
+                await srv.serve_forever()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:  # pragma: no cover
+            pass
+    elif args.command == "load":
+        rnd = random.Random(args.seed)
+        queries = [q for _, q in _read_queries(args.data)]
+        prefixes = [q[:rnd.randint(1, len(q))] for q in queries]
+        rnd.shuffle(prefixes)
+        res = asyncio.run(load_generator(
+            prefixes, host=args.host, port=args.port, concurrency=args.concurrency,
+            requests=args.requests, k=args.k))
+        fLOG("requests={0} errors={1} throughput={2:.0f} req/s p50={3:.2f}ms "
+             "p99={4:.2f}ms".format(res['requests'], res['errors'], res['throughput'],
+                                    res['p50'] * 1000, res['p99'] * 1000))
+        return res
+    else:
+        parser.print_help()
+    return None
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
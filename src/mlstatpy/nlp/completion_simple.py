@@ -2,10 +2,13 @@
 @file
 @brief About completion, simple algorithm
 """
+import array
+import heapq
 import time
 from typing import Tuple, List, Iterator, Dict
+import numpy
 from pyquickhelper.loghelper import noLOG
-from .completion import CompletionTrieNode
+from .completion import CompletionTrieNode, _profile_report
 
 
 class CompletionElement:
@@ -113,11 +116,12 @@ class CompletionElement:
             rows.append("------------------")
             for el in self._info._log_imp:
                 rows.append(str(el))
+            all_completions = self._info._completions
             for i in range(len(self.value)):
                 prefix = self.value[:i]
                 rows.append("------------------")
                 rows.append("i={0} - {1}".format(i, prefix))
-                completions = self._info._completions.get(prefix, [])
+                completions = all_completions.get(prefix, [])
                 for i2, el in enumerate(completions):
                     ar = "   " if el.value != self.value else "-> "
                     add = "{5}{0}:{1} -- {2}{4}-- {3}".format(
@@ -134,10 +138,15 @@ class CompletionElement:
         @param      position    position in the completion system when prefix is null,
                                 *position starting from 0*
         @param      completions displayed completions, if not None, the method will
-                                store them in member *_completions*
+                                store them in member *_completions*, it can be a dictionary
+                                ``{prefix: list of elements}`` or a @see cl CompletionDetails,
+                                *position* is then the element index in it
         @return                 boolean which indicates there was an update
         """
-        if completions is not None:
+        if isinstance(completions, CompletionDetails):
+            log_imp = True
+            self._info = _CompletionInfo(completions, position)
+        elif completions is not None:
             log_imp = True
 
             class c:
@@ -192,7 +201,8 @@ class CompletionElement:
                                 it can be used to improve others queries
         @param      delta       delta in the dynamic modified mks
         @param      completions displayed completions, if not None, the method will
-                                store them in member *_completions*
+                                store them in member *_completions*, a @see cl CompletionDetails
+                                already knows them
         @param      iteration   for debugging purpose, indicates when this improvment was detected
         @return                 boolean which indicates there was an update
         """
@@ -200,7 +210,9 @@ class CompletionElement:
             # no need to look into it
             return False
 
-        if completions is not None:
+        if isinstance(completions, CompletionDetails):
+            log_imp = True
+        elif completions is not None:
             log_imp = True
             if prefix not in self._info._completions:
                 cut = min(15, max(10, len(self.value)),
@@ -285,6 +297,147 @@ class CompletionElement:
         return check
 
 
+class CompletionDetails:
+    """
+    Stores the completions displayed for every prefix of every element
+    when @see me CompletionSystem.compute_metrics is called with ``details=True``.
+    An element shows the first completions of a prefix until its own position,
+    at most 10 to 15 of them depending on its length, the lists
+    of two elements sharing a prefix only differ by their size.
+    This class keeps the first 15 completions of every prefix once and, for every
+    element and every prefix, the prefix id and the number of displayed
+    completions, all in arrays. Method @see me completions
+    rebuilds the lists. The memory grows with the total number of characters,
+    it does not depend on how many completions a prefix has.
+
+    * *elements*: elements sorted by weight, an element is identified by its index
+    * *top*, *top_offsets*: completions of prefix *p* are
+      ``top[top_offsets[p]:top_offsets[p + 1]]``
+    * *offsets*: *prefix_ids* and *ends* of element *i* are stored
+      in ``[offsets[i], offsets[i + 1])``, one for every non empty prefix
+    * *prefix_ids*: prefix id for every element and every non empty prefix
+    * *ends*: number of displayed completions for every element and every non empty prefix
+
+    The empty prefix is not stored, its completions are the first elements.
+    """
+
+    def __init__(self, elements: List[CompletionElement], size=15):
+        """
+        @param      elements    elements sorted by weight
+        @param      size        maximum number of stored completions per prefix
+        """
+        self.elements = elements
+        self.size = size
+        self._counts = []
+        self._top_pids = array.array('i')
+        self._top = array.array('i')
+        self._offsets = array.array('q', [0])
+        self._prefix_ids = array.array('i')
+        self._ends = array.array('B')
+        self.top = None
+        self.top_offsets = None
+        self.offsets = None
+        self.prefix_ids = None
+        self.ends = None
+
+    @staticmethod
+    def cut(value: str) -> int:
+        """
+        Returns the maximum number of displayed completions for an element.
+        """
+        return min(15, max(10, len(value)))
+
+    def add(self, i: int, value: str, positions: List[int], pids: List[int]):
+        """
+        Adds the completions of an element, the elements must be added in order.
+
+        @param      i           element index
+        @param      value       its value
+        @param      positions   position of the element among the completions
+                                of every prefix, ``positions[k]`` for the prefix of length *k*
+        @param      pids        id of every prefix, the caller gives the same id
+                                to the same prefix, ids start from 0 and a new prefix
+                                receives the next id
+        """
+        counts = self._counts
+        size = self.size
+        cut = CompletionDetails.cut(value)
+        for k in range(1, len(value)):
+            pid = pids[k]
+            while pid >= len(counts):
+                counts.append(0)
+            if counts[pid] < size:
+                counts[pid] += 1
+                self._top_pids.append(pid)
+                self._top.append(i)
+            self._prefix_ids.append(pid)
+            self._ends.append(min(cut, positions[k] + 1))
+        self._offsets.append(len(self._prefix_ids))
+
+    def freeze(self):
+        """
+        Converts the buffers into numpy arrays,
+        no element can be added after that.
+        """
+        pids = numpy.array(self._top_pids, dtype=numpy.int32)
+        top = numpy.array(self._top, dtype=numpy.int32)
+        self.top = top[numpy.argsort(pids, kind='stable')]
+        self.top_offsets = numpy.zeros(len(self._counts) + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.array(self._counts, dtype=numpy.int64), out=self.top_offsets[1:])
+        self.offsets = numpy.array(self._offsets, dtype=numpy.int64)
+        self.prefix_ids = numpy.array(self._prefix_ids, dtype=numpy.int32)
+        self.ends = numpy.array(self._ends, dtype=numpy.uint8)
+        self._counts = self._top_pids = self._top = None
+        self._offsets = self._prefix_ids = self._ends = None
+
+    def nbytes(self) -> int:
+        """
+        Returns the size of the arrays in bytes, the elements are not included.
+        """
+        return sum(a.nbytes for a in [self.top, self.top_offsets, self.offsets,
+                                      self.prefix_ids, self.ends])
+
+    def completions(self, i: int) -> Dict[str, List[CompletionElement]]:
+        """
+        Returns the displayed completions for every prefix of an element.
+
+        @param      i           element index
+        @return                 dictionary ``{prefix: list of elements}``
+        """
+        elements = self.elements
+        value = elements[i].value
+        res = {'': elements[:min(CompletionDetails.cut(value), i + 1)]}
+        begin, end = self.offsets[i:i + 2].tolist()
+        pids = self.prefix_ids[begin:end].tolist()
+        ends = self.ends[begin:end].tolist()
+        for k, (pid, n) in enumerate(zip(pids, ends)):
+            start = int(self.top_offsets[pid])
+            res[value[:k + 1]] = [elements[j] for j in self.top[start:start + n].tolist()]
+        return res
+
+
+class _CompletionInfo:
+    """
+    Detailed information about an element, member *_info*
+    of @see cl CompletionElement filled with a @see cl CompletionDetails.
+    """
+
+    __slots__ = 'details', 'index', '_log_imp'
+
+    def __init__(self, details, index):
+        self.details = details
+        self.index = index
+        self._log_imp = []
+
+    @property
+    def _completions(self):
+        "Returns the displayed completions, see @see me CompletionDetails.completions."
+        return self.details.completions(self.index)
+
+    def __str__(self):
+        return "{0}-{1}".format(self._completions, self._log_imp)
+
+
 class CompletionSystem:
     """
     define a completion system
@@ -301,6 +454,9 @@ class CompletionSystem:
                 return CompletionElement(e[1], e[0] if e[0] else i)
             return CompletionElement(e, i)
         self._elements = [create_element(i, e) for i, e in enumerate(elements)]
+        # index value -> element built by method find
+        self._index = None
+        self._index_dups = False
 
     def __getitem__(self, i):
         """
@@ -310,20 +466,40 @@ class CompletionSystem:
 
     def find(self, value: str, is_sorted=False) -> CompletionElement:
         """
-        Not very efficient, finds an item in a the list.
+        Finds an item in the list. The first call builds an index
+        (a dictionary), it remains valid after @see me sort_values or
+        @see me sort_weight unless two elements share the same value,
+        the function returns the first one in the current order.
 
         @param      value       string to find
         @param      is_sorted   the function will assume the elements are sorted by
-                                alphabetical order
+                                alphabetical order (see @see me sort_values) and
+                                use a bisection instead of the index
         @return                 element or None
         """
+        elements = self._elements
         if is_sorted:
-            raise NotImplementedError(  # pragma: no cover
-                "No optimisation for the sorted case.")
-        for e in self:
-            if e.value == value:
-                return e
-        return None
+            lo, hi = 0, len(elements)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if elements[mid].value < value:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo < len(elements) and elements[lo].value == value:
+                return elements[lo]
+            return None
+        if self._index is None:
+            index = {}
+            dups = False
+            for e in elements:
+                if e.value in index:
+                    dups = True
+                else:
+                    index[e.value] = e
+            self._index = index
+            self._index_dups = dups
+        return self._index.get(value, None)
 
     def items(self) -> Iterator[Tuple[str, CompletionElement]]:
         """
@@ -358,6 +534,8 @@ class CompletionSystem:
         """
         self._elements = list(
             _[-1] for _ in sorted((e.value, e.weight, e) for e in self))
+        if self._index_dups:
+            self._index = None
 
     def sort_weight(self):
         """
@@ -365,6 +543,8 @@ class CompletionSystem:
         """
         self._elements = list(
             _[-1] for _ in sorted((e.weight, e.value, e) for e in self))
+        if self._index_dups:
+            self._index = None
 
     def compare_with_trie(self, delta=0.8, fLOG=noLOG):
         """
@@ -408,71 +588,494 @@ class CompletionSystem:
         return {el.value: el for el in self}
 
     def compute_metrics(self, ffilter=None, delta=0.8,
-                        details=False, fLOG=noLOG) -> int:
+                        details=False, fLOG=noLOG, profile=None,
+                        engine='python') -> int:
         """
         Computes the metric for the completion itself.
 
         @param      ffilter     filter function
         @param      delta       parameter *delta* in the dynamic modified mks
         @param      details     log more details about displayed completions
+                                (see @see cl CompletionDetails)
         @param      fLOG        logging function
+        @param      profile     None, a dictionary or a function, it receives
+                                the information about phase ``'compute_metrics'``:
+                                *time*, *init_time*, *iterations*, *updates* and *times*
+                                (updated metrics and time for every iteration),
+                                *visited* and *prefixes* (processed elements and prefixes
+                                for every iteration, engine ``'python'`` only),
+                                *details* (size in bytes of the displayed completions
+                                if *details* is True), see @see me CompletionTrieNode.build
+        @param      engine      ``'python'`` or ``'numpy'`` (see @see me _compute_metrics_numpy),
+                                both return the same metrics, ``'numpy'`` falls back
+                                to ``'python'`` if *details* is True
         @return                 number of iterations
 
         The function ends by sorting the set of completion by alphabetical order.
+        The first iteration processes every element and every prefix.
+        An element can only improve if one of its prefixes is an element
+        which changed since the last time it was processed,
+        the next iterations only process these elements.
+        With *details* True, the prefix of an element is logged
+        every time it is processed, every iteration then processes
+        every element to keep the same log.
         """
         self.sort_weight()
         if ffilter is not None:
             raise NotImplementedError(  # pragma: no cover
                 "ffilter not None is not implemented")
-        if details:
-            store_completions = {'': []}
+        if engine == 'numpy' and not details:
+            it = self._compute_metrics_numpy(delta=delta, fLOG=fLOG, profile=profile)
+            self.sort_values()
+            return it
+        if engine not in ('python', 'numpy'):
+            raise ValueError("Unknown engine '{0}'.".format(engine))
+        completions = CompletionDetails(self._elements) if details else None
 
         improved = {}
         to = time.perf_counter()
         fLOG("init_metrics:", len(self))
         for i, el in enumerate(self._elements):
-            if details:
-                store_completions[''].append(el)
-                r = el.init_metrics(i, store_completions)
-            else:
-                r = el.init_metrics(i)
+            r = el.init_metrics(i, completions)
             if r and el.value not in improved:
                 improved[el.value] = el
         t = time.perf_counter()
         fLOG(
             "interation 0: #={0} dt={1} - log details={2}".format(len(self), t - to, details))
+        init_time = t - to
+        all_updates = []
+        all_visited = []
+        all_prefixes = []
+        times = []
+
+        # positions[i][k]: position of element i among the completions
+        # of its prefix of length k, they do not change after the first iteration,
+        # dependents[prefix]: elements starting with this prefix if it is
+        # the value of an element
+        positions = []
+        dependents = {}
+        values = set(el.value for el in self._elements)
+        dirty = set()
+
+        def visit(i, el, pos, it):
+            nb = 0
+            for k in range(0, len(el.value)):
+                prefix = el.value[:k]
+                r = el.update_metrics(
+                    prefix, pos[k], improved, delta,
+                    completions=completions, iteration=it)
+                if r:
+                    if el.value not in improved:
+                        improved[el.value] = el
+                    nb += 1
+            return nb
 
         updates = 1
         it = 1
         while updates > 0:
-            displayed = {}
+            begin = t
             updates = 0
-            for i, el in enumerate(self._elements):
-                for k in range(0, len(el.value)):
-                    prefix = el.value[:k]
-                    if prefix not in displayed:
-                        displayed[prefix] = 0
+            prefixes = 0
+            if it == 1:
+                # prefix -> number of completions seen so far,
+                # prefix -> id and counts[id] if details is True
+                displayed = {}
+                counts = []
+                visited = len(self)
+                for i, el in enumerate(self._elements):
+                    pos = []
+                    pids = [] if details else None
+                    for k in range(0, len(el.value)):
+                        prefix = el.value[:k]
                         if details:
-                            store_completions[prefix] = [el]
+                            pid = displayed.get(prefix, -1)
+                            if pid < 0:
+                                pid = len(counts)
+                                displayed[prefix] = pid
+                                counts.append(0)
+                            else:
+                                counts[pid] += 1
+                            pos.append(counts[pid])
+                            pids.append(pid)
+                        else:
+                            if prefix not in displayed:
+                                displayed[prefix] = 0
+                            else:
+                                displayed[prefix] += 1
+                            pos.append(displayed[prefix])
+                        if prefix in values:
+                            if prefix in dependents:
+                                dependents[prefix].append(i)
+                            else:
+                                dependents[prefix] = [i]
+                    positions.append(pos)
+                    if details:
+                        completions.add(i, el.value, pos, pids)
+                    nb = visit(i, el, pos, it)
+                    prefixes += len(pos)
+                    if nb > 0:
+                        updates += nb
+                        # the elements after this one are not processed yet,
+                        # the others need to be processed again
+                        dirty.update(dependents.get(el.value, ()))
+                if details:
+                    completions.freeze()
+            else:
+                # only the elements having a modified element as a prefix can change,
+                # they are processed in the same order as the first iteration
+                if details:
+                    current = set(range(len(self)))
+                    work = list(range(len(self)))
+                else:
+                    current = dirty
+                    work = list(dirty)
+                    heapq.heapify(work)
+                dirty = set()
+                visited = 0
+                while work:
+                    i = heapq.heappop(work)
+                    el = self._elements[i]
+                    nb = visit(i, el, positions[i], it)
+                    visited += 1
+                    prefixes += len(el.value)
+                    if nb > 0:
+                        updates += nb
+                        for d in dependents.get(el.value, ()):
+                            if d < i:
+                                dirty.add(d)
+                            elif d not in current:
+                                current.add(d)
+                                heapq.heappush(work, d)
+            t = time.perf_counter()
+            fLOG("interation {0}: updates={1} visited={2} prefixes={3} dt={4}".format(
+                it, updates, visited, prefixes, t - to))
+            all_updates.append(updates)
+            all_visited.append(visited)
+            all_prefixes.append(prefixes)
+            times.append(t - begin)
+            it += 1
+
+        self.sort_values()
+        if profile is not None:
+            _profile_report(profile, 'compute_metrics', dict(
+                time=time.perf_counter() - to, init_time=init_time,
+                iterations=it - 1, updates=all_updates, times=times,
+                visited=all_visited, prefixes=all_prefixes,
+                details=completions.nbytes() if details else 0))
+        return it - 1
+
+    @staticmethod
+    def _prefix_positions(values: List[str]) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, List[int]]:
+        """
+        Computes the position of every element among the completions
+        of every one of its prefixes, the elements are assumed to be sorted
+        by weight (see @see me sort_weight). The completions of a prefix
+        of length *k* are the elements starting with it and longer than *k*.
+        Elements sorted by value sharing a prefix of length *k* are contiguous,
+        the group of an element is the number of boundaries before it
+        (the common prefix with the previous element is shorter than *k*),
+        a stable sort on the group keeps the order by weight inside a group
+        and the position is the distance to the beginning of the group.
+
+        @param      values  values of the elements sorted by weight
+        @return             lengths, offsets, positions, order: the position of element *i* for
+                            its prefix of length *k* is ``positions[offsets[i] + k]``
+                            (starting from 0), *offsets* has ``n + 1`` elements,
+                            *order* is the list of elements sorted by value
+        """
+        n = len(values)
+        lengths = numpy.array([len(v) for v in values], dtype=numpy.int64)
+        offsets = numpy.zeros(n + 1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+        positions = numpy.empty(offsets[-1], dtype=numpy.int64)
+
+        order = sorted(range(n), key=values.__getitem__)
+        # common prefix with the previous element sorted by value
+        common = numpy.empty(n, dtype=numpy.int64)
+        prev = None
+        for t, i in enumerate(order):
+            cur = values[i]
+            c = -1
+            if prev is not None:
+                c = 0
+                for a, b in zip(prev, cur):
+                    if a != b:
+                        break
+                    c += 1
+            common[t] = c
+            prev = cur
+        rank = numpy.empty(n, dtype=numpy.int64)
+        rank[numpy.array(order, dtype=numpy.int64)] = numpy.arange(n)
+
+        for k in range(int(lengths.max()) if n > 0 else 0):
+            groups = numpy.cumsum(common < k)
+            idx = numpy.nonzero(lengths > k)[0]
+            g = groups[rank[idx]]
+            perm = numpy.argsort(g, kind='stable')
+            sg = g[perm]
+            start = numpy.ones(sg.shape[0], dtype=numpy.bool_)
+            start[1:] = sg[1:] != sg[:-1]
+            first = numpy.where(start, numpy.arange(sg.shape[0]), 0)
+            numpy.maximum.accumulate(first, out=first)
+            positions[offsets[idx[perm]] + k] = numpy.arange(sg.shape[0]) - first
+        return lengths, offsets, positions, order
+
+    def _compute_metrics_numpy(self, delta=0.8, fLOG=noLOG, profile=None) -> int:
+        """
+        Computes the same metrics as @see me compute_metrics
+        with ``engine='python'``. The elements must be sorted by weight.
+        The positions of every element among the completions of its
+        prefixes do not change from one iteration to the next one,
+        they are computed once (see @see me _prefix_positions),
+        and so is *mks0*. Metrics *mks1* and *mks2* of an element
+        without any other element among its prefixes are known
+        after the first iteration. The other elements follow
+        the same iterations as @see me CompletionElement.update_metrics
+        in the same order (the results depend on it), the prefixes between two
+        elements used as prefixes are processed at once with a minimum
+        on the costs. After the first iteration, an element is processed again
+        only if one of its prefixes changed since the last time,
+        the others cannot change.
+
+        @param      delta       parameter *delta* in the dynamic modified mks
+        @param      fLOG        logging function
+        @param      profile     see @see me compute_metrics, *updates*
+                                is the number of updated elements
+        @return                 number of iterations
+        """
+        elements = self._elements
+        metrics, info = CompletionSystem._metrics_numpy(
+            [el.value for el in elements], delta=delta, fLOG=fLOG)
+        empty = CompletionElement.empty_prefix()
+        mks0, mks0_ = metrics['mks0'], metrics['mks0_']
+        mks1, mks1_ = metrics['mks1'], metrics['mks1_']
+        mks2, mks2_ = metrics['mks2'], metrics['mks2_']
+        prefix = metrics['prefix']
+        for i, el in enumerate(elements):
+            el.mks0 = mks0[i]
+            el.mks0_ = mks0_[i]
+            el.mks1 = mks1[i]
+            el.mks1_ = mks1_[i]
+            el.mks2 = mks2[i]
+            el.mks2_ = mks2_[i]
+            el.prefix = empty if prefix[i] < 0 else elements[prefix[i]]
+            el._info = None
+        if profile is not None:
+            info['time'] = time.perf_counter() - info.pop('begin')
+            _profile_report(profile, 'compute_metrics', info)
+        return info['iterations']
+
+    @staticmethod
+    def _metrics_numpy(values: List[str], delta=0.8, fLOG=noLOG) -> Tuple[Dict[str, List], Dict]:
+        """
+        Implements @see me _compute_metrics_numpy on the values
+        of the elements sorted by weight.
+
+        @param      values      values sorted by weight
+        @param      delta       parameter *delta* in the dynamic modified mks
+        @param      fLOG        logging function
+        @return                 metrics, info: *metrics* contains one list for every
+                                metric (*mks0*, *mks0_*, ...) and *prefix*, the index
+                                of the last element used as a prefix or -1,
+                                *info* contains *begin*, *init_time*, *iterations*,
+                                *updates* and *times* (see @see me compute_metrics)
+        """
+        to = time.perf_counter()
+        n = len(values)
+        lengths, offsets, positions, order = CompletionSystem._prefix_positions(values)
+        ks = numpy.arange(offsets[-1], dtype=numpy.int64) - \
+            numpy.repeat(offsets[:-1], lengths)
+        # cost of a completion after typing k characters
+        cost = ks + positions + 1
+        pos1 = numpy.arange(n, dtype=numpy.int64) + 1
+        init = numpy.where(lengths > pos1, pos1, lengths)
+        init_ = numpy.where(lengths > pos1, 0, lengths)
+
+        nonempty = lengths > 0
+        starts = offsets[:-1][nonempty]
+        best = init.copy()
+        mks0_ = numpy.where(init == best, init_, -1)
+        first = numpy.full(n, -1, dtype=numpy.int64)
+        if starts.shape[0] > 0:
+            best[nonempty] = numpy.minimum(
+                init[nonempty], numpy.minimum.reduceat(cost, starts))
+            mks0_ = numpy.where(init == best, init_, -1)
+            rep = numpy.repeat(best, lengths)
+            # mks0_ is the longest prefix, mks1_ the shortest one
+            mks0_[nonempty] = numpy.maximum(
+                mks0_[nonempty], numpy.maximum.reduceat(numpy.where(cost == rep, ks, -1), starts))
+            first[nonempty] = numpy.minimum.reduceat(
+                numpy.where(cost == rep, ks, offsets[-1]), starts)
+        improves = best < init
+        first = numpy.where(improves, first, init_)
+
+        # elements which are prefixes of an element, they form a chain
+        ancestors = {}
+        dependents = {}
+        stack = []
+        for i in order:
+            v = values[i]
+            while stack and not v.startswith(stack[-1][1]):
+                stack.pop()
+            if stack and stack[-1][1] == v:
+                # duplicated value
+                if len(stack) > 1:
+                    ancestors[i] = ancestors[prev_i]
+            else:
+                if stack:
+                    ancestors[i] = stack.copy()
+                stack.append((len(v), v))
+            if i in ancestors:
+                for _, s in ancestors[i]:
+                    if s in dependents:
+                        dependents[s].append(i)
                     else:
-                        displayed[prefix] += 1
-                        if details:
-                            store_completions[prefix].append(el)
-                    r = el.update_metrics(
-                        prefix, displayed[prefix], improved, delta,
-                        completions=(store_completions if details else None),
-                        iteration=it)
-                    if r:
-                        if el.value not in improved:
-                            improved[el.value] = el
+                        dependents[s] = [i]
+            prev_i = i
+
+        lengths = lengths.tolist()
+        offsets = offsets.tolist()
+        cost = cost.tolist()
+        pos = (positions + 1).tolist()
+        best = best.tolist()
+        init_list = init.tolist()
+        improves = improves.tolist()
+        first = first.tolist()
+        m1 = list(init_list)
+        m2 = list(init_list)
+        m1_ = init_.tolist()
+        m2_ = list(m1_)
+        pj = [0] * n
+        pv = [-1] * n
+        improved = {}
+        for i in range(n):
+            if init_list[i] < lengths[i] and values[i] not in improved:
+                improved[values[i]] = i
+        init_time = time.perf_counter() - to
+        fLOG("init_metrics: #={0} dt={1} with prefixes={2}".format(
+            n, init_time, len(ancestors)))
+
+        def process(i, check):
+            o = offsets[i]
+            le = lengths[i]
+            end = o + le
+            v1, v1_, v2, v2_ = m1[i], m1_[i], m2[i], m2_[i]
+            j = pj[i]
+            p = pv[i]
+            vm1 = 0 if p < 0 else m1[p]
+            vm2 = 0 if p < 0 else m2[p]
+            lo = j
+            for k, val in ancestors[i]:
+                if k < j:
+                    continue
+                q = improved.get(val, -1)
+                if q < 0:
+                    continue
+                # prefixes lo..k, the one of length j does not use *self.prefix*
+                if lo == j:
+                    c = cost[o + lo]
+                    if c < v1:
+                        v1, v1_, check = c, lo, True
+                    if c < v2:
+                        v2, v2_, check = c, lo, True
+                    lo += 1
+                if lo <= k:
+                    c = min(cost[o + lo:o + k + 1])
+                    kk = cost.index(c, o + lo, o + k + 1) - o
+                    c1 = vm1 + (c - j)
+                    if c1 < v1:
+                        v1, v1_, check = c1, kk, True
+                    c2 = vm2 + (c - j)
+                    if c2 < v2:
+                        v2, v2_, check = c2, kk, True
+                # the prefix is an improved element
+                c1 = m1[q] + min(le - k, pos[o + k])
+                if c1 < v1:
+                    v1, v1_, check = c1, k, True
+                c2 = m2[q] + min(le - k, pos[o + k] + delta)
+                if c2 < v2:
+                    v2, v2_, check = c2, k, True
+                j, p, vm1, vm2 = k, q, m1[q], m2[q]
+                lo = k + 1
+            if lo == j and lo < le:
+                c = cost[o + lo]
+                if c < v1:
+                    v1, v1_, check = c, lo, True
+                if c < v2:
+                    v2, v2_, check = c, lo, True
+                lo += 1
+            if lo < le:
+                c = min(cost[o + lo:end])
+                kk = cost.index(c, o + lo, end) - o
+                c1 = vm1 + (c - j)
+                if c1 < v1:
+                    v1, v1_, check = c1, kk, True
+                c2 = vm2 + (c - j)
+                if c2 < v2:
+                    v2, v2_, check = c2, kk, True
+            m1[i], m1_[i], m2[i], m2_[i] = v1, v1_, v2, v2_
+            pj[i] = j
+            pv[i] = p
+            return check
+
+        all_updates = []
+        times = []
+        it = 1
+        updates = 1
+        dirty = set()
+        t = time.perf_counter()
+        while updates > 0:
+            begin = t
+            updates = 0
+            if it == 1:
+                for i in range(n):
+                    if i in ancestors:
+                        check = process(i, improves[i])
+                    else:
+                        check = improves[i]
+                        if check:
+                            m1[i] = m2[i] = best[i]
+                            m1_[i] = m2_[i] = first[i]
+                    if check:
                         updates += 1
+                        if values[i] not in improved:
+                            improved[values[i]] = i
+                        # the elements after this one see the change
+                        # in this iteration, the others in the next one
+                        for d in dependents.get(values[i], ()):
+                            if d < i:
+                                dirty.add(d)
+            else:
+                # a heap, the elements are processed in the same order
+                work = list(dirty)
+                heapq.heapify(work)
+                current = dirty
+                dirty = set()
+                while work:
+                    i = heapq.heappop(work)
+                    if not process(i, False):
+                        continue
+                    updates += 1
+                    if values[i] not in improved:
+                        improved[values[i]] = i
+                    for d in dependents.get(values[i], ()):
+                        if d < i:
+                            dirty.add(d)
+                        elif d not in current:
+                            current.add(d)
+                            heapq.heappush(work, d)
             t = time.perf_counter()
             fLOG("interation {0}: updates={1} dt={2}".format(
                 it, updates, t - to))
+            all_updates.append(updates)
+            times.append(t - begin)
             it += 1
 
-        self.sort_values()
-        return it - 1
+        metrics = dict(mks0=best, mks0_=mks0_.tolist(), mks1=m1, mks1_=m1_,
+                       mks2=m2, mks2_=m2_, prefix=pv)
+        info = dict(begin=to, init_time=init_time, iterations=it - 1,
+                    updates=all_updates, times=times)
+        return metrics, info
 
     def enumerate_test_metric(self, qset: Iterator[Tuple[str, float]]) -> Iterator[Tuple[CompletionElement, CompletionElement]]:
         """
@@ -0,0 +1,188 @@
+"""
+@file
+@brief About completion, sorted arrays and range minimum queries
+"""
+import sys
+import heapq
+from typing import Tuple, List, Dict
+import numpy
+from .completion_simple import CompletionSystem
+
+
+class CompletionSortedArray:
+    """
+    Completion engine which does not build any trie.
+    The values of a @see cl CompletionSystem are sorted and
+    stored in a single string, *offsets* gives the beginning of every value,
+    the weights are stored in an array in the same order.
+    The completions of a prefix are a contiguous range of values
+    found with two bisections. A sparse table (range minimum query)
+    returns the position of the lowest weight in any range
+    in constant time, the *k* best completions are extracted
+    with a heap of ranges, a query costs
+    :math:`O(l(prefix) \\log n + k \\log k)`.
+
+    It contains the following members:
+
+    * *buffer*: values sorted by value then weight, concatenated
+    * *offsets*: position of every value in *buffer*, length is ``n + 1``
+    * *weights*: weight of every value
+    * *table*: the sparse table, ``table[j][i]`` is the position
+      of the lowest weight in range ``[i, i + 2^j)``
+
+    Queries read the arrays through memory views, accessing
+    one element of a numpy array is slower than the loop itself.
+    """
+
+    def __init__(self, elements):
+        """
+        @param      elements    @see cl CompletionSystem or a list
+                                of elements it accepts
+        """
+        if not isinstance(elements, CompletionSystem):
+            elements = CompletionSystem(elements)
+        pairs = sorted((e.value, e.weight) for e in elements)
+        self.buffer = "".join(v for v, _ in pairs)
+        self.offsets = numpy.zeros(len(pairs) + 1, dtype=numpy.int64)
+        self.offsets[1:] = numpy.cumsum([len(v) for v, _ in pairs])
+        self.weights = numpy.array([w for _, w in pairs], dtype=numpy.float64)
+        self._offsets = memoryview(self.offsets)
+        self._weights = memoryview(self.weights)
+        self._build_table()
+
+    def _build_table(self):
+        """
+        Builds the sparse table, ties are broken with the position
+        (the lowest value first).
+        """
+        n = self.weights.shape[0]
+        table = [numpy.arange(n, dtype=numpy.int32)]
+        length = 1
+        while length * 2 <= n:
+            prev = table[-1]
+            a = prev[:n - length * 2 + 1]
+            b = prev[length:n - length + 1]
+            table.append(numpy.where(self.weights[b] < self.weights[a], b, a))
+            length *= 2
+        self.table = table
+        self._table = [memoryview(t) for t in table]
+
+    def __len__(self) -> int:
+        """
+        Returns the number of values.
+        """
+        return self.weights.shape[0]
+
+    def __str__(self):
+        """
+        usual
+        """
+        return "CompletionSortedArray(n={0}, levels={1})".format(
+            len(self), len(self.table))
+
+    def value(self, i: int) -> str:
+        """
+        Returns the value at position *i*.
+        """
+        return self.buffer[self._offsets[i]:self._offsets[i + 1]]
+
+    def _bisect(self, prefix: str, right: bool, lo=0, hi=None) -> int:
+        """
+        Bisection on the values truncated to the length of the prefix,
+        they are sorted as well.
+
+        @param      prefix      prefix
+        @param      right       first position after the values starting
+                                with *prefix* if True, first position of
+                                these values otherwise
+        @param      lo          the search starts at this position
+        @param      hi          and ends before this one (None for the end)
+        @return                 position
+        """
+        lp = len(prefix)
+        buffer = self.buffer
+        offsets = self._offsets
+        if hi is None:
+            hi = len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = offsets[mid]
+            key = buffer[start:min(start + lp, offsets[mid + 1])]
+            if key < prefix or (right and key == prefix):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Returns the positions of the values starting with a prefix.
+
+        @param      prefix      prefix
+        @return                 ``(first, last + 1)``, the range is empty if there is none
+        """
+        lo = self._bisect(prefix, False)
+        # exponential search, the range is small for long prefixes
+        lp = len(prefix)
+        buffer = self.buffer
+        offsets = self._offsets
+        n = len(self)
+        step = 1
+        while lo + step < n:
+            start = offsets[lo + step]
+            if buffer[start:min(start + lp, offsets[lo + step + 1])] != prefix:
+                break
+            step *= 2
+        return lo, self._bisect(prefix, True, lo + step // 2, min(lo + step, n))
+
+    def argmin(self, lo: int, hi: int) -> int:
+        """
+        Returns the position of the lowest weight in range ``[lo, hi)``
+        (range minimum query).
+        """
+        j = (hi - lo).bit_length() - 1
+        level = self._table[j]
+        a = level[lo]
+        b = level[hi - (1 << j)]
+        return b if self._weights[b] < self._weights[a] else a
+
+    def complete(self, prefix: str, k=10) -> List[Tuple[float, str]]:
+        """
+        Returns the *k* best completions of a prefix
+        sorted by weight then value (like @see me CompletionTrieNode.complete).
+
+        @param      prefix      prefix
+        @param      k           number of completions to return
+        @return                 list of ``(weight, value)``
+        """
+        lo, hi = self.prefix_range(prefix)
+        res = []
+        if lo >= hi or k <= 0:
+            return res
+        weights = self._weights
+        i = self.argmin(lo, hi)
+        heap = [(weights[i], i, lo, hi)]
+        while heap and len(res) < k:
+            w, i, lo, hi = heapq.heappop(heap)
+            res.append((w, self.value(i)))
+            if lo < i:
+                j = self.argmin(lo, i)
+                heapq.heappush(heap, (weights[j], j, lo, i))
+            if i + 1 < hi:
+                j = self.argmin(i + 1, hi)
+                heapq.heappush(heap, (weights[j], j, i + 1, hi))
+        return res
+
+    def memory_usage(self) -> Dict[str, float]:
+        """
+        Returns the memory used by the engine, it sums up
+        the size of the buffer and every array, the result can be compared to
+        @see me CompletionTrieNode.memory_usage.
+
+        @return     dictionary with keys *words*, *bytes*, *bytes_per_word*
+        """
+        size = sys.getsizeof(self.buffer) + self.offsets.nbytes + self.weights.nbytes
+        size += sum(t.nbytes for t in self.table)
+        words = len(self)
+        return dict(words=words, bytes=size,
+                    bytes_per_word=size / max(words, 1))